@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "300"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "256"))
+
+# Bucket widths for sensor inputs. Readings that only differ inside a bucket
+# get the same cached answer; the buckets are far below what changes the
+# model's recommendation.
+SENSOR_STEPS: Dict[str, float] = {
+    "temperature": 0.5,
+    "temp_inside": 0.5,
+    "humidity": 2,
+    "ph": 0.1,
+    "light_intensity": 25,
+    "co2_ppm": 10,
+    "co_ppm": 1,
+    "air_quality_index": 5,
+}
+
+
+def quantize(value: Any, step: float) -> Any:
+    """Round a numeric ``value`` to the nearest multiple of ``step``; others pass through."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if value != value:   # NaN
+        return None
+    snapped = round(round(value / step) * step, 6)
+    if isinstance(step, int) and float(snapped).is_integer():
+        return int(snapped)
+    return snapped
+
+
+def quantize_inputs(values: Mapping[str, Any], steps: Mapping[str, float] = SENSOR_STEPS) -> Dict[str, Any]:
+    """Copy of ``values`` with every field that has a step snapped to its bucket."""
+    return {key: quantize(value, steps[key]) if key in steps else value for key, value in values.items()}
+
+
+def cache_key(endpoint: str, prompt_version: Any, model: str, inputs: Mapping[str, Any]) -> Tuple[Hashable, ...]:
+    """Hashable key for one endpoint's prompt over already-quantized ``inputs``."""
+    return (endpoint, prompt_version, model, tuple(sorted(inputs.items())))
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache for LLM responses with single-flight de-duplication.
+
+    ``get_or_compute`` returns the cached value while it is younger than
+    ``ttl``; otherwise exactly one caller runs ``compute`` and concurrent
+    callers for the same key wait for and share its result. Failures are
+    propagated to every waiter and never cached.
+    """
+
+    def __init__(self, max_entries: int = AI_CACHE_MAX_ENTRIES, ttl: float = AI_CACHE_TTL_SECONDS) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable, now: float) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        stored_at, value = entry
+        if now - stored_at >= self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Value for ``key`` and how it was obtained: ``'hit'``, ``'miss'``
+        (computed by this caller) or ``'shared'`` (joined an in-flight call).
+        """
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value, "hit"
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, "shared"
+
+        try:
+            flight.value = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        else:
+            with self._lock:
+                self._store(key, flight.value)
+            return flight.value, "miss"
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round((self.hits + self.shared) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_CACHE: Optional[ResponseCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """Process-wide cache, so warm serverless invocations share entries."""
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ResponseCache()
+    return _CACHE
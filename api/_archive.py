@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+import time
+from _queue import SimpleQueue   # C queue: its locks are real OS locks even under eventlet
+from datetime import datetime, tzinfo
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from _history import _as_float
+from _metrics import REGISTRY
+
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_QUEUE_MAX = int(os.getenv("ARCHIVE_QUEUE_MAX", "100000"))
+ARCHIVE_RETENTION_DAYS = float(os.getenv("ARCHIVE_RETENTION_DAYS", "400"))
+ARCHIVE_MAX_ROWS = int(os.getenv("ARCHIVE_MAX_ROWS", "10000"))   # per range query
+PRUNE_INTERVAL_SECONDS = 3600.0
+_TS_ROUNDING = 1e-6      # ISO 8601 row timestamps keep microseconds
+
+# Writer-side counts are plain attributes (see TelemetryArchive.stats): the
+# writer is an OS thread and must not take eventlet's green metric locks
+ARCHIVE_QUERY_SECONDS = REGISTRY.histogram(
+    "greenpulse_archive_query_seconds", "Archive range query latency")
+
+# (station, ts, reading dict or None, texts, numbers)
+_Item = Tuple[str, float, Optional[Dict[str, Any]], Sequence[Any], Sequence[float]]
+_STOP = object()
+
+
+def _os_thread(target: Any, name: str) -> threading.Thread:
+    """A real OS thread, also when eventlet has monkey-patched ``threading``."""
+    patcher = sys.modules.get("eventlet.patcher")
+    module = patcher.original("threading") if patcher and patcher.is_monkey_patched("thread") else threading
+    return module.Thread(target=target, name=name, daemon=True)
+
+
+def _os_lock() -> Any:
+    """A real OS lock, also when eventlet has monkey-patched ``threading``."""
+    patcher = sys.modules.get("eventlet.patcher")
+    module = patcher.original("threading") if patcher and patcher.is_monkey_patched("thread") else threading
+    return module.Lock()
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class TelemetryArchive:
+    """
+    Every reading of every station in one SQLite table, for range queries
+    over months of history that the in-memory ring buffers cannot hold.
+
+    Rows are clustered on ``(station, ts, seq)`` (a WITHOUT ROWID primary
+    key), so a ``station`` + time-range query is an index range scan however
+    large the archive grows. ``seq`` is unique per written row, so readings
+    that share a timestamp (a batch stamped with its arrival time) are all
+    kept. ``append`` only enqueues; a background OS thread commits
+    whatever has queued up in one transaction, so ingest never waits on disk.
+    If the writer falls more than ``max_queue`` readings behind, new readings
+    are dropped (and counted) rather than growing memory without bound.
+
+    With ``background=False`` rows are written inline instead, for runtimes
+    that freeze the process between requests (serverless functions). With
+    ``read_only`` the archive is only queried (another process writes it).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        numeric_fields: Sequence[str],
+        text_fields: Sequence[str] = (),
+        int_fields: Iterable[str] = (),
+        bool_fields: Iterable[str] = (),
+        batch_size: int = ARCHIVE_BATCH_SIZE,
+        max_queue: int = ARCHIVE_QUEUE_MAX,
+        retention_days: float = ARCHIVE_RETENTION_DAYS,
+        background: bool = True,
+        tz: Optional[tzinfo] = None,
+        read_only: bool = False,
+    ) -> None:
+        self.path = path
+        self.read_only = read_only
+        self.numeric_fields = tuple(numeric_fields)
+        self.text_fields = tuple(text_fields)
+        self._int_fields = frozenset(int_fields)
+        self._bool_fields = frozenset(bool_fields)
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.retention = retention_days * 86400 if retention_days > 0 else 0.0
+        self.tz = tz   # of the row timestamps; None = naive local time
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Text columns are declared without a type so values keep theirs (3 stays 3, "3" stays "3")
+        columns = [_quote(f) for f in self.text_fields] + [f"{_quote(f)} REAL" for f in self.numeric_fields]
+        self._value_columns = ", ".join(_quote(f) for f in self.text_fields + self.numeric_fields)
+        self._insert_sql = (
+            f"INSERT INTO readings (station, ts, seq, {self._value_columns}) "
+            f"VALUES ({', '.join('?' * (3 + len(self.text_fields) + len(self.numeric_fields)))})"
+        )
+        self._writer_db = self._connect()
+        self._create_table(columns, migrate=not read_only)
+        self._reader_db = self._connect()
+        self._converters = [(f, None) for f in self.text_fields] + [
+            (f, bool if f in self._bool_fields else int if f in self._int_fields else None)
+            for f in self.numeric_fields
+        ]
+        self._reader_lock = _os_lock()   # also taken from tpool threads (see query)
+
+        self._queue: "SimpleQueue[Any]" = SimpleQueue()
+        self.written = 0          # written by the writer thread only
+        self.failed = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self.dropped = 0          # by ingest, when the queue is full
+        self._next_prune = 0.0
+        self._thread: Optional[threading.Thread] = None
+        if background and not read_only:
+            self._thread = _os_thread(self._run, "telemetry-archive")
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _create_table(self, columns: Sequence[str], migrate: bool) -> None:
+        db = self._writer_db
+        existing = [row[1] for row in db.execute("PRAGMA table_info(readings)")]
+        if existing and "seq" not in existing:
+            if not migrate:
+                return   # the writing process migrates it
+            # Archive from before seq: rebuild it under the new key once
+            print(f"💾 Migrating telemetry archive {self.path} to (station, ts, seq) rows", file=sys.stderr)
+            db.execute("BEGIN")
+            db.execute("ALTER TABLE readings RENAME TO readings_v1")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS readings (station TEXT NOT NULL, ts REAL NOT NULL, seq INTEGER NOT NULL, "
+            + "".join(f"{column}, " for column in columns)
+            + "PRIMARY KEY (station, ts, seq)) WITHOUT ROWID"
+        )
+        if existing and "seq" not in existing:
+            kept = ", ".join(_quote(f) for f in self.text_fields + self.numeric_fields if f in existing)
+            db.execute(f"INSERT INTO readings (station, ts, seq, {kept}) "
+                       f"SELECT station, ts, 0, {kept} FROM readings_v1")
+            db.execute("DROP TABLE readings_v1")
+            db.execute("COMMIT")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")      # readers never wait for the writer
+        db.execute("PRAGMA synchronous=NORMAL")    # fsync at checkpoints, not every commit
+        return db
+
+    # ── Writing ──────────────────────────────────────────────────────────────
+
+    def append(self, station_id: str, reading: Dict[str, Any], ts: float) -> None:
+        """Archive one reading dict taken at epoch-second ``ts`` (the dict must not be mutated later)."""
+        self._put((station_id, ts, reading, (), ()))
+
+    def append_values(self, station_id: str, ts: float, texts: Sequence[Any], values: Sequence[float]) -> None:
+        """Like :meth:`append` with text and float values already in field order."""
+        self._put((station_id, ts, None, texts, values))
+
+    def _put(self, item: _Item) -> None:
+        if self.read_only:
+            raise ValueError(f"Telemetry archive {self.path} is read-only")
+        if self._thread is None:
+            self._write([item])
+        elif self._queue.qsize() < self.max_queue:
+            self._queue.put(item)
+        else:
+            self.dropped += 1
+
+    def _row(self, item: _Item, seq: int) -> List[Any]:
+        station, ts, reading, texts, values = item
+        if reading is not None:
+            texts = [reading.get(f) for f in self.text_fields]
+            values = [_as_float(reading.get(f)) for f in self.numeric_fields]
+        row: List[Any] = [station, ts, seq]
+        row.extend(texts[n] if n < len(texts) else None for n in range(len(self.text_fields)))
+        row.extend(None if value != value else value for value in values)   # NaN = missing = NULL
+        return row
+
+    def _write(self, batch: List[_Item]) -> None:
+        started = time.perf_counter()
+        seq = time.time_ns()   # unique per row, also across restarts
+        db = self._writer_db
+        db.execute("BEGIN")
+        try:
+            db.executemany(self._insert_sql, [self._row(item, seq + n) for n, item in enumerate(batch)])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self.write_seconds += time.perf_counter() - started
+        self.batches += 1
+        self.written += len(batch)
+        if self.retention and time.monotonic() >= self._next_prune:
+            self._prune(time.time() - self.retention)
+
+    def _prune(self, cutoff: float) -> None:
+        """Delete readings older than ``cutoff``, station by station along the primary key."""
+        self._next_prune = time.monotonic() + PRUNE_INTERVAL_SECONDS
+        # Every station in the table, also ones that stopped reporting: a skip
+        # scan over the key, one seek per station instead of reading every row
+        stations = [station for (station,) in self._writer_db.execute(
+            "WITH RECURSIVE s(station) AS (SELECT MIN(station) FROM readings UNION ALL "
+            "SELECT (SELECT MIN(station) FROM readings WHERE station > s.station) FROM s "
+            "WHERE s.station IS NOT NULL) SELECT station FROM s WHERE station IS NOT NULL")]
+        for station in stations:
+            self._writer_db.execute("DELETE FROM readings WHERE station = ? AND ts < ?", (station, cutoff))
+
+    def _run(self) -> None:
+        """Writer thread: block for the first queued reading, then commit everything queued behind it."""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get()
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self._write(batch)
+            except sqlite3.Error as exc:
+                self.failed += len(batch)
+                print(f"⚠️ Telemetry archive write failed: {exc}", file=sys.stderr)
+            if stop:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "write_seconds": round(self.write_seconds, 6),
+        }
+
+    def close(self) -> None:
+        """Write everything still queued and stop the writer."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    # ── Queries ──────────────────────────────────────────────────────────────
+
+    def query(
+        self,
+        station_id: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = ARCHIVE_MAX_ROWS,
+        run: Optional[Callable[..., Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Readings of ``station_id`` with ``start <= ts <= end`` (epoch seconds,
+        either bound optional), oldest first, in the same row shape as
+        ``SensorHistory``. When more than ``limit`` match, the first ``limit``
+        after ``start`` are returned, or the newest ``limit`` without a start.
+
+        ``run(fn, *args)`` executes the SQLite part, e.g. ``eventlet.tpool.execute``
+        so a long scan does not block the hub; it must not touch green locks.
+        """
+        where = ["station = ?"]
+        params: List[Any] = [station_id]
+        # Row timestamps go out rounded to the microsecond; widen the bounds by
+        # that rounding so a row's own timestamp sent back as a bound matches it
+        if start is not None:
+            where.append("ts >= ?")
+            params.append(start - _TS_ROUNDING)
+        if end is not None:
+            where.append("ts <= ?")
+            params.append(end + _TS_ROUNDING)
+        order = "ASC" if start is not None else "DESC"
+        params.append(max(0, min(limit, ARCHIVE_MAX_ROWS)))
+        sql = (f"SELECT ts, {self._value_columns} FROM readings WHERE {' AND '.join(where)} "
+               f"ORDER BY ts {order}, seq {order} LIMIT ?")
+
+        started = time.perf_counter()
+        rows = run(self._fetch, sql, params, order) if run is not None else self._fetch(sql, params, order)
+        ARCHIVE_QUERY_SECONDS.observe(time.perf_counter() - started)
+        return rows
+
+    def _fetch(self, sql: str, params: Sequence[Any], order: str) -> List[Dict[str, Any]]:
+        with self._reader_lock:
+            records = self._reader_db.execute(sql, params).fetchall()
+        if order == "DESC":
+            records.reverse()
+        return [self._to_row(record) for record in records]
+
+    def _to_row(self, record: Sequence[Any]) -> Dict[str, Any]:
+        row: Dict[str, Any] = {"timestamp": datetime.fromtimestamp(record[0], self.tz).isoformat()}
+        for (field, convert), value in zip(self._converters, record[1:]):
+            if value is not None:   # SQLite stores NaN as NULL too
+                row[field] = convert(value) if convert else value
+        return row
+
+    def count(self, station_id: str) -> int:
+        with self._reader_lock:
+            return self._reader_db.execute(
+                "SELECT COUNT(*) FROM readings WHERE station = ?", (station_id,)).fetchone()[0]
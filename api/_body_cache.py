@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+BODY_CACHE_MAX_ENTRIES = int(os.getenv("BODY_CACHE_MAX_ENTRIES", "512"))
+BODY_CACHE_MAX_BYTES = int(os.getenv("BODY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Part of every ETag, so versions counted from zero again after a restart never match old tags
+BOOT_ID = os.urandom(4).hex()
+
+
+def make_etag(version: Tuple[Any, ...]) -> str:
+    """ETag value (unquoted) for a version tuple of plain values (station ids, counters)."""
+    digest = hashlib.blake2b(repr(version).encode("utf-8"), digest_size=8).hexdigest()
+    return f"{BOOT_ID}-{digest}"
+
+
+class BodyCache:
+    """
+    Serialized bodies of read endpoints, keyed by (endpoint, query, data
+    version). A body is only ever served for the exact version it was
+    rendered from, so nothing needs invalidating: new readings bump the
+    version and stale entries age out of the LRU. Bounded by entry count
+    and total body bytes (a body larger than the byte budget is not kept).
+    """
+
+    def __init__(self, max_entries: int = BODY_CACHE_MAX_ENTRIES, max_bytes: int = BODY_CACHE_MAX_BYTES) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
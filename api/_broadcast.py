@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+_MISSING = object()
+
+
+class _StationFeed:
+    __slots__ = ("sent", "pending", "seq", "last_flush", "scheduled")
+
+    def __init__(self) -> None:
+        self.sent: Dict[str, Any] = {}          # state as of the last frame clients received
+        self.pending: Optional[Dict[str, Any]] = None
+        self.seq = 0
+        self.last_flush = float("-inf")
+        self.scheduled = False
+
+
+class DeltaBroadcaster:
+    """
+    Coalesced, delta-encoded fan-out of per-station sensor state.
+
+    ``publish`` only records the newest reading of a station. Frames go out
+    at most ``max_fps`` times per second per station, and each one carries
+    just the fields that changed since the previous frame::
+
+        sensor_delta {"station_id": "1", "seq": 42, "changed": {...}}
+
+    A burst of readings inside one frame interval collapses into a single
+    frame with the final values. Full snapshots are still sent as
+    ``sensor_update`` by the caller (on connect, subscribe or request);
+    ``seq`` increases by one per frame per station so clients can detect a
+    gap and ask for a snapshot again.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[..., Any],
+        rooms: Callable[[str], List[str]],
+        spawn: Callable[..., Any],
+        sleep: Callable[[float], Any],
+        max_fps: float = 4.0,
+        event: str = "sensor_delta",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._emit = emit
+        self._rooms = rooms
+        self._spawn = spawn
+        self._sleep = sleep
+        self.interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.event = event
+        self._clock = clock
+        self._feeds: Dict[str, _StationFeed] = {}
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.coalesced = 0
+
+    def publish(self, station_id: str, reading: Dict[str, Any]) -> None:
+        """Queue ``reading`` as the station's newest state; sends now or at the next frame slot."""
+        with self._lock:
+            feed = self._feeds.get(station_id)
+            if feed is None:
+                feed = self._feeds[station_id] = _StationFeed()
+            if feed.pending is not None:
+                self.coalesced += 1
+            feed.pending = reading
+            if feed.scheduled:
+                return
+            wait = feed.last_flush + self.interval - self._clock()
+            if wait > 0:
+                feed.scheduled = True
+        if wait > 0:
+            self._spawn(self._flush_later, station_id, wait)
+        else:
+            self.flush(station_id)
+
+    def _flush_later(self, station_id: str, delay: float) -> None:
+        self._sleep(delay)
+        self.flush(station_id)
+
+    def flush(self, station_id: str) -> None:
+        """Send the station's pending changes, if any, as one delta frame."""
+        with self._lock:
+            feed = self._feeds.get(station_id)
+            if feed is None:
+                return
+            feed.scheduled = False
+            reading, feed.pending = feed.pending, None
+            if reading is None:
+                return
+            sent = feed.sent
+            changed = {k: v for k, v in reading.items() if sent.get(k, _MISSING) != v}
+            feed.last_flush = self._clock()
+            if not changed:
+                return
+            feed.sent = dict(reading)
+            feed.seq += 1
+            frame = {"station_id": station_id, "seq": feed.seq, "changed": changed}
+            self.frames += 1
+        self._emit(self.event, frame, to=self._rooms(station_id))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stations": len(self._feeds),
+            "frames": self.frames,
+            "coalesced": self.coalesced,
+            "max_fps": round(1.0 / self.interval, 3) if self.interval else None,
+        }
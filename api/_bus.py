@@ -0,0 +1,360 @@
+from __future__ import annotations
+
+import abc
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from _log import get_logger
+
+CLUSTER_BUS_CHANNEL = os.getenv("CLUSTER_BUS_CHANNEL", "greenpulse")
+CLUSTER_BUS_HUB_BACKLOG = int(os.getenv("CLUSTER_BUS_HUB_BACKLOG", "10000"))   # messages queued per client
+RECONNECT_SECONDS = 1.0
+
+Handler = Callable[[str, Any], Any]
+
+
+def _thread(target: Callable[..., Any], *args: Any) -> threading.Thread:
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    # NaN stays NaN (missing wire values); only Python workers read the bus
+    return json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class Bus(abc.ABC):
+    """
+    Pub/sub between the workers of one deployment.
+
+    ``publish(event, data)`` hands a JSON-serializable event to every other
+    worker; handlers registered with ``subscribe`` are called as
+    ``handler(event, data)`` for events published by the others, never for
+    this worker's own. Delivery is best effort: events published while a
+    worker is disconnected are not replayed to it (counted as ``dropped`` on
+    the publishing side when it knows).
+    """
+
+    def __init__(self, worker_id: Optional[str] = None) -> None:
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: List[Handler] = []
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def subscribe(self, handler: Handler) -> None:
+        self._handlers.append(handler)
+
+    def publish(self, event: str, data: Any) -> None:
+        if self._send(_encode({"origin": self.worker_id, "event": event, "data": data})):
+            self.published += 1
+        else:
+            self.dropped += 1
+
+    @abc.abstractmethod
+    def _send(self, raw: bytes) -> bool:
+        """Hand ``raw`` to the transport; False when it was dropped."""
+
+    def _deliver(self, raw: bytes) -> None:
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            self.failed += 1
+            return
+        if message.get("origin") == self.worker_id:
+            return
+        self.received += 1
+        for handler in self._handlers:
+            try:
+                handler(message.get("event"), message.get("data"))
+            except Exception:
+                self.failed += 1
+                get_logger().exception("❌ Bus handler failed for %s", message.get("event"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def close(self) -> None:
+        pass
+
+
+class LocalBus(Bus):
+    """
+    Workers living in one process (tests, benchmarks): ``publish`` calls the
+    other ``LocalBus`` instances of the same ``group`` directly. Messages
+    still go through JSON so payloads behave exactly as on a real bus.
+    """
+
+    _groups: Dict[str, List["LocalBus"]] = {}
+
+    def __init__(self, group: str = "default", worker_id: Optional[str] = None) -> None:
+        super().__init__(worker_id)
+        self.group = group
+        self._groups.setdefault(group, []).append(self)
+
+    def _send(self, raw: bytes) -> bool:
+        for bus in list(self._groups.get(self.group, ())):
+            bus._deliver(raw)
+        return True
+
+    def close(self) -> None:
+        members = self._groups.get(self.group, [])
+        if self in members:
+            members.remove(self)
+
+
+class BusHub:
+    """
+    Relay for :class:`SocketBus`: every newline-delimited message a client
+    sends is written to every connected client (the sender filters its own
+    by origin). Run one per deployment, e.g. inside the primary worker or
+    standalone with ``python api/_bus.py [host:port]``.
+
+    Each client has its own writer and a queue of at most ``backlog``
+    messages, so a worker that stops reading never holds up the others:
+    once its queue is full it is disconnected (counted in
+    ``slow_clients``) and reconnects like after any other drop.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 spawn: Callable[..., Any] = _thread, backlog: int = CLUSTER_BUS_HUB_BACKLOG) -> None:
+        self._spawn = spawn
+        self._server = socket.create_server((host, port))
+        self.address: Tuple[str, int] = self._server.getsockname()[:2]
+        self.backlog = backlog
+        self._clients: Dict[socket.socket, "queue.Queue[Optional[bytes]]"] = {}
+        self._lock = threading.Lock()
+        self.relayed = 0
+        self.slow_clients = 0
+
+    def start(self) -> "BusHub":
+        self._spawn(self._accept)
+        return self
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return   # closed
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            outbox: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=self.backlog)
+            with self._lock:
+                self._clients[conn] = outbox
+            self._spawn(self._write, conn, outbox)
+            self._spawn(self._relay, conn)
+
+    def _relay(self, conn: socket.socket) -> None:
+        try:
+            for line in conn.makefile("rb"):
+                with self._lock:
+                    clients = list(self._clients.items())
+                for client, outbox in clients:
+                    try:
+                        outbox.put_nowait(line)
+                    except queue.Full:
+                        self.slow_clients += 1
+                        get_logger().warning("⚠️ Cluster bus client %s is not reading, disconnecting",
+                                             _peer(client))
+                        self._drop(client)
+                self.relayed += 1
+        except OSError:
+            pass
+        finally:
+            self._drop(conn)
+
+    def _write(self, conn: socket.socket, outbox: "queue.Queue[Optional[bytes]]") -> None:
+        while True:
+            line = outbox.get()
+            if line is None:
+                return
+            try:
+                conn.sendall(line)
+            except OSError:
+                self._drop(conn)
+                return
+
+    def _drop(self, conn: socket.socket) -> None:
+        with self._lock:
+            outbox = self._clients.pop(conn, None)
+        if outbox is None:
+            return
+        try:
+            outbox.put_nowait(None)   # stop the writer once it is idle
+        except queue.Full:
+            pass                      # its sendall fails on the shut down socket instead
+        try:
+            conn.shutdown(socket.SHUT_RDWR)   # wakes a writer blocked in sendall
+        except OSError:
+            pass
+        conn.close()
+
+    def close(self) -> None:
+        self._server.close()
+        with self._lock:
+            clients = list(self._clients)
+        for conn in clients:
+            self._drop(conn)
+
+
+def _peer(conn: socket.socket) -> str:
+    try:
+        return "%s:%d" % conn.getpeername()[:2]
+    except OSError:
+        return "?"
+
+
+class SocketBus(Bus):
+    """
+    Bus over one TCP connection to a :class:`BusHub` (``tcp://host:port``),
+    for several worker processes on one host or a private network. The
+    connection is re-established every ``RECONNECT_SECONDS`` while the hub
+    is unreachable; publishes in the meantime are dropped.
+    """
+
+    def __init__(self, host: str, port: int, spawn: Callable[..., Any] = _thread,
+                 worker_id: Optional[str] = None) -> None:
+        super().__init__(worker_id)
+        self.address = (host, port)
+        self._spawn = spawn
+        self._sock: Optional[socket.socket] = None
+        self._send_lock = threading.Lock()
+        self._closed = False
+        self._connect()
+        self._spawn(self._listen)
+
+    def _connect(self) -> bool:
+        try:
+            sock = socket.create_connection(self.address, timeout=5)
+        except OSError:
+            return False
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        return True
+
+    def _send(self, raw: bytes) -> bool:
+        sock = self._sock
+        if sock is None:
+            return False
+        try:
+            with self._send_lock:
+                sock.sendall(raw)
+        except OSError:
+            return False
+        return True
+
+    def _listen(self) -> None:
+        log = get_logger()
+        while not self._closed:
+            sock = self._sock
+            if sock is None:
+                time.sleep(RECONNECT_SECONDS)
+                if self._connect():
+                    log.info("🔗 Cluster bus reconnected to %s:%d", *self.address)
+                continue
+            try:
+                for line in sock.makefile("rb"):
+                    self._deliver(line)
+            except OSError:
+                pass
+            self._sock = None
+            if not self._closed:
+                log.warning("⚠️ Cluster bus lost connection to %s:%d", *self.address)
+
+    def close(self) -> None:
+        self._closed = True
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+class RedisBus(Bus):
+    """Bus over a Redis pub/sub channel (``redis://``); needs the ``redis`` package."""
+
+    def __init__(self, url: str, channel: str = CLUSTER_BUS_CHANNEL, spawn: Callable[..., Any] = _thread,
+                 worker_id: Optional[str] = None) -> None:
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("CLUSTER_BUS_URL=redis://… needs the redis package (pip install redis)") from exc
+        super().__init__(worker_id)
+        self._redis = redis
+        self._client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._closed = False
+        spawn(self._listen)
+
+    def _send(self, raw: bytes) -> bool:
+        try:
+            self._client.publish(self.channel, raw)
+        except self._redis.RedisError:
+            return False
+        return True
+
+    def _listen(self) -> None:
+        while not self._closed:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for item in pubsub.listen():
+                    self._deliver(item["data"])
+            except self._redis.RedisError as exc:
+                get_logger().warning("⚠️ Cluster bus Redis error: %s", exc)
+                time.sleep(RECONNECT_SECONDS)
+
+    def close(self) -> None:
+        self._closed = True
+        self._client.close()
+
+
+def open_bus(url: str, spawn: Callable[..., Any] = _thread, serve: bool = False,
+             worker_id: Optional[str] = None) -> Optional[Bus]:
+    """
+    Bus for ``url``: ``local://<group>``, ``tcp://host:port`` or
+    ``redis://…``; None for an empty url (single worker). With ``serve`` a
+    ``tcp://`` url also starts the :class:`BusHub` in this process.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == "local":
+        return LocalBus(parsed.netloc or "default", worker_id=worker_id)
+    if parsed.scheme == "tcp":
+        host, port = parsed.hostname or "127.0.0.1", parsed.port
+        if not port:
+            raise ValueError(f"Cluster bus url needs a port: {url}")
+        if serve:
+            BusHub(host, port, spawn=spawn).start()
+        return SocketBus(host, port, spawn=spawn, worker_id=worker_id)
+    if parsed.scheme in ("redis", "rediss"):
+        return RedisBus(url, spawn=spawn, worker_id=worker_id)
+    raise ValueError(f"Unknown cluster bus url: {url} (use local://, tcp:// or redis://)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    address = sys.argv[1] if len(sys.argv) > 1 else "127.0.0.1:7800"
+    hub_host, _, hub_port = address.rpartition(":")
+    hub = BusHub(hub_host or "127.0.0.1", int(hub_port))
+    print(f"🔗 Cluster bus hub listening on {hub.address[0]}:{hub.address[1]}")
+    hub._accept()
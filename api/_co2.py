@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from _efficiency import absorption_increments, get_numpy
+
+HOUR_SECONDS = 3600
+DAY_SECONDS = 86400
+
+
+class _BucketSeries:
+    """Bounded map of UTC-aligned bucket start → grams absorbed in that bucket."""
+
+    def __init__(self, width: int, max_buckets: int) -> None:
+        self.width = width
+        self.max_buckets = max_buckets
+        self._grams: Dict[int, float] = {}
+
+    def add(self, ts: float, grams: float) -> None:
+        start = int(ts // self.width) * self.width
+        if start in self._grams:
+            self._grams[start] += grams
+            return
+        self._grams[start] = grams
+        if len(self._grams) > self.max_buckets:
+            del self._grams[min(self._grams)]
+
+    def add_many(self, timestamps: Any, grams: Any) -> None:
+        """Bulk :meth:`add`; with NumPy the per-bucket sums are one grouped reduction."""
+        np = get_numpy()
+        if np is None:
+            for ts, g in zip(timestamps, grams):
+                self.add(ts, g)
+            return
+        starts, inverse = np.unique((np.asarray(timestamps) // self.width).astype(np.int64) * self.width,
+                                    return_inverse=True)
+        sums = np.bincount(inverse, weights=grams, minlength=len(starts))
+        for start, g in zip(starts.tolist(), sums.tolist()):
+            self._grams[start] = self._grams.get(start, 0.0) + g
+        if len(self._grams) > self.max_buckets:
+            for start in sorted(self._grams)[:-self.max_buckets]:
+                del self._grams[start]
+
+    def snapshot(self, total_grams: float) -> List[Dict[str, Any]]:
+        """
+        Buckets oldest first with the running total at the end of each one.
+
+        The cumulative value is derived backwards from the overall total, so it
+        stays correct after old buckets have been evicted.
+        """
+        starts = sorted(self._grams)
+        cumulative = total_grams
+        rows: List[Dict[str, Any]] = []
+        for start in reversed(starts):
+            grams = self._grams[start]
+            rows.append({
+                "start": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+                "grams": round(grams, 3),
+                "cumulative_grams": round(cumulative, 3),
+            })
+            cumulative -= grams
+        rows.reverse()
+        return rows
+
+
+class Co2Accumulator:
+    """
+    Running CO2-absorption estimate maintained at ingest time.
+
+    Each reading adds ``efficiency × grams_per_hour_max × Δt`` where Δt is the
+    gap to the previous reading in hours (capped at ``max_interval_hours``).
+    The total never depends on what the history buffer still holds, and reads
+    are O(1). Per-hour and per-day buckets are kept for the cumulative chart.
+    """
+
+    def __init__(
+        self,
+        grams_per_hour_max: float,
+        max_interval_hours: float = 1.0,
+        hourly_buckets: int = 24 * 7,
+        daily_buckets: int = 366,
+    ) -> None:
+        self.grams_per_hour_max = grams_per_hour_max
+        self.max_interval_hours = max_interval_hours
+        self.total_grams = 0.0
+        self.records = 0
+        self._last_ts: Optional[float] = None
+        self._buckets = {
+            "hour": _BucketSeries(HOUR_SECONDS, hourly_buckets),
+            "day": _BucketSeries(DAY_SECONDS, daily_buckets),
+        }
+
+    def add(self, ts: float, efficiency: float) -> float:
+        """Account for one reading taken at epoch-second ``ts``; returns grams added."""
+        last_ts = self._last_ts
+        if last_ts is None or ts > last_ts:
+            self._last_ts = ts
+        if last_ts is None:
+            return 0.0
+
+        hours = min(max(ts - last_ts, 0.0) / HOUR_SECONDS, self.max_interval_hours)
+        grams = efficiency * self.grams_per_hour_max * hours
+        self.total_grams += grams
+        self.records += 1
+        for series in self._buckets.values():
+            series.add(ts, grams)
+        return grams
+
+    def extend(self, timestamps: Iterable[float], efficiencies: Iterable[float]) -> float:
+        """
+        Account for a whole batch of readings at once (backfill, log replay);
+        same result as calling :meth:`add` per reading. Returns grams added.
+        """
+        np = get_numpy()
+        if np is not None:
+            timestamps = np.asarray(timestamps, dtype=float)
+        elif not isinstance(timestamps, (list, tuple)):
+            timestamps = list(timestamps)
+        first = self._last_ts is None
+        grams, last_ts = absorption_increments(
+            timestamps, efficiencies, self.grams_per_hour_max, self.max_interval_hours, self._last_ts,
+        )
+        if not len(grams):
+            return 0.0
+        added = float(sum(grams)) if np is None else float(grams.sum())
+        self._last_ts = last_ts
+        self.total_grams += added
+        self.records += len(grams) - (1 if first else 0)
+        for series in self._buckets.values():
+            series.add_many(timestamps, grams)
+        return added
+
+    def buckets(self, resolution: str) -> List[Dict[str, Any]]:
+        """Per-``'hour'`` or per-``'day'`` series; raises KeyError for other values."""
+        return self._buckets[resolution].snapshot(self.total_grams)
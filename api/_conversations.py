@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional
+
+from _metrics import REGISTRY
+
+CONVERSATION_TTL_SECONDS = float(os.getenv("CONVERSATION_TTL_SECONDS", "3600"))
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "1500"))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv("CONVERSATION_SUMMARY_TOKENS", "300"))
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "")
+
+SESSION_ID_MAX_LENGTH = 64
+SUMMARY_HEADER = "Summary of earlier turns in this conversation (oldest first):"
+SNIPPET_CHARS = 160
+
+CONVERSATION_LOOKUPS = REGISTRY.counter(
+    "greenpulse_conversation_lookups_total",
+    "Chat session lookups (hit = stored context found, miss = new, expired or evicted session)",
+    ["result"],
+)
+CONVERSATION_SUMMARIZED = REGISTRY.counter(
+    "greenpulse_conversation_turns_summarized_total",
+    "Older user/assistant turns folded into a session's rolling summary",
+)
+
+Message = Dict[str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token plus per-message overhead)."""
+    return len(text) // 4 + 4
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS - 1].rstrip() + "…"
+
+
+def new_session_id() -> str:
+    return os.urandom(16).hex()
+
+
+def valid_session_id(value: Any) -> bool:
+    """Client-supplied ids are opaque, but kept short and to [A-Za-z0-9_-]."""
+    return (
+        isinstance(value, str)
+        and 0 < len(value) <= SESSION_ID_MAX_LENGTH
+        and value.isascii()
+        and value.replace("-", "").replace("_", "").isalnum()
+    )
+
+
+def resolve_session(body: Mapping[str, Any]) -> Optional[str]:
+    """
+    Session id for a chat request body: the client's own when valid, a new
+    one otherwise, or None for legacy clients that still post ``history``
+    without a ``session_id`` (their history is used as before).
+    """
+    value = body.get("session_id")
+    if valid_session_id(value):
+        return value
+    if value is None and body.get("history"):
+        return None
+    return new_session_id()
+
+
+class Conversation:
+    """
+    One chat session: the newest turns verbatim, within ``token_budget``, and
+    a rolling summary of the turns that no longer fit, within ``summary_tokens``
+    (its oldest lines are dropped first).
+    """
+
+    __slots__ = ("session_id", "summary", "turns", "tokens", "updated")
+
+    def __init__(
+        self,
+        session_id: str,
+        summary: Optional[List[str]] = None,
+        turns: Optional[List[Message]] = None,
+        updated: float = 0.0,
+    ) -> None:
+        self.session_id = session_id
+        self.summary = summary or []
+        self.turns = turns or []
+        self.tokens = sum(estimate_tokens(turn["content"]) for turn in self.turns)
+        self.updated = updated
+
+    def messages(self) -> List[Message]:
+        """Context to send after the system prompt: the summary (if any), then the kept turns."""
+        context = list(self.turns)
+        if self.summary:
+            context.insert(0, {"role": "system", "content": "\n".join([SUMMARY_HEADER, *self.summary])})
+        return context
+
+    def add(self, user_message: str, reply: str, token_budget: int, summary_tokens: int) -> None:
+        for role, content in (("user", user_message), ("assistant", reply)):
+            self.turns.append({"role": role, "content": content})
+            self.tokens += estimate_tokens(content)
+
+        folded = 0
+        while self.tokens > token_budget and len(self.turns) > 2:
+            asked, answered = self.turns[0], self.turns[1]
+            del self.turns[:2]
+            self.tokens -= estimate_tokens(asked["content"]) + estimate_tokens(answered["content"])
+            self.summary.append(f"- User: {_snippet(asked['content'])} / Assistant: {_snippet(answered['content'])}")
+            folded += 1
+        if folded:
+            CONVERSATION_SUMMARIZED.inc(folded)
+            while len(self.summary) > 1 and sum(map(estimate_tokens, self.summary)) > summary_tokens:
+                del self.summary[0]
+
+
+class ConversationStore:
+    """
+    Session-keyed chat context, so clients send a ``session_id`` and the new
+    message instead of their whole history. Sessions idle for ``ttl`` seconds
+    expire; beyond ``max_sessions`` the least recently used are evicted.
+
+    Keeps everything in process memory; see :class:`SQLiteConversationStore`
+    for sessions that survive restarts and are shared between workers.
+    """
+
+    def __init__(
+        self,
+        ttl: float = CONVERSATION_TTL_SECONDS,
+        max_sessions: int = CONVERSATION_MAX_SESSIONS,
+        token_budget: int = CONVERSATION_TOKEN_BUDGET,
+        summary_tokens: int = CONVERSATION_SUMMARY_TOKENS,
+    ) -> None:
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def messages(self, session_id: str) -> List[Message]:
+        """Stored context for ``session_id``; empty for a new, expired or evicted session."""
+        with self._lock:
+            conversation = self._load(session_id, time.time())
+        CONVERSATION_LOOKUPS.inc(result="hit" if conversation else "miss")
+        return conversation.messages() if conversation else []
+
+    def append(self, session_id: str, user_message: str, reply: str) -> None:
+        """Record one answered turn."""
+        now = time.time()
+        with self._lock:
+            conversation = self._load(session_id, now) or Conversation(session_id)
+            conversation.add(user_message, reply, self.token_budget, self.summary_tokens)
+            conversation.updated = now
+            self._save(conversation)
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    # Storage; called with the lock held
+
+    def _load(self, session_id: str, now: float) -> Optional[Conversation]:
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            return None
+        if now - conversation.updated > self.ttl:
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return conversation
+
+    def _save(self, conversation: Conversation) -> None:
+        self._sessions[conversation.session_id] = conversation
+        self._sessions.move_to_end(conversation.session_id)
+        cutoff = conversation.updated - self.ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and oldest.updated >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    :class:`ConversationStore` kept in a SQLite file (CONVERSATION_DB): one
+    row per session holding its summary and kept turns, so a lookup reads a
+    bounded amount of JSON however long the conversation has run. Expired and
+    surplus sessions are pruned every ``prune_every`` writes.
+    """
+
+    def __init__(self, path: str, prune_every: int = 64, **settings: Any) -> None:
+        import sqlite3   # only deployments that configure a database pay for the import
+
+        super().__init__(**settings)
+        self.path = path
+        self.prune_every = prune_every
+        self._writes = 0
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, turns TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+
+    def _load(self, session_id: str, now: float) -> Optional[Conversation]:
+        row = self._db.execute(
+            "SELECT summary, turns, updated FROM conversations WHERE session_id = ? AND updated >= ?",
+            (session_id, now - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        summary, turns, updated = row
+        return Conversation(session_id, json.loads(summary), json.loads(turns), updated)
+
+    def _save(self, conversation: Conversation) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO conversations (session_id, summary, turns, updated) VALUES (?, ?, ?, ?)",
+            (
+                conversation.session_id,
+                json.dumps(conversation.summary, ensure_ascii=False),
+                json.dumps(conversation.turns, ensure_ascii=False),
+                conversation.updated,
+            ),
+        )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self._prune(conversation.updated)
+
+    def _prune(self, now: float) -> None:
+        self._db.execute("DELETE FROM conversations WHERE updated < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM conversations WHERE session_id IN "
+            "(SELECT session_id FROM conversations ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+
+_STORE: Optional[ConversationStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store() -> ConversationStore:
+    """Process-wide store: SQLite when CONVERSATION_DB is set, in-memory otherwise."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = SQLiteConversationStore(CONVERSATION_DB) if CONVERSATION_DB else ConversationStore()
+    return _STORE
+
+
+REGISTRY.gauge("greenpulse_conversation_sessions", "Chat sessions held by the conversation store",
+               callback=lambda: len(_STORE) if _STORE is not None else 0)
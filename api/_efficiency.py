@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from array import array
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np   # annotations only; imported lazily at runtime by get_numpy()
+
+_UNLOADED = object()
+_np: Any = _UNLOADED
+
+HOUR_SECONDS = 3600
+
+# ── Photosynthetic efficiency model ──────────────────────────────────────────
+# Based on Chlorella vulgaris growth curves (Converti et al., 2009;
+# Ugwu et al., 2008). Temperature is the primary limiting factor.
+# Optimal range: 20–30°C → 100%; deviations reduce efficiency stepwise.
+CO2_GRAMS_PER_HOUR_MAX = 4.34   # = 38 kg/year ÷ 8760 h — theoretical maximum
+                                  # Assumes 100% photosynthetic efficiency,
+                                  # adequate light (>400 lux) and pH 6.5–7.5
+
+Numbers = Union[Sequence[float], "np.ndarray"]
+
+
+def get_numpy() -> Any:
+    """
+    NumPy, imported on first use; None when it is not installed (every
+    function below has a pure-Python path). Functions that only need the
+    scalar :func:`photo_efficiency` never pay for the import.
+    """
+    global _np
+    if _np is _UNLOADED:
+        try:
+            import numpy
+        except ImportError:   # pragma: no cover - depends on the deployment
+            numpy = None
+        _np = numpy
+    return _np
+
+
+def photo_efficiency(temp: Optional[float]) -> float:
+    """
+    Returns efficiency coefficient 0.0–1.0 based on temperature.
+    Model: piecewise approximation of Chlorella vulgaris growth response.
+    Source: Converti et al. (2009), Bioresource Technology 100(1):556-561.
+    Missing readings (None or NaN) count as 0.
+    """
+    if temp is None or temp != temp:
+        return 0.0
+    if temp >= 40 or temp < 0:
+        return 0.0
+    if temp < 10:
+        return 0.02
+    if temp < 15:
+        return 0.15
+    if temp < 20:
+        return 0.45
+    if temp <= 30:
+        return 1.0
+    if temp <= 35:
+        return 0.50
+    return 0.10
+
+
+def _as_array(values: Iterable[Any]) -> "np.ndarray":
+    np = get_numpy()
+    if isinstance(values, np.ndarray):
+        return values.astype(float, copy=False)
+    if isinstance(values, (memoryview, array)) and memoryview(values).format == "d":
+        return np.frombuffer(values, dtype=float)
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def photo_efficiency_array(temps: Iterable[Any]) -> Numbers:
+    """
+    :func:`photo_efficiency` over a whole column of temperatures in one call.
+
+    Accepts any iterable of floats (None/NaN = missing), including the
+    ``array('d')`` memoryviews returned by ``HistoryView.segments``. Returns
+    a float64 ndarray with NumPy, a list of floats without.
+    """
+    np = get_numpy()
+    if np is None:
+        return [photo_efficiency(t) for t in temps]
+    t = _as_array(temps)
+    with np.errstate(invalid="ignore"):
+        return np.select(
+            [np.isnan(t) | (t < 0) | (t >= 40), t < 10, t < 15, t < 20, t <= 30, t <= 35],
+            [0.0, 0.02, 0.15, 0.45, 1.0, 0.50],
+            default=0.10,
+        )
+
+
+def absorption_increments(
+    timestamps: Iterable[float],
+    efficiencies: Iterable[float],
+    grams_per_hour_max: float = CO2_GRAMS_PER_HOUR_MAX,
+    max_interval_hours: float = 1.0,
+    last_ts: Optional[float] = None,
+) -> Tuple[Numbers, Optional[float]]:
+    """
+    Grams absorbed at each reading and the newest timestamp seen.
+
+    Same rule as ``Co2Accumulator.add``: each reading contributes
+    ``efficiency × grams_per_hour_max × Δt``, with Δt the gap in hours to
+    the newest earlier reading, clamped to ``[0, max_interval_hours]``.
+    ``last_ts`` continues from a previous batch; without it the first
+    reading only sets the reference time and contributes 0.
+    """
+    np = get_numpy()
+    if np is None:
+        grams: List[float] = []
+        for ts, eff in zip(timestamps, efficiencies):
+            if last_ts is None:
+                grams.append(0.0)
+                last_ts = ts
+                continue
+            hours = min(max(ts - last_ts, 0.0) / HOUR_SECONDS, max_interval_hours)
+            grams.append(eff * grams_per_hour_max * hours)
+            if ts > last_ts:
+                last_ts = ts
+        return grams, last_ts
+
+    ts = _as_array(timestamps)
+    eff = _as_array(efficiencies)
+    if not len(ts):
+        return np.zeros(0), last_ts
+    newest = np.maximum.accumulate(ts if last_ts is None else np.maximum(ts, last_ts))
+    previous = np.empty_like(ts)
+    previous[1:] = newest[:-1]
+    previous[0] = ts[0] if last_ts is None else last_ts
+    hours = np.clip((ts - previous) / HOUR_SECONDS, 0.0, max_interval_hours)
+    return eff * grams_per_hour_max * hours, float(newest[-1])
+
+
+def cumulative_absorption(
+    timestamps: Iterable[float],
+    temperatures: Iterable[Any],
+    grams_per_hour_max: float = CO2_GRAMS_PER_HOUR_MAX,
+    max_interval_hours: float = 1.0,
+) -> Numbers:
+    """Running CO2 total (grams) after each reading of a history or log segment."""
+    grams, _ = absorption_increments(
+        timestamps, photo_efficiency_array(temperatures), grams_per_hour_max, max_interval_hours,
+    )
+    np = get_numpy()
+    if np is None:
+        total = 0.0
+        running = []
+        for g in grams:
+            total += g
+            running.append(total)
+        return running
+    return np.cumsum(grams)
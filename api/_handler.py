@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Dict, List, Mapping, Optional
+from urllib.parse import parse_qs, urlsplit
+
+JSON_CONTENT_TYPE = "application/json"
+
+_UNLOADED = object()
+_orjson: Any = _UNLOADED
+
+
+def _get_orjson() -> Any:
+    # orjson is optional and imported on first use: it pulls in uuid and
+    # zoneinfo (~7 ms), which would otherwise land on every cold start.
+    global _orjson
+    if _orjson is _UNLOADED:
+        try:
+            import orjson
+        except ImportError:   # pragma: no cover - depends on the deployment
+            orjson = None
+        _orjson = orjson
+    return _orjson
+
+
+def dumps(payload: Any) -> bytes:
+    """UTF-8 JSON body (non-ASCII kept as is); orjson when installed."""
+    orjson = _get_orjson()
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def loads(body: bytes) -> Any:
+    """Parse a JSON body; ValueError when it is not JSON."""
+    orjson = _get_orjson()
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    """
+    Base of the Vercel functions in api/: CORS preflight, query and body
+    parsing, and JSON responses.
+
+    Subclasses implement ``do_GET`` / ``do_POST`` and list them in
+    ``allowed_methods``. Request logging is off (Vercel logs every
+    invocation already), so a request costs no stderr write.
+    """
+
+    allowed_methods = "GET, POST, OPTIONS"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _cors(self) -> None:
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", self.allowed_methods)
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+
+    def do_OPTIONS(self) -> None:
+        self.send_response(200)
+        self._cors()
+        self.end_headers()
+
+    # ── Request ──────────────────────────────────────────────────────────────
+
+    def _query(self) -> Dict[str, List[str]]:
+        return parse_qs(urlsplit(self.path).query)
+
+    def _param(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """First value of query parameter ``name``."""
+        return self._query().get(name, [default])[0]
+
+    def _content_type(self) -> str:
+        return (self.headers.get("Content-Type") or "").split(";")[0].strip()
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _read_json(self, body: Optional[bytes] = None) -> Any:
+        """Request body as JSON; an empty or invalid body reads as ``{}``."""
+        body = self._read_body() if body is None else body
+        if not body:
+            return {}
+        try:
+            return loads(body)
+        except ValueError:
+            return {}
+
+    # ── Response ─────────────────────────────────────────────────────────────
+
+    def _respond(self, status: int, payload: Any) -> None:
+        self._respond_bytes(status, dumps(payload))
+
+    def _respond_bytes(
+        self,
+        status: int,
+        body: bytes,
+        content_type: str = JSON_CONTENT_TYPE,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """Send an already encoded body (e.g. a cached, pre-serialized payload)."""
+        self.send_response(status)
+        self._cors()
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import math
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+NAN = float("nan")
+
+
+def _as_float(value: Any) -> float:
+    if value is None:
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+class SensorHistory:
+    """
+    Fixed-capacity columnar ring buffer of sensor readings.
+
+    Every numeric field lives in its own ``array('d')`` column and timestamps
+    are stored as epoch seconds, so appending a reading is O(1) and never
+    allocates a per-reading dict. Missing values are stored as NaN. Text
+    fields (station name and friends) use a plain preallocated list column.
+    """
+
+    def __init__(
+        self,
+        numeric_fields: Iterable[str],
+        text_fields: Iterable[str] = (),
+        capacity: int = 500,
+        int_fields: Iterable[str] = (),
+        bool_fields: Iterable[str] = (),
+    ) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = capacity
+        self.numeric_fields: Tuple[str, ...] = tuple(numeric_fields)
+        self.text_fields: Tuple[str, ...] = tuple(text_fields)
+        self._int_fields = frozenset(int_fields)
+        self._bool_fields = frozenset(bool_fields)
+        self._timestamps = array("d", [0.0]) * capacity
+        self._columns: Dict[str, array] = {
+            field: array("d", [NAN]) * capacity for field in self.numeric_fields
+        }
+        self._text: Dict[str, List[Optional[str]]] = {
+            field: [None] * capacity for field in self.text_fields
+        }
+        self._head = 0   # next slot to write
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def clear(self) -> None:
+        self._head = 0
+        self._size = 0
+
+    def append(self, reading: Dict[str, Any], ts: float) -> None:
+        """Store one reading at epoch-second ``ts``, evicting the oldest if full."""
+        i = self._head
+        self._timestamps[i] = ts
+        for field, column in self._columns.items():
+            column[i] = _as_float(reading.get(field))
+        for field, column in self._text.items():
+            column[i] = reading.get(field)
+        self._head = i + 1 if i + 1 < self.capacity else 0
+        if self._size < self.capacity:
+            self._size += 1
+
+    def append_values(
+        self,
+        ts: float,
+        values: Sequence[float],
+        texts: Sequence[Any] = (),
+        carry: bool = True,
+    ) -> Tuple[List[float], List[Any]]:
+        """
+        Store one reading given positionally: floats in ``numeric_fields``
+        order (NaN = missing) and text values in ``text_fields`` order (None =
+        missing; shorter than the text fields is fine). No dict is built.
+
+        With ``carry`` a missing value repeats the previous row, the same as
+        merging a partial reading into the latest one. Returns the stored
+        ``(numbers, texts)`` row.
+        """
+        i = self._head
+        prev = (i - 1) % self.capacity if carry and self._size else -1
+        self._timestamps[i] = ts
+        numbers = []
+        for column, value in zip(self._columns.values(), values):
+            if value != value and prev >= 0:
+                value = column[prev]
+            column[i] = value
+            numbers.append(value)
+        stored_texts = []
+        for n, column in enumerate(self._text.values()):
+            value = texts[n] if n < len(texts) else None
+            if value is None and prev >= 0:
+                value = column[prev]
+            column[i] = value
+            stored_texts.append(value)
+        self._head = i + 1 if i + 1 < self.capacity else 0
+        if self._size < self.capacity:
+            self._size += 1
+        return numbers, stored_texts
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Newest reading as a row dict, or None when empty."""
+        for row in self.view(1):
+            return row
+        return None
+
+    def _spans(self, limit: Optional[int]) -> List[Tuple[int, int]]:
+        """Physical index ranges covering the newest ``limit`` rows, oldest first."""
+        count = self._size if limit is None else max(0, min(limit, self._size))
+        if not count:
+            return []
+        start = self._head - count
+        if start >= 0:
+            return [(start, self._head)]
+        return [(self.capacity + start, self.capacity), (0, self._head)]
+
+    def view(self, limit: Optional[int] = None) -> "HistoryView":
+        """Zero-copy view over the newest ``limit`` readings."""
+        return HistoryView(self, self._spans(limit))
+
+    def last_timestamp(self) -> Optional[float]:
+        if not self._size:
+            return None
+        return self._timestamps[self._head - 1]
+
+
+class HistoryView:
+    """
+    Read-only window onto a :class:`SensorHistory`.
+
+    Columns are exposed as ``memoryview`` slices of the underlying arrays (one
+    or two segments when the window wraps), so nothing is copied until rows
+    are materialized for serialization.
+    """
+
+    def __init__(self, history: SensorHistory, spans: Sequence[Tuple[int, int]]) -> None:
+        self._history = history
+        self._spans = list(spans)
+        self._length = sum(stop - start for start, stop in self._spans)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def segments(self, field: str) -> List[memoryview]:
+        """Memoryview segments for ``field`` (or ``'timestamp'``), oldest first."""
+        if field == "timestamp":
+            source = self._history._timestamps
+        else:
+            source = self._history._columns[field]
+        view = memoryview(source)
+        return [view[start:stop] for start, stop in self._spans]
+
+    def column(self, field: str) -> Iterator[float]:
+        for segment in self.segments(field):
+            yield from segment
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        history = self._history
+        int_fields = history._int_fields
+        bool_fields = history._bool_fields
+        for start, stop in self._spans:
+            for i in range(start, stop):
+                row: Dict[str, Any] = {
+                    "timestamp": datetime.fromtimestamp(history._timestamps[i], timezone.utc).isoformat(),
+                }
+                for field, column in history._text.items():
+                    value = column[i]
+                    if value is not None:
+                        row[field] = value
+                for field, column in history._columns.items():
+                    value = column[i]
+                    if math.isnan(value):
+                        continue
+                    if field in bool_fields:
+                        row[field] = bool(value)
+                    elif field in int_fields:
+                        row[field] = int(value)
+                    else:
+                        row[field] = value
+                yield row
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self)
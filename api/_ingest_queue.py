@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from _log import get_logger
+from _metrics import REGISTRY
+
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "10000"))          # readings waiting to be applied
+INGEST_RETRY_AFTER_SECONDS = int(os.getenv("INGEST_RETRY_AFTER_SECONDS", "2"))
+
+INGEST_QUEUE_WAIT = REGISTRY.histogram(
+    "greenpulse_ingest_queue_wait_seconds", "Time from accepting a sensor POST to applying it")
+INGEST_QUEUE_REJECTED = REGISTRY.counter(
+    "greenpulse_ingest_queue_rejected_total", "Readings refused with 429 because the ingest queue was full")
+
+# (kind, payload, received at epoch seconds, reading count, enqueued at monotonic seconds)
+_Item = Tuple[str, Any, float, int, float]
+
+
+class IngestQueue:
+    """
+    Write-behind queue between the sensor POST handler and the state updates.
+
+    The handler validates a request and ``submit``s it; a single consumer
+    (started with ``spawn``, e.g. a green thread under eventlet) calls
+    ``process(kind, payload, received)`` for each request in arrival order,
+    with ``received`` the epoch time the POST was accepted so readings keep
+    their arrival timestamp however long they waited.
+
+    The bound is on readings, not requests: ``submit`` refuses a request
+    (returns False) when it would take the backlog past ``max_pending`` (an
+    empty queue takes any request), and the caller answers 429 with
+    ``retry_after``. Nothing already accepted is ever dropped.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[str, Any, float], Any],
+        spawn: Callable[..., Any],
+        max_pending: int = INGEST_QUEUE_MAX,
+        retry_after: int = INGEST_RETRY_AFTER_SECONDS,
+        sleep: Optional[Callable[[float], Any]] = None,
+        burst: int = 1000,
+    ) -> None:
+        self._process = process
+        self._spawn = spawn
+        self._sleep = sleep
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.burst = burst    # requests applied back to back before yielding to ``sleep``
+        self._queue: "queue.Queue[_Item]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self.pending = 0      # readings accepted but not applied yet
+        self.accepted = 0
+        self.applied = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def submit(self, kind: str, payload: Any, count: int = 1) -> bool:
+        """Queue ``count`` readings for the consumer; False when the queue is full."""
+        with self._lock:
+            if self.pending and self.pending + count > self.max_pending:
+                self.rejected += count
+                INGEST_QUEUE_REJECTED.inc(count)
+                return False
+            self.pending += count
+            self.accepted += count
+            if not self._started:
+                self._started = True
+                self._spawn(self._run)
+        self._queue.put((kind, payload, time.time(), count, time.monotonic()))
+        return True
+
+    def _run(self) -> None:
+        log = get_logger()
+        burst = 0
+        while True:
+            if burst >= self.burst or (burst and self._queue.empty()):
+                burst = 0
+                if self._sleep is not None:
+                    self._sleep(0)   # let request handlers run between bursts
+            kind, payload, received, count, enqueued = self._queue.get()
+            burst += 1
+            INGEST_QUEUE_WAIT.observe(time.monotonic() - enqueued)
+            try:
+                self._process(kind, payload, received)
+            except Exception:
+                self.failed += count
+                log.exception("❌ Queued %s ingest failed", kind)
+            else:
+                self.applied += count
+            finally:
+                with self._lock:
+                    self.pending -= count
+                self._queue.task_done()
+
+    def join(self) -> None:
+        """Block until everything submitted so far has been applied."""
+        self._queue.join()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "accepted": self.accepted,
+            "applied": self.applied,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
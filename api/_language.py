@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from typing import Dict, FrozenSet, List, Tuple
+
+DEFAULT_LANGUAGE = "en"
+
+# Non-Latin scripts: (class, code point ranges). A message is in the script
+# with the most letters; Latin letters compete through the stop words below.
+_SCRIPT_RANGES: Tuple[Tuple[str, Tuple[Tuple[int, int], ...]], ...] = (
+    ("cyrillic", ((0x0400, 0x04FF), (0x0500, 0x052F))),
+    ("han", ((0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF))),
+    ("kana", ((0x3040, 0x309F), (0x30A0, 0x30FF), (0x31F0, 0x31FF))),
+    ("hangul", ((0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF))),
+    ("arabic", ((0x0600, 0x06FF), (0x0750, 0x077F))),
+    ("hebrew", ((0x0590, 0x05FF),)),
+    ("devanagari", ((0x0900, 0x097F),)),
+    ("thai", ((0x0E00, 0x0E7F),)),
+    ("greek", ((0x0370, 0x03FF), (0x1F00, 0x1FFF))),
+)
+# Cyrillic letters used by Kazakh but not Russian
+_KAZAKH_LETTERS = "әіңғүұқөһӘІҢҒҮҰҚӨҺ"
+
+_SCRIPT_LANGUAGE = {
+    "cyrillic": "ru", "han": "zh", "kana": "ja", "hangul": "ko",
+    "arabic": "ar", "hebrew": "he", "devanagari": "hi", "thai": "th", "greek": "el",
+}
+
+# Function words per Latin-script language, scored on whole tokens only.
+# Shared words ("la", "de", "es"...) count for every language listing them.
+_STOP_WORDS: Dict[str, FrozenSet[str]] = {
+    "en": frozenset(
+        "the a an and or is are was were be been of to in on at it this that these those what which "
+        "who how why when where do does did can could should would will my your our you i we they "
+        "with for from about not no yes have has there hello hi thanks please".split()
+    ),
+    "es": frozenset(
+        "el la los las un una unos unas es son está están y o de del al en que qué cómo cuál por para "
+        "con sin se su sus mi lo le no sí hola gracias muy más también pero este esta porque cuando".split()
+    ),
+    "fr": frozenset(
+        "le la les un une des du de au aux et ou est sont que qui quoi quel quelle comment pourquoi "
+        "pour avec dans sur pas ne ce cette je tu il elle nous vous ils mon ma mes bonjour merci "
+        "très aussi mais c l j qu".split()
+    ),
+    "de": frozenset(
+        "der die das den dem des ein eine einen einem und oder ist sind war nicht kein keine wie was "
+        "warum wann wo wer mit für von zu auf im ich du er sie wir ihr es hallo danke bitte sehr auch "
+        "aber wenn kann können".split()
+    ),
+}
+# Letters that occur in one Latin-script language only (among those above)
+_LETTER_HINTS = {"ñ": "es", "¿": "es", "¡": "es", "ß": "de", "ä": "de", "ö": "de", "ç": "fr",
+                 "œ": "fr", "è": "fr", "ê": "fr", "à": "fr", "â": "fr", "î": "fr", "ô": "fr", "û": "fr"}
+_LATIN_ORDER = ("en", "es", "fr", "de")   # tie-break, English first
+
+_WORD_LANGUAGES: Dict[str, Tuple[str, ...]] = {}
+for _language in _LATIN_ORDER:
+    for _word in _STOP_WORDS[_language]:
+        _WORD_LANGUAGES[_word] = _WORD_LANGUAGES.get(_word, ()) + (_language,)
+del _language, _word
+
+# ── Character table ──────────────────────────────────────────────────────────
+# str.translate classifies every character in one C-level pass through a flat
+# table (one entry per BMP code point, built from the ranges above): Latin
+# letters map to their lower case, letters of the other scripts to a marker,
+# anything else to a space. The markers are Unicode spaces (U+2000...), so
+# str.split() on the result yields just the Latin words. Only the first
+# MAX_SCAN_CHARS characters are read: the start of a message decides its
+# language.
+
+MAX_SCAN_CHARS = 160
+
+_CLASSES = tuple(name for name, _ in _SCRIPT_RANGES) + ("kazakh",)
+_MARKERS = tuple(chr(0x2000 + index) for index in range(len(_CLASSES)))
+_MARKER_CLASS = dict(zip(_MARKERS, _CLASSES))
+assert all(marker.isspace() for marker in _MARKERS)
+
+
+def _build_table() -> List[str]:
+    table = [" "] * 0x10000
+    for code in range(0x0250):   # Basic Latin ... Latin Extended-B
+        char = chr(code)
+        if char.isalpha():
+            table[code] = char.lower()
+    for marker, (_, ranges) in zip(_MARKERS, _SCRIPT_RANGES):
+        for low, high in ranges:
+            table[low:high + 1] = [marker] * (high + 1 - low)
+    for char in _KAZAKH_LETTERS:
+        table[ord(char)] = _MARKERS[-1]
+    for char in "¿¡":   # tokens of their own, see _LETTER_HINTS
+        table[ord(char)] = f" {char} "
+    return table
+
+
+_TABLE = _build_table()
+
+
+def _script_language(classes: str, words: List[str]) -> str:
+    """Language of the dominant non-Latin script, "" when Latin letters outnumber it."""
+    letters = {name: classes.count(marker) for marker, name in _MARKER_CLASS.items() if marker in classes}
+    if not letters:
+        return ""
+    # Kazakh and Russian share most of the alphabet; Japanese mixes kana with kanji
+    kazakh = letters.pop("kazakh", 0)
+    if kazakh:
+        letters["cyrillic"] = letters.get("cyrillic", 0) + kazakh
+    if "kana" in letters:
+        letters["kana"] += letters.pop("han", 0)
+    script = max(letters, key=letters.__getitem__)
+    if letters[script] < sum(map(len, words)):
+        return ""
+    if script == "cyrillic" and kazakh:
+        return "kk"
+    return _SCRIPT_LANGUAGE[script]
+
+
+def _latin_language(classes: str, words: List[str]) -> str:
+    scores = dict.fromkeys(_LATIN_ORDER, 0)
+    for languages in filter(None, map(_WORD_LANGUAGES.get, words)):
+        for language in languages:
+            scores[language] += 1
+    if not classes.isascii():
+        for char, language in _LETTER_HINTS.items():
+            if char in classes:
+                scores[language] += classes.count(char)
+    return max(_LATIN_ORDER, key=scores.__getitem__)
+
+
+def detect_language(text: str) -> str:
+    """
+    ISO 639-1 code of the language ``text`` is most likely written in
+    (``ru kk zh ja ko ar he hi th el es fr de en``), ``en`` when unsure.
+
+    Deterministic for a given text, so it is safe to use in cache keys.
+    """
+    if not text:
+        return DEFAULT_LANGUAGE
+    classes = text[:MAX_SCAN_CHARS].translate(_TABLE)
+    words = classes.split()
+    if not classes.isascii():
+        language = _script_language(classes, words)
+        if language:
+            return language
+    return _latin_language(classes, words) if words else DEFAULT_LANGUAGE
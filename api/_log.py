@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_SECONDS = float(os.getenv("LOG_SAMPLE_SECONDS", "10"))
+
+_LISTENER: Optional[logging.handlers.QueueListener] = None
+
+
+def get_logger(name: str = "greenpulse") -> logging.Logger:
+    """
+    Logger whose records are only queued by the caller; a background
+    QueueListener formats them and writes to stdout, so request handlers
+    never block on console I/O.
+    """
+    global _LISTENER
+
+    logger = logging.getLogger(name)
+    if _LISTENER is None:
+        records: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+        _LISTENER = logging.handlers.QueueListener(records, output)
+        _LISTENER.start()
+        atexit.register(_LISTENER.stop)
+        root = logging.getLogger("greenpulse")
+        root.addHandler(logging.handlers.QueueHandler(records))
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return logger
+
+
+class LogSampler:
+    """
+    Rate limit for chatty log lines: the first line per key goes through,
+    then at most one per ``interval`` seconds. ``allow`` returns how many
+    lines were suppressed since the previous one, or None to drop this one.
+    """
+
+    def __init__(self, interval: float = LOG_SAMPLE_SECONDS) -> None:
+        self.interval = interval
+        self._next: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str = "") -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next.get(key, 0.0):
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return None
+            self._next[key] = now + self.interval
+            return self._suppressed.pop(key, 0)
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import functools
+import http.client
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from _metrics import REGISTRY, timed
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_DEADLINE_SECONDS = float(os.getenv("OPENAI_DEADLINE_SECONDS", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (OSError, http.client.HTTPException)   # incl. RemoteDisconnected on a stale keep-alive
+
+LLM_LATENCY = REGISTRY.histogram(
+    "greenpulse_llm_request_seconds",
+    "OpenAI chat completion latency incl. retries; streams are timed until the response headers",
+    ["call", "outcome"],
+)
+LLM_RETRIES = REGISTRY.counter("greenpulse_llm_retries_total", "OpenAI attempts retried after a transient failure")
+
+
+class OpenAIError(Exception):
+    """Upstream failure; ``status`` is the HTTP status when there was one."""
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class OpenAIClient:
+    """
+    Chat-completions client shared by every AI endpoint.
+
+    Keeps a small pool of persistent keep-alive connections, caps in-flight
+    requests with a semaphore, enforces one deadline across all attempts and
+    retries transient failures with full-jitter exponential backoff. Point
+    ``base_url`` (or OPENAI_BASE_URL) at a local stub server for testing.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = OPENAI_BASE_URL,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        deadline: float = OPENAI_DEADLINE_SECONDS,
+        max_retries: int = OPENAI_MAX_RETRIES,
+        backoff_base: float = 0.25,
+        backoff_cap: float = 4.0,
+    ) -> None:
+        parts = urlsplit(base_url)
+        self._scheme = parts.scheme
+        self._host = parts.hostname or "api.openai.com"
+        self._port = parts.port
+        self._path = parts.path.rstrip("/")
+        self.api_key = api_key
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=max_concurrency)
+
+    # ── Connection pool ──────────────────────────────────────────────────────
+
+    def _new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        if self._scheme == "http":
+            return http.client.HTTPConnection(self._host, self._port, timeout=timeout)
+        return http.client.HTTPSConnection(self._host, self._port, timeout=timeout)
+
+    def _checkout(self, timeout: float) -> http.client.HTTPConnection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection(timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _checkin(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # ── Requests ─────────────────────────────────────────────────────────────
+
+    def _headers(self) -> Dict[str, str]:
+        api_key = self.api_key or os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            raise OpenAIError("OPENAI_API_KEY is not set")
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Connection": "keep-alive",
+        }
+
+    def _backoff(self, attempt: int, retry_after: Optional[str], expires: float) -> bool:
+        """Sleep before the next attempt; False if that would overrun the deadline."""
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        if time.monotonic() + delay >= expires:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _send(
+        self,
+        path: str,
+        body: bytes,
+        headers: Dict[str, str],
+        expires: float,
+        stream: bool = False,
+    ) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse, Optional[bytes]]:
+        """
+        Send with retries until a non-error status. Returns the connection, the
+        response and its body; for ``stream`` the body is left unread (None).
+        """
+        attempt = 0
+        while True:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                raise OpenAIError("OpenAI request deadline exceeded", status=504)
+
+            conn = self._checkout(remaining)
+            retry_after = None
+            try:
+                conn.request("POST", self._path + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                raw = None if stream and resp.status < 400 else resp.read()
+            except RETRYABLE_ERRORS as exc:
+                conn.close()
+                error = OpenAIError(f"OpenAI connection error: {exc}")
+            else:
+                if resp.status < 400:
+                    return conn, resp, raw
+                self._release(conn, resp)
+                error = OpenAIError(_error_message(resp.status, raw), status=resp.status)
+                if resp.status not in RETRYABLE_STATUSES:
+                    raise error
+                retry_after = resp.getheader("Retry-After")
+
+            if attempt >= self.max_retries or not self._backoff(attempt, retry_after, expires):
+                raise error
+            attempt += 1
+            LLM_RETRIES.inc()
+
+    def _release(self, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse) -> None:
+        if resp.will_close:
+            conn.close()
+        else:
+            self._checkin(conn)
+
+    def post(self, path: str, payload: Dict[str, Any], deadline: Optional[float] = None) -> Dict[str, Any]:
+        """POST ``payload`` as JSON to ``path`` and return the decoded response."""
+        headers = self._headers()
+        body = json.dumps(payload).encode("utf-8")
+        expires = time.monotonic() + (deadline or self.deadline)
+
+        if not self._slots.acquire(timeout=max(0.0, expires - time.monotonic())):
+            raise OpenAIError("OpenAI client is saturated, try again later", status=503)
+        try:
+            conn, resp, raw = self._send(path, body, headers, expires)
+            self._release(conn, resp)
+            return json.loads(raw.decode("utf-8"))
+        finally:
+            self._slots.release()
+
+    @timed(LLM_LATENCY, call="chat_completion")
+    def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        deadline: Optional[float] = None,
+        **params: Any,
+    ) -> Dict[str, Any]:
+        payload = {"model": model, "messages": messages, **params}
+        return self.post("/chat/completions", payload, deadline=deadline)
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        deadline: Optional[float] = None,
+        **params: Any,
+    ) -> str:
+        """Text of the first choice ('' when the model returned no content)."""
+        response = self.chat_completion(messages, model, deadline=deadline, **params)
+        return response["choices"][0]["message"]["content"] or ""
+
+    @timed(LLM_LATENCY, call="stream_start")
+    def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        deadline: Optional[float] = None,
+        **params: Any,
+    ) -> "ChatStream":
+        """
+        Start a streamed completion and return an iterator of content deltas.
+
+        Upstream errors (including retries) surface here, before anything has
+        been sent to the caller's client; iterate or ``close()`` the result to
+        give the connection back.
+        """
+        headers = self._headers()
+        headers["Accept"] = "text/event-stream"
+        # include_usage: the last chunk carries token counts (see ChatStream.usage)
+        payload = {"model": model, "messages": messages, "stream_options": {"include_usage": True},
+                   **params, "stream": True}
+        body = json.dumps(payload).encode("utf-8")
+        expires = time.monotonic() + (deadline or self.deadline)
+
+        if not self._slots.acquire(timeout=max(0.0, expires - time.monotonic())):
+            raise OpenAIError("OpenAI client is saturated, try again later", status=503)
+        try:
+            conn, resp, _ = self._send("/chat/completions", body, headers, expires, stream=True)
+        except BaseException:
+            self._slots.release()
+            raise
+        return ChatStream(self, conn, resp)
+
+    async def acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        deadline: Optional[float] = None,
+        **params: Any,
+    ) -> str:
+        """Awaitable :meth:`complete`, run on the default executor."""
+        import asyncio   # only async callers pay for the import
+
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.complete, messages, model, deadline=deadline, **params)
+        return await loop.run_in_executor(None, call)
+
+
+class ChatStream:
+    """
+    Content deltas of one streamed chat completion, parsed from SSE lines.
+
+    Holds a concurrency slot and a pooled connection until exhausted or
+    closed; the connection is only reused if the stream was read to the end.
+    ``usage`` holds the token counts from the final chunk once it arrived.
+    """
+
+    def __init__(self, client: OpenAIClient, conn: http.client.HTTPConnection, resp: http.client.HTTPResponse) -> None:
+        self._client = client
+        self._conn = conn
+        self._resp = resp
+        self._finished = False
+        self._closed = False
+        self.finish_reason: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for line in self._resp:
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    self._resp.read()   # drain the terminating chunk so the connection can be reused
+                    self._finished = True
+                    break
+                try:
+                    chunk = json.loads(data)
+                    self.usage = chunk.get("usage") or self.usage
+                    choice = chunk["choices"][0]
+                except (ValueError, AttributeError, KeyError, IndexError):
+                    continue
+                self.finish_reason = choice.get("finish_reason") or self.finish_reason
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
+        except RETRYABLE_ERRORS as exc:
+            raise OpenAIError(f"OpenAI stream interrupted: {exc}") from exc
+        finally:
+            self.close()
+
+    def __enter__(self) -> "ChatStream":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._finished:
+            self._client._release(self._conn, self._resp)
+        else:
+            self._conn.close()
+        self._client._slots.release()
+
+
+def _error_message(status: int, raw: bytes) -> str:
+    try:
+        detail = json.loads(raw.decode("utf-8"))["error"]["message"]
+    except Exception:
+        detail = raw[:200].decode("utf-8", "replace")
+    return f"OpenAI API error {status}: {detail}"
+
+
+_CLIENT: Optional[OpenAIClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> OpenAIClient:
+    """Process-wide client, so warm serverless invocations reuse connections."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = OpenAIClient()
+    return _CLIENT
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Mapping, Optional, Tuple
+
+from _metrics import REGISTRY
+
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "256"))
+
+PROMPT_BUILDS = REGISTRY.counter(
+    "greenpulse_prompt_builds_total",
+    "System prompt lookups by endpoint and result (hit = reused, miss = rendered)",
+    ["endpoint", "result"],
+)
+PROMPT_TOKENS = REGISTRY.counter(
+    "greenpulse_llm_prompt_tokens_total",
+    "Prompt tokens billed by OpenAI; kind=cached were served from its prompt cache",
+    ["endpoint", "kind"],
+)
+
+# (name, role, interests, expertise, tone, topic) with unknown choices folded
+# into the default they render as
+PromptKey = Tuple[str, str, Tuple[str, ...], str, str, str]
+
+
+def _text(value: Any) -> str:
+    return value.strip() if isinstance(value, str) else ("" if value is None else str(value))
+
+
+def _choice(value: Any, choices: Mapping[str, str], default: str) -> str:
+    return value if isinstance(value, str) and value in choices else default
+
+
+def prompt_key(
+    user_prefs: Any,
+    topic_focus: Any,
+    expertise_levels: Mapping[str, str],
+    tone_styles: Mapping[str, str],
+    topic_contexts: Mapping[str, str],
+) -> PromptKey:
+    """Normalized, hashable preferences; equal keys render identical prompts."""
+    prefs = user_prefs if isinstance(user_prefs, Mapping) else {}
+    interests = prefs.get("interests") or ()
+    if not isinstance(interests, (list, tuple)):
+        interests = (interests,)
+    return (
+        _text(prefs.get("name")),
+        _text(prefs.get("role")),
+        tuple(text for text in map(_text, interests) if text),
+        _choice(prefs.get("expertise"), expertise_levels, "general"),
+        _choice(prefs.get("tone"), tone_styles, "friendly"),
+        _choice(topic_focus, topic_contexts, "general"),
+    )
+
+
+class PromptCache:
+    """
+    Bounded LRU of rendered system prompts for one endpoint.
+
+    ``render`` builds the prompt for a :data:`PromptKey`; every prompt starts
+    with the same static text, so OpenAI's automatic prompt caching can reuse
+    that prefix across users (it applies once the shared prefix reaches 1024
+    tokens; below that the ordering costs nothing).
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        render: Callable[[PromptKey], str],
+        expertise_levels: Mapping[str, str],
+        tone_styles: Mapping[str, str],
+        topic_contexts: Mapping[str, str],
+        max_entries: int = PROMPT_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.endpoint = endpoint
+        self.max_entries = max_entries
+        self._render = render
+        self._choices = (expertise_levels, tone_styles, topic_contexts)
+        self._entries: "OrderedDict[PromptKey, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_prefs: Any = None, topic_focus: Any = None) -> str:
+        key = prompt_key(user_prefs, topic_focus, *self._choices)
+        with self._lock:
+            prompt = self._entries.get(key)
+            if prompt is not None:
+                self._entries.move_to_end(key)
+        if prompt is not None:
+            PROMPT_BUILDS.inc(endpoint=self.endpoint, result="hit")
+            return prompt
+
+        prompt = self._render(key)
+        PROMPT_BUILDS.inc(endpoint=self.endpoint, result="miss")
+        with self._lock:
+            self._entries[key] = prompt
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return prompt
+
+
+def record_usage(endpoint: str, usage: Optional[Mapping[str, Any]]) -> None:
+    """Count the prompt tokens of one completion's ``usage`` block, split by cache status."""
+    if not usage:
+        return
+    total = usage.get("prompt_tokens") or 0
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    if cached:
+        PROMPT_TOKENS.inc(cached, endpoint=endpoint, kind="cached")
+    if total > cached:
+        PROMPT_TOKENS.inc(total - cached, endpoint=endpoint, kind="uncached")
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from _history import _as_float
+
+# Resolution name → bucket width in seconds
+RESOLUTIONS: Dict[str, int] = {"1m": 60, "15m": 900, "1h": 3600, "1d": 86400}
+
+# Buckets kept per resolution: 12 h of minutes, a week of quarter hours,
+# a month of hours and a year of days
+DEFAULT_RETENTION: Dict[str, int] = {"1m": 720, "15m": 672, "1h": 744, "1d": 366}
+
+MAX_ROLLUP_ROWS = 2000
+
+# Epoch seconds a datetime can represent (years 1–9999), a day inside either end
+_MIN_TIME = datetime.min.replace(tzinfo=timezone.utc).timestamp() + 86400
+_MAX_TIME = datetime.max.replace(tzinfo=timezone.utc).timestamp() - 86400
+
+# Per-field slots inside a bucket: count, sum, min, max
+_SLOTS = 4
+
+
+def parse_time(value: Any) -> Optional[float]:
+    """
+    Epoch seconds from a number, a numeric string or an ISO-8601 string
+    (naive = UTC). ValueError for anything else, including NaN, infinity and
+    times outside what a datetime can represent.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _epoch(float(value), value)
+    text = str(value).strip()
+    try:
+        number = float(text)
+    except ValueError:
+        pass
+    else:
+        return _epoch(number, value)
+    try:
+        parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Invalid time: {value!r}") from None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return _epoch(parsed.timestamp(), value)
+
+
+def _epoch(number: float, value: Any) -> float:
+    if not _MIN_TIME <= number <= _MAX_TIME:   # also False for NaN
+        raise ValueError(f"Invalid time: {value!r}")
+    return number
+
+
+def bucket_rows(
+    buckets: Iterable[Tuple[int, Sequence[float]]],
+    fields: Sequence[str],
+    digits: int = 2,
+) -> List[Dict[str, Any]]:
+    """
+    Flatten ``(start, stats)`` buckets into chart rows: the mean under the
+    field name plus ``<field>_min`` / ``<field>_max``. Fields without a value
+    in the bucket are left out.
+    """
+    rows = []
+    for start, stats in buckets:
+        row: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(start, timezone.utc).isoformat(),
+            "count": int(stats[0]),
+        }
+        for i, field in enumerate(fields):
+            base = 1 + i * _SLOTS
+            count = stats[base]
+            if not count:
+                continue
+            row[field] = round(stats[base + 1] / count, digits)
+            row[f"{field}_min"] = stats[base + 2]
+            row[f"{field}_max"] = stats[base + 3]
+        rows.append(row)
+    return rows
+
+
+class _Resolution:
+    """Bounded map of UTC-aligned bucket start → packed per-field aggregates."""
+
+    def __init__(self, width: int, max_buckets: int, nfields: int) -> None:
+        self.width = width
+        self.max_buckets = max_buckets
+        self._empty = array("d", [0.0]) * (1 + nfields * _SLOTS)
+        self._buckets: Dict[int, array] = {}
+
+    def add(self, ts: float, values: Sequence[float]) -> None:
+        start = int(ts // self.width) * self.width
+        stats = self._buckets.get(start)
+        if stats is None:
+            stats = self._buckets[start] = array("d", self._empty)
+            if len(self._buckets) > self.max_buckets:
+                del self._buckets[min(self._buckets)]
+        stats[0] += 1
+        base = 1
+        for value in values:
+            if value == value:   # NaN = missing
+                if stats[base]:
+                    if value < stats[base + 2]:
+                        stats[base + 2] = value
+                    if value > stats[base + 3]:
+                        stats[base + 3] = value
+                else:
+                    stats[base + 2] = stats[base + 3] = value
+                stats[base] += 1
+                stats[base + 1] += value
+            base += _SLOTS
+
+    def select(self, start: Optional[float], end: Optional[float]) -> List[Tuple[int, array]]:
+        starts = sorted(self._buckets)
+        if start is not None:
+            first = int(start // self.width) * self.width
+            starts = [s for s in starts if s >= first]
+        if end is not None:
+            starts = [s for s in starts if s <= end]
+        return [(s, self._buckets[s]) for s in starts[-MAX_ROLLUP_ROWS:]]
+
+
+class SensorRollup:
+    """
+    Per-station min / max / mean / count of sensor fields at several
+    resolutions, maintained incrementally at ingest.
+
+    Each reading updates one bucket per resolution in O(fields); queries
+    return at most MAX_ROLLUP_ROWS small rows however many readings went in.
+    """
+
+    def __init__(
+        self,
+        fields: Iterable[str],
+        retention: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.fields = tuple(fields)
+        retention = {**DEFAULT_RETENTION, **(retention or {})}
+        self._resolutions = {
+            name: _Resolution(width, retention[name], len(self.fields))
+            for name, width in RESOLUTIONS.items()
+        }
+
+    def add(self, reading: Dict[str, Any], ts: float) -> None:
+        self.add_values([_as_float(reading.get(field)) for field in self.fields], ts)
+
+    def add_values(self, values: Sequence[float], ts: float) -> None:
+        """Like :meth:`add` with floats already in ``fields`` order (NaN = missing)."""
+        for series in self._resolutions.values():
+            series.add(ts, values)
+
+    def query(
+        self,
+        resolution: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Rows oldest first for buckets overlapping ``[start, end]``; KeyError for an unknown resolution."""
+        return bucket_rows(self._resolutions[resolution].select(start, end), self.fields)
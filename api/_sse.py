@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Mapping, Optional
+
+EVENT_STREAM = "text/event-stream"
+
+
+def wants_event_stream(accept: Optional[str], body: Mapping[str, Any]) -> bool:
+    """True if the client asked for SSE via ``"stream": true`` or the Accept header."""
+    return bool(body.get("stream")) or EVENT_STREAM in (accept or "")
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> bytes:
+    """One server-sent event frame carrying ``data`` as single-line JSON."""
+    frame = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event:
+        frame = f"event: {event}\n" + frame
+    return frame.encode("utf-8")
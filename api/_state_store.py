@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import abc
+import http.client
+import json
+import os
+import select
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+KV_REST_API_URL = os.getenv("KV_REST_API_URL", "")       # Vercel KV / Upstash REST endpoint
+KV_REST_API_TOKEN = os.getenv("KV_REST_API_TOKEN", "")
+TELEMETRY_STORE = os.getenv("TELEMETRY_STORE") or ("kv" if KV_REST_API_URL else "memory")
+TELEMETRY_STORE_DB = os.getenv("TELEMETRY_STORE_DB", "/tmp/greenpulse-state.sqlite3")
+TELEMETRY_KV_PREFIX = os.getenv("TELEMETRY_KV_PREFIX", "greenpulse:")
+TELEMETRY_KV_TIMEOUT = float(os.getenv("TELEMETRY_KV_TIMEOUT", "2"))
+
+# (station key, normalized payload, received at epoch seconds)
+Record = Tuple[str, Dict[str, Any], float]
+
+
+class StateStoreError(Exception):
+    """The shared telemetry state could not be read or written."""
+
+
+class StationSnapshot(NamedTuple):
+    key: Optional[str]                  # None = no station has posted yet
+    latest: Optional[Dict[str, Any]]
+    received_at: Optional[float]        # epoch seconds the latest payload arrived
+    history: List[Dict[str, Any]]       # newest ``history`` payloads, oldest first
+
+
+class StateStore(abc.ABC):
+    """
+    Latest payload and recent history per station for the serverless
+    functions. ``record`` stores every reading of one request and ``load``
+    reads what one request needs (the latest payload plus up to ``history``
+    recent ones) together, so a shared backend costs one round trip each.
+    ``load(None)`` reads the station that posted last.
+    """
+
+    shared = False   # True when other instances see the same state
+
+    def __init__(self, history_points: int) -> None:
+        self.history_points = history_points
+
+    @abc.abstractmethod
+    def record(self, records: Sequence[Record]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def load(self, key: Optional[str], history: int = 0) -> StationSnapshot:
+        ...
+
+    @abc.abstractmethod
+    def stations(self) -> List[str]:
+        ...
+
+
+class MemoryStateStore(StateStore):
+    """Module memory of one instance: what a cold start forgets."""
+
+    def __init__(self, history_points: int) -> None:
+        super().__init__(history_points)
+        self._latest: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._last: Optional[str] = None
+
+    def record(self, records: Sequence[Record]) -> None:
+        for key, payload, received_at in records:
+            self._latest[key] = (payload, received_at)
+            history = self._history.get(key)
+            if history is None:
+                history = self._history[key] = deque(maxlen=self.history_points)
+            history.append(payload)
+            self._last = key
+
+    def load(self, key: Optional[str], history: int = 0) -> StationSnapshot:
+        key = key or self._last
+        latest, received_at = self._latest.get(key, (None, None)) if key else (None, None)
+        rows = self._history.get(key) if key and history > 0 else None
+        recent = [rows[i] for i in range(max(0, len(rows) - history), len(rows))] if rows else []
+        return StationSnapshot(key, latest, received_at, recent)
+
+    def stations(self) -> List[str]:
+        return list(self._latest)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    State in one SQLite file, shared by every process that opens the same
+    path (one host or a shared volume). The connection is opened once per
+    instance and reused by warm invocations.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, history_points: int) -> None:
+        import sqlite3   # only when selected: a few ms of every cold start otherwise
+
+        super().__init__(history_points)
+        self._error = sqlite3.Error
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS latest (station TEXT PRIMARY KEY, "
+                         "payload TEXT NOT NULL, received_at REAL NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS history (station TEXT NOT NULL, seq INTEGER NOT NULL, "
+                         "payload TEXT NOT NULL, PRIMARY KEY (station, seq)) WITHOUT ROWID")
+        self._lock = threading.Lock()
+
+    def record(self, records: Sequence[Record]) -> None:
+        with self._lock:
+            db = self._db
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                for key, payload, received_at in records:
+                    raw = json.dumps(payload)
+                    db.execute("INSERT OR REPLACE INTO latest VALUES (?, ?, ?)", (key, raw, received_at))
+                    (seq,) = db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM history WHERE station = ?",
+                                        (key,)).fetchone()
+                    db.execute("INSERT INTO history VALUES (?, ?, ?)", (key, seq, raw))
+                    db.execute("DELETE FROM history WHERE station = ? AND seq <= ?",
+                               (key, seq - self.history_points))
+                db.execute("COMMIT")
+            except self._error as exc:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                raise StateStoreError(f"SQLite state store: {exc}") from exc
+
+    def load(self, key: Optional[str], history: int = 0) -> StationSnapshot:
+        with self._lock:
+            db = self._db
+            try:
+                db.execute("BEGIN")   # one consistent read of latest + history
+                try:
+                    if key:
+                        row = db.execute("SELECT station, payload, received_at FROM latest WHERE station = ?",
+                                         (key,)).fetchone()
+                    else:
+                        # A batch shares received_at; REPLACE re-inserts, so the newest rowid posted last
+                        row = db.execute("SELECT station, payload, received_at FROM latest "
+                                         "ORDER BY received_at DESC, rowid DESC LIMIT 1").fetchone()
+                    key = row[0] if row else key
+                    rows = db.execute("SELECT payload FROM history WHERE station = ? ORDER BY seq DESC LIMIT ?",
+                                      (key, history)).fetchall() if key and history > 0 else []
+                finally:
+                    db.execute("COMMIT")
+            except self._error as exc:
+                raise StateStoreError(f"SQLite state store: {exc}") from exc
+        return StationSnapshot(
+            key,
+            json.loads(row[1]) if row else None,
+            row[2] if row else None,
+            [json.loads(raw) for (raw,) in reversed(rows)],
+        )
+
+    def stations(self) -> List[str]:
+        with self._lock:
+            return [key for (key,) in self._db.execute("SELECT station FROM latest")]
+
+
+class KVStateStore(StateStore):
+    """
+    State in a Redis-compatible key-value service behind the Upstash REST
+    API (Vercel KV): ``record`` and ``load`` are each one ``/pipeline``
+    request over a keep-alive connection that warm invocations reuse.
+
+    Keys (under ``prefix``): ``latest:<station>`` and ``last`` hold
+    ``{"key", "payload", "received_at"}``, ``history:<station>`` is a list
+    trimmed to ``history_points`` and ``stations`` a set. ``last`` and
+    ``last-history`` (a server-side COPY of its history list, Redis >= 6.2)
+    mirror the station that posted last, so the dashboard's default read
+    does not need its key first. ``bench/kv_stub.py`` serves the same API
+    locally.
+
+    A pipeline that fails after it was sent may have been applied, so only
+    reads are resent; a write is sent at most once (``record`` appends to
+    history lists and is not idempotent).
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        history_points: int,
+        prefix: str = TELEMETRY_KV_PREFIX,
+        timeout: float = TELEMETRY_KV_TIMEOUT,
+    ) -> None:
+        super().__init__(history_points)
+        parts = urlsplit(url)
+        self._scheme = parts.scheme
+        self._host = parts.hostname or "localhost"
+        self._port = parts.port
+        self._path = parts.path.rstrip("/")
+        self._token = token
+        self.prefix = prefix
+        self.timeout = timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = self._conn
+        if conn is not None and conn.sock is not None and select.select([conn.sock], [], [], 0)[0]:
+            # Readable while idle = the server closed the keep-alive connection
+            conn.close()
+            self._conn = None
+        if self._conn is None:
+            factory = http.client.HTTPConnection if self._scheme == "http" else http.client.HTTPSConnection
+            self._conn = factory(self._host, self._port, timeout=self.timeout)
+        return self._conn
+
+    def _pipeline(self, commands: List[List[Any]], write: bool = False) -> List[Any]:
+        body = json.dumps(commands).encode("utf-8")
+        headers = {"Authorization": f"Bearer {self._token}", "Content-Type": "application/json"}
+        with self._lock:
+            for attempt in (0, 1):   # a warm instance's keep-alive connection may have gone stale
+                conn = self._connection()
+                sent = False
+                try:
+                    conn.request("POST", f"{self._path}/pipeline", body, headers)
+                    sent = True
+                    resp = conn.getresponse()
+                    raw = resp.read()
+                    break
+                except (OSError, http.client.HTTPException) as exc:
+                    conn.close()
+                    self._conn = None
+                    if attempt or (sent and write):   # the write may have been applied: never send it twice
+                        raise StateStoreError(f"KV state store unreachable: {exc}") from exc
+            if resp.will_close:
+                conn.close()
+                self._conn = None
+            self.requests += 1
+        if resp.status != 200:
+            raise StateStoreError(f"KV state store error {resp.status}: {raw[:200].decode('utf-8', 'replace')}")
+        results = json.loads(raw)
+        for result in results:
+            if result.get("error"):
+                raise StateStoreError(f"KV state store error: {result['error']}")
+        return [result.get("result") for result in results]
+
+    def record(self, records: Sequence[Record]) -> None:
+        if not records:
+            return
+        p = self.prefix
+        last_key = records[-1][0]
+        commands: List[List[Any]] = []
+        for key, payload, received_at in records:
+            entry = json.dumps({"key": key, "payload": payload, "received_at": received_at})
+            commands.append(["SET", f"{p}latest:{key}", entry])
+            commands.append(["RPUSH", f"{p}history:{key}", json.dumps(payload)])
+        for key in {key for key, _, _ in records}:
+            commands.append(["LTRIM", f"{p}history:{key}", -self.history_points, -1])
+            commands.append(["SADD", f"{p}stations", key])
+        commands.append(["SET", f"{p}last", entry])
+        commands.append(["COPY", f"{p}history:{last_key}", f"{p}last-history", "REPLACE"])
+        self._pipeline(commands, write=True)
+
+    def load(self, key: Optional[str], history: int = 0) -> StationSnapshot:
+        p = self.prefix
+        commands = [["GET", f"{p}last" if key is None else f"{p}latest:{key}"]]
+        if history > 0:
+            commands.append(["LRANGE", f"{p}last-history" if key is None else f"{p}history:{key}", -history, -1])
+        results = self._pipeline(commands)
+        if results[0] is None:
+            return StationSnapshot(key, None, None, [])
+        entry = json.loads(results[0])
+        rows = results[1] if history > 0 else []
+        return StationSnapshot(entry["key"], entry["payload"], entry["received_at"],
+                               [json.loads(row) for row in rows or ()])
+
+    def stations(self) -> List[str]:
+        (members,) = self._pipeline([["SMEMBERS", f"{self.prefix}stations"]])
+        return list(members or ())
+
+
+def open_store(history_points: int, kind: str = TELEMETRY_STORE) -> StateStore:
+    """The store selected by TELEMETRY_STORE: memory, sqlite or kv."""
+    if kind == "memory":
+        return MemoryStateStore(history_points)
+    if kind == "sqlite":
+        return SQLiteStateStore(TELEMETRY_STORE_DB, history_points)
+    if kind == "kv":
+        if not KV_REST_API_URL:
+            raise ValueError("TELEMETRY_STORE=kv needs KV_REST_API_URL (and KV_REST_API_TOKEN)")
+        return KVStateStore(KV_REST_API_URL, KV_REST_API_TOKEN, history_points)
+    raise ValueError(f"Unknown TELEMETRY_STORE '{kind}', use memory, sqlite or kv")
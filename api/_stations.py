@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Generic, Iterator, Optional, TypeVar
+
+S = TypeVar("S")
+
+
+def station_key(value: Any, default: str = "1") -> str:
+    """Normalize a station id from JSON, a query string or the log to a dict key."""
+    if value is None or value == "":
+        return default
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+class StationRegistry(Generic[S]):
+    """
+    O(1) lookup of per-station state keyed by normalized ``station_id``.
+
+    State objects are created lazily by ``factory(key)`` on first ingest. The
+    registry also remembers the most recently active station so endpoints
+    called without a station filter keep their single-station behaviour.
+    """
+
+    def __init__(self, factory: Callable[[str], S], default_station: str = "1") -> None:
+        self._factory = factory
+        self._stations: Dict[str, S] = {}
+        self.default_station = default_station
+        self.last_active: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._stations)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._stations)
+
+    def __contains__(self, station_id: Any) -> bool:
+        return station_key(station_id, self.default_station) in self._stations
+
+    def items(self):
+        return self._stations.items()
+
+    def get(self, station_id: Any = None) -> Optional[S]:
+        """State for ``station_id``, or for the last active station when omitted."""
+        if station_id is None or station_id == "":
+            if self.last_active is None:
+                return None
+            return self._stations[self.last_active]
+        return self._stations.get(station_key(station_id, self.default_station))
+
+    def touch(self, station_id: Any) -> S:
+        """State for ``station_id``, created if needed, marked as last active."""
+        key = station_key(station_id, self.default_station)
+        state = self._stations.get(key)
+        if state is None:
+            state = self._stations[key] = self._factory(key)
+        self.last_active = key
+        return state
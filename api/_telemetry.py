@@ -1,9 +1,17 @@
 from __future__ import annotations
 
+import functools
 import math
 import os
+import sys
+import time
+from array import array
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from _rollup import DEFAULT_RETENTION, MAX_ROLLUP_ROWS, RESOLUTIONS, SensorRollup, bucket_rows, parse_time
+from _state_store import StateStoreError, StationSnapshot, open_store
+from _stations import station_key
 
 STATION_PROFILE = {
     "station_id": 1,
@@ -13,13 +21,54 @@ STATION_PROFILE = {
     "altitude": 24.0,
 }
 
-_LATEST_PAYLOAD: Optional[Dict[str, Any]] = None
-_LATEST_PAYLOAD_AT: Optional[datetime] = None
-_RECENT_HISTORY: List[Dict[str, Any]] = []
+DEFAULT_STATION = str(STATION_PROFILE["station_id"])
 
 POST_TTL_MINUTES = int(os.getenv("SENSOR_POST_TTL_MINUTES", "20"))
 MAX_HISTORY_POINTS = 500
+MAX_RANGE_ROWS = 10000   # per ?from=&to= query
 HISTORY_STEP_MINUTES = 5
+ROLLUP_FIELDS = (
+    "temperature", "temp_inside", "humidity", "co2_ppm", "co_ppm", "air_quality_index",
+    "ph", "light_intensity", "water_level",
+)
+
+# Latest payload and recent history per station, keyed by normalized
+# station_id: in this instance's memory, or shared by every instance with
+# TELEMETRY_STORE=sqlite|kv (see _state_store.py)
+_STORE = open_store(MAX_HISTORY_POINTS)
+# Long-retention rollups are kept in memory; shared stores roll up their recent history on read
+_ROLLUPS: Dict[str, SensorRollup] = {}
+
+# Optional durable log (e.g. /tmp/telemetry on a warm serverless instance)
+TELEMETRY_LOG_DIR = os.getenv("TELEMETRY_LOG_DIR", "")
+LOG_NUMERIC_FIELDS = [
+    "temperature", "temp_inside", "humidity", "co2_ppm", "co_ppm", "air_quality_index",
+    "ph", "light_intensity", "water_level",
+    "latitude", "longitude", "altitude", "accuracy", "satellites", "gps_valid",
+]
+LOG_INT_FIELDS = ["humidity", "co2_ppm", "air_quality_index", "light_intensity", "satellites"]
+_LOG = None
+
+# Optional SQLite archive of every reading, for ?from=&to= range queries
+# beyond MAX_HISTORY_POINTS (written inline: the instance is frozen between requests)
+TELEMETRY_ARCHIVE_DB = os.getenv("TELEMETRY_ARCHIVE_DB", "")
+ARCHIVE_TEXT_FIELDS = ["station_id", "station_name"]
+_ARCHIVE = None
+
+# Virtual pilot station: readings per minute of day, precomputed on first use
+MINUTES_PER_DAY = 1440
+VIRTUAL_FIELDS = (
+    ("temperature", "d"), ("temp_inside", "d"), ("humidity", "h"), ("co2_ppm", "h"),
+    ("air_quality_index", "h"), ("ph", "d"), ("light_intensity", "h"), ("co_ppm", "d"),
+    ("water_level", "d"), ("satellites", "h"), ("accuracy", "d"),
+)
+_VIRTUAL_META = {
+    "status": "online",
+    "data_source": "telemetry_snapshot",
+    "origin": "greenpulse_virtual_station",
+}
+_VIRTUAL_TABLE: Optional[Dict[str, array]] = None
+VIRTUAL_TABLE_BUILD_MS: Optional[float] = None
 
 
 def _utc_now() -> datetime:
@@ -30,24 +79,19 @@ def _clamp(value: float, low: float, high: float) -> float:
     return max(low, min(high, value))
 
 
-def _day_progress(ts: datetime) -> float:
-    seconds = ts.hour * 3600 + ts.minute * 60 + ts.second
-    return seconds / 86400
-
-
-def _solar_factor(ts: datetime) -> float:
+def _solar_factor(minutes: float) -> float:
     sunrise = 6 * 60
     sunset = 20 * 60 + 30
-    minutes = ts.hour * 60 + ts.minute + ts.second / 60
     if minutes <= sunrise or minutes >= sunset:
         return 0.0
     progress = (minutes - sunrise) / (sunset - sunrise)
     return math.sin(math.pi * progress) ** 1.35
 
 
-def _build_virtual_point(ts: datetime) -> Dict[str, Any]:
-    day = _day_progress(ts)
-    solar = _solar_factor(ts)
+def _virtual_values(minutes: float) -> Tuple[float, ...]:
+    """Virtual readings at ``minutes`` past midnight, in VIRTUAL_FIELDS order."""
+    day = minutes / 1440
+    solar = _solar_factor(minutes)
     fast_wave = math.sin(2 * math.pi * (day * 12 + 0.17))
     slow_wave = math.sin(2 * math.pi * (day + 0.11))
     night_wave = math.cos(2 * math.pi * (day * 2 - 0.08))
@@ -64,33 +108,92 @@ def _build_virtual_point(ts: datetime) -> Dict[str, Any]:
     satellites = int(round(_clamp(9 + solar * 4 + max(0.0, fast_wave), 8, 14)))
     accuracy = round(_clamp(2.8 - solar * 0.6 + max(0.0, -fast_wave) * 0.3, 1.6, 3.4), 1)
 
-    return {
-        **STATION_PROFILE,
-        "temperature": round(_clamp(temperature, 17.2, 30.8), 1),
-        "temp_inside": round(_clamp(temp_inside, 18.5, 32.0), 1),
-        "humidity": int(round(_clamp(humidity, 54.0, 82.0))),
-        "co2_ppm": int(round(_clamp(co2_ppm, 402.0, 468.0))),
-        "air_quality_index": int(round(_clamp(air_quality_index, 34.0, 58.0))),
-        "ph": round(_clamp(ph, 6.7, 7.35), 2),
-        "light_intensity": int(round(_clamp(light_intensity, 38.0, 690.0))),
-        "co_ppm": round(_clamp(co_ppm, 2.0, 8.2), 1),
-        "water_level": round(_clamp(water_level, 71.0, 84.0), 1),
-        "gps_valid": True,
-        "satellites": satellites,
-        "accuracy": accuracy,
-        "timestamp": ts.isoformat(),
-        "status": "online",
-        "data_source": "telemetry_snapshot",
-        "origin": "greenpulse_virtual_station",
-    }
+    return (
+        round(_clamp(temperature, 17.2, 30.8), 1),
+        round(_clamp(temp_inside, 18.5, 32.0), 1),
+        int(round(_clamp(humidity, 54.0, 82.0))),
+        int(round(_clamp(co2_ppm, 402.0, 468.0))),
+        int(round(_clamp(air_quality_index, 34.0, 58.0))),
+        round(_clamp(ph, 6.7, 7.35), 2),
+        int(round(_clamp(light_intensity, 38.0, 690.0))),
+        round(_clamp(co_ppm, 2.0, 8.2), 1),
+        round(_clamp(water_level, 71.0, 84.0), 1),
+        satellites,
+        accuracy,
+    )
 
 
-def remember_sensor_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
-    global _LATEST_PAYLOAD, _LATEST_PAYLOAD_AT, _RECENT_HISTORY
+def _virtual_table() -> Dict[str, array]:
+    """
+    Per-minute virtual readings for one day, one compact column per field.
 
-    ts = _utc_now()
-    normalized = {
-        **STATION_PROFILE,
+    The curve only depends on time of day, so it is evaluated 1440 times on
+    first use and every later point is a lookup. Build time is kept in
+    VIRTUAL_TABLE_BUILD_MS.
+    """
+    global _VIRTUAL_TABLE, VIRTUAL_TABLE_BUILD_MS
+
+    if _VIRTUAL_TABLE is None:
+        started = time.perf_counter()
+        columns = {name: array(code) for name, code in VIRTUAL_FIELDS}
+        appends = [columns[name].append for name, _ in VIRTUAL_FIELDS]
+        for minute in range(MINUTES_PER_DAY):
+            for append, value in zip(appends, _virtual_values(minute)):
+                append(value)
+        _VIRTUAL_TABLE = columns
+        VIRTUAL_TABLE_BUILD_MS = (time.perf_counter() - started) * 1000
+    return _VIRTUAL_TABLE
+
+
+def _build_virtual_point(ts: datetime) -> Dict[str, Any]:
+    minute = ts.hour * 60 + ts.minute
+    point: Dict[str, Any] = dict(STATION_PROFILE)
+    for name, column in _virtual_table().items():
+        point[name] = column[minute]
+    point["gps_valid"] = True
+    point["timestamp"] = ts.isoformat()
+    point.update(_VIRTUAL_META)
+    return point
+
+
+@functools.lru_cache(maxsize=None)
+def _virtual_bucket(first_minute: int, minutes: int) -> Tuple[float, ...]:
+    """Packed count/sum/min/max per ROLLUP_FIELDS over a span of the virtual day."""
+    table = _virtual_table()
+    stats: List[float] = [float(minutes)]
+    for field in ROLLUP_FIELDS:
+        values = table[field][first_minute:first_minute + minutes]
+        stats.extend((len(values), float(sum(values)), min(values), max(values)))
+    return tuple(stats)
+
+
+def _virtual_rollup(resolution: str, start: Optional[float], end: Optional[float]) -> List[Dict[str, Any]]:
+    width = RESOLUTIONS[resolution]
+    end = _utc_now().timestamp() if end is None else end
+    last = int(end // width) * width
+    first = last - width * (DEFAULT_RETENTION[resolution] - 1) if start is None else int(start // width) * width
+    first = max(first, last - width * (MAX_ROLLUP_ROWS - 1))
+    minutes = min(width, 86400) // 60
+    buckets = [
+        (bucket, _virtual_bucket(int(bucket % 86400) // 60, minutes))
+        for bucket in range(first, last + 1, width)
+    ]
+    return bucket_rows(buckets, ROLLUP_FIELDS)
+
+
+def _reading_time(payload: Dict[str, Any], received: datetime) -> datetime:
+    """When a reading was taken: ``age`` seconds before upload (queued readings), else on arrival."""
+    age = payload.get("age")
+    if isinstance(age, (int, float)) and not isinstance(age, bool) and 0 < age < 7 * 86400:
+        return received - timedelta(seconds=age)
+    return received
+
+
+def _normalize(key: str, payload: Dict[str, Any], ts: datetime) -> Dict[str, Any]:
+    profile = STATION_PROFILE if key == DEFAULT_STATION else {"station_id": key}
+    payload = {field: value for field, value in payload.items() if field != "age"}
+    return {
+        **profile,
         **payload,
         "timestamp": payload.get("timestamp") or ts.isoformat(),
         "status": "online",
@@ -98,39 +201,226 @@ def remember_sensor_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
         "origin": payload.get("origin") or "greenpulse_sensor_feed",
     }
 
-    _LATEST_PAYLOAD = normalized
-    _LATEST_PAYLOAD_AT = ts
-    _RECENT_HISTORY.append(normalized)
-    _RECENT_HISTORY = _RECENT_HISTORY[-MAX_HISTORY_POINTS:]
-    return normalized
 
+def _add_to_rollup(key: str, payload: Dict[str, Any], received_at: float) -> None:
+    if _STORE.shared:
+        return
+    rollup = _ROLLUPS.get(key)
+    if rollup is None:
+        rollup = _ROLLUPS[key] = SensorRollup(ROLLUP_FIELDS)
+    rollup.add(payload, received_at)
+
+
+def remember_sensor_payloads(payloads: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Store the readings of one request, received now, in a single write to
+    the state store; returns them normalized. StateStoreError when a shared
+    store cannot be written (nothing is logged or archived then).
+    """
+    ts = _utc_now()
+    received_at = ts.timestamp()
+    records = []
+    taken = []
+    for payload in payloads:
+        key = station_key(payload.get("station_id"), DEFAULT_STATION)
+        reading_ts = _reading_time(payload, ts)
+        records.append((key, _normalize(key, payload, reading_ts), received_at))
+        taken.append(reading_ts.timestamp())
+    _STORE.record(records)
+
+    for (key, normalized, _), reading_at in zip(records, taken):
+        _add_to_rollup(key, normalized, reading_at)
+        if _LOG is not None:
+            _LOG.append(normalized, reading_at)
+        if _ARCHIVE is not None:
+            _ARCHIVE.append(key, normalized, reading_at)
+    return [normalized for _, normalized, _ in records]
+
+
+def remember_sensor_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return remember_sensor_payloads([payload])[0]
+
+
+def _restore_from_log() -> None:
+    global _LOG
+
+    from _telemetry_log import TelemetryLog, record_to_reading
+
+    _LOG = TelemetryLog(TELEMETRY_LOG_DIR, LOG_NUMERIC_FIELDS)
+    if _STORE.shared:
+        return   # the shared store already has what this instance's log holds
+    records = []
+    for record in _LOG.tail(MAX_HISTORY_POINTS):
+        reading = record_to_reading(record, LOG_NUMERIC_FIELDS, LOG_INT_FIELDS, ["gps_valid"])
+        if str(reading.get("station_id", "")).isdigit():
+            reading["station_id"] = int(reading["station_id"])
+        ts = datetime.fromtimestamp(record[0], timezone.utc)
+        reading["timestamp"] = ts.isoformat()
+        key = station_key(reading.get("station_id"), DEFAULT_STATION)
+        normalized = _normalize(key, reading, ts)
+        records.append((key, normalized, record[0]))
+        _add_to_rollup(key, normalized, record[0])
+    _STORE.record(records)
+
+
+def _open_archive() -> None:
+    global _ARCHIVE
+
+    from _archive import TelemetryArchive
+
+    _ARCHIVE = TelemetryArchive(
+        TELEMETRY_ARCHIVE_DB,
+        LOG_NUMERIC_FIELDS,
+        text_fields=ARCHIVE_TEXT_FIELDS,
+        int_fields=LOG_INT_FIELDS,
+        bool_fields=["gps_valid"],
+        background=False,
+        tz=timezone.utc,
+    )
+
+
+def _load(station_id: Any, history: int = 0) -> Tuple[str, StationSnapshot]:
+    """
+    Resolve ``station_id`` (None/"" = the last station that posted, else the
+    default station) and read its state with up to ``history`` recent
+    payloads in one store request. A store that cannot be read counts as
+    empty, the same as a cold instance.
+    """
+    requested = None if station_id is None or station_id == "" else station_key(station_id, DEFAULT_STATION)
+    try:
+        snapshot = _STORE.load(requested, history)
+    except StateStoreError as exc:
+        print(f"⚠️ Telemetry state read failed: {exc}", file=sys.stderr)
+        snapshot = StationSnapshot(requested, None, None, [])
+    return snapshot.key or DEFAULT_STATION, snapshot
 
-def _recent_payload_is_fresh() -> bool:
-    if not _LATEST_PAYLOAD_AT:
+
+def _recent_payload_is_fresh(snapshot: StationSnapshot) -> bool:
+    if snapshot.received_at is None:
         return False
-    return (_utc_now() - _LATEST_PAYLOAD_AT) <= timedelta(minutes=POST_TTL_MINUTES)
+    return _utc_now().timestamp() - snapshot.received_at <= POST_TTL_MINUTES * 60
+
+
+def known_stations() -> List[str]:
+    return _STORE.stations()
+
 
+def get_current_sensor_data(station_id: Any = None) -> Optional[Dict[str, Any]]:
+    """
+    Latest payload of ``station_id`` (or of the last station that posted).
 
-def get_current_sensor_data() -> Dict[str, Any]:
-    if _LATEST_PAYLOAD and _recent_payload_is_fresh():
-        return dict(_LATEST_PAYLOAD)
-    return _build_virtual_point(_utc_now())
+    Falls back to the virtual pilot station when no fresh data is available
+    for the default station; returns None for other, unknown stations.
+    """
+    key, snapshot = _load(station_id)
+    if snapshot.latest is not None and _recent_payload_is_fresh(snapshot):
+        return dict(snapshot.latest)
+    if station_id is None or station_id == "" or key == DEFAULT_STATION:
+        return _build_virtual_point(_utc_now())
+    return None
 
 
-def get_sensor_history(limit: int = 120) -> List[Dict[str, Any]]:
+def get_sensor_history(limit: int = 120, station_id: Any = None) -> Optional[List[Dict[str, Any]]]:
     safe_limit = max(1, min(limit, MAX_HISTORY_POINTS))
+    key, snapshot = _load(station_id, safe_limit)
+
+    recent_history = snapshot.history
+    if recent_history and _recent_payload_is_fresh(snapshot):
+        if len(recent_history) >= safe_limit or key != DEFAULT_STATION:
+            return [dict(row) for row in recent_history]
+
+    if station_id is not None and station_id != "" and key != DEFAULT_STATION:
+        return None
+
+    # Aligned to the minute so points match the precomputed table exactly
+    end = _utc_now().replace(second=0, microsecond=0)
+    step = timedelta(minutes=HISTORY_STEP_MINUTES)
+    start = end - step * (safe_limit - 1)
+    return [_build_virtual_point(start + step * idx) for idx in range(safe_limit)]
+
+
+def _row_time(row: Dict[str, Any]) -> Optional[float]:
+    try:
+        return parse_time(row.get("timestamp"))
+    except ValueError:   # client-supplied timestamp we cannot read
+        return None
+
+
+def get_sensor_range(
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    station_id: Any = None,
+    limit: int = MAX_RANGE_ROWS,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Raw readings with ``start <= ts <= end`` (epoch seconds, either optional),
+    oldest first: from the archive when TELEMETRY_ARCHIVE_DB is set, otherwise
+    from the recent in-memory history. The default station falls back to the
+    virtual curve; returns None for unknown stations.
+    """
+    limit = max(1, min(limit, MAX_RANGE_ROWS))
+    key, snapshot = _load(station_id, MAX_HISTORY_POINTS)
+    if _ARCHIVE is not None:
+        rows = _ARCHIVE.query(key, start, end, limit)
+        if rows or (key != DEFAULT_STATION and snapshot.latest is not None):
+            return rows
+
+    recent_history = snapshot.history
+    if recent_history and (key != DEFAULT_STATION or _recent_payload_is_fresh(snapshot)):
+        rows = []
+        for row in recent_history:
+            ts = _row_time(row)
+            if ts is not None and (start is None or ts >= start) and (end is None or ts <= end):
+                rows.append(dict(row))
+        return rows[:limit] if start is not None else rows[-limit:]
+    if key != DEFAULT_STATION:
+        return None
+
+    step = timedelta(minutes=HISTORY_STEP_MINUTES)
+    last = _utc_now().replace(second=0, microsecond=0)
+    if end is not None:
+        last = min(last, datetime.fromtimestamp(end, timezone.utc).replace(second=0, microsecond=0))
+    count = limit if start is None else min(limit, max(0, int((last.timestamp() - start) // step.total_seconds()) + 1))
+    first = last - step * (count - 1)
+    return [_build_virtual_point(first + step * idx) for idx in range(count)]
+
+
+def _history_rollup(history: List[Dict[str, Any]]) -> Optional[SensorRollup]:
+    if not history:
+        return None
+    rollup = SensorRollup(ROLLUP_FIELDS)
+    for row in history:
+        ts = _row_time(row)
+        if ts is not None:
+            rollup.add(row, ts)
+    return rollup
 
-    if _RECENT_HISTORY and _recent_payload_is_fresh():
-        recent = _RECENT_HISTORY[-safe_limit:]
-        if len(recent) >= safe_limit:
-            return [dict(point) for point in recent]
 
-    end = _utc_now()
-    history: List[Dict[str, Any]] = []
+def get_sensor_rollup(
+    resolution: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    station_id: Any = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Aggregated history at ``resolution`` (see RESOLUTIONS) between epoch
+    seconds ``start`` and ``end``. Stations that posted here are served from
+    their ingest-time rollups; the default station falls back to the virtual
+    curve. Returns None for unknown stations; KeyError for a bad resolution.
+    With a shared store the buckets cover the stored recent history only.
+    """
+    if resolution not in RESOLUTIONS:
+        raise KeyError(resolution)
+    key, snapshot = _load(station_id, MAX_HISTORY_POINTS if _STORE.shared else 0)
+    rollup = _ROLLUPS.get(key) if not _STORE.shared else _history_rollup(snapshot.history)
+    if rollup is not None and (key != DEFAULT_STATION or _recent_payload_is_fresh(snapshot)):
+        return rollup.query(resolution, start, end)
+    if key == DEFAULT_STATION:
+        return _virtual_rollup(resolution, start, end)
+    return None
 
-    for idx in range(safe_limit):
-        minutes_back = (safe_limit - idx - 1) * HISTORY_STEP_MINUTES
-        ts = end - timedelta(minutes=minutes_back)
-        history.append(_build_virtual_point(ts))
 
-    return history
+if TELEMETRY_LOG_DIR:
+    _restore_from_log()
+if TELEMETRY_ARCHIVE_DB:
+    _open_archive()
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import atexit
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from _history import _as_float
+
+MAGIC = b"GPLOG\x00\x01\x00"
+HEADER = struct.Struct("<8sII")        # magic, record size, schema crc32
+SEGMENT_SUFFIX = ".gplog"
+
+LogRecord = Tuple[float, Dict[str, Optional[str]], Tuple[float, ...]]
+
+# Fixed-width text fields and their size in UTF-8 bytes; ingest rejects
+# longer values (see ``text_field_error``) rather than have them cut here
+TEXT_FIELDS: Tuple[Tuple[str, int], ...] = (("station_id", 16), ("station_name", 32))
+
+
+def text_field_error(reading: Dict[str, Any], text_fields: Sequence[Tuple[str, int]] = TEXT_FIELDS) -> Optional[str]:
+    """Message naming the first text field too long for the log, or None."""
+    for name, size in text_fields:
+        value = reading.get(name)
+        if value is not None and len(str(value).encode("utf-8")) > size:
+            return f"{name} longer than {size} bytes: {value!r}"
+    return None
+
+
+class TelemetryLog:
+    """
+    Append-only, segment-rotated binary log of sensor readings.
+
+    Every record has the same width: timestamp, fixed-size text fields (the
+    first one is the station id), one float64 per numeric field (NaN when
+    missing) and a CRC32 so torn writes after a crash are detected and cut
+    off. Writes are buffered and fsync'ed in batches; recovery memory-maps
+    only the newest segments needed to rebuild the in-memory views.
+
+    With ``read_only`` nothing is opened for writing (not even a partial
+    trailing record is cut off), so another process can own the log while
+    this one only reads its ``tail``.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        numeric_fields: Sequence[str],
+        text_fields: Sequence[Tuple[str, int]] = TEXT_FIELDS,
+        segment_records: int = 65536,
+        fsync_every: int = 32,
+        fsync_interval: float = 5.0,
+        max_segments: int = 0,
+        read_only: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.numeric_fields = tuple(numeric_fields)
+        self.text_fields = tuple(text_fields)
+        self.segment_records = segment_records
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.max_segments = max_segments
+        self.read_only = read_only
+
+        layout = "<d" + "".join(f"{size}s" for _, size in self.text_fields) + "d" * len(self.numeric_fields)
+        self._body = struct.Struct(layout)
+        self._crc = struct.Struct("<I")
+        self.record_size = self._body.size + self._crc.size
+        schema = ",".join([f"{name}:{size}" for name, size in self.text_fields] + list(self.numeric_fields))
+        self._header = HEADER.pack(MAGIC, self.record_size, zlib.crc32(schema.encode("utf-8")))
+
+        self._file: Optional[BinaryIO] = None
+        self._segment_seq = 0
+        self._segment_count = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+            self._open_tail_segment()
+            atexit.register(self.close)
+
+    # ── Segments ─────────────────────────────────────────────────────────────
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:08d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit():
+                seqs.append(int(name[:-len(SEGMENT_SUFFIX)]))
+        return sorted(seqs)
+
+    def _valid_records(self, path: str) -> int:
+        """Number of whole records in a segment, or -1 if its header does not match."""
+        size = os.path.getsize(path)
+        if size < HEADER.size:
+            return -1
+        with open(path, "rb") as fh:
+            if fh.read(HEADER.size) != self._header:
+                return -1
+        return (size - HEADER.size) // self.record_size
+
+    def _open_tail_segment(self) -> None:
+        seqs = self._segments()
+        if seqs:
+            path = self._segment_path(seqs[-1])
+            count = self._valid_records(path)
+            if 0 <= count < self.segment_records:
+                # Drop a partially written trailing record left by a crash.
+                with open(path, "r+b") as fh:
+                    fh.truncate(HEADER.size + count * self.record_size)
+                self._segment_seq = seqs[-1]
+                self._segment_count = count
+                self._file = open(path, "ab")
+                return
+        self._rotate(seqs[-1] + 1 if seqs else 0)
+
+    def _rotate(self, seq: int) -> None:
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+        self._segment_seq = seq
+        self._segment_count = 0
+        self._file = open(self._segment_path(seq), "ab")
+        self._file.write(self._header)
+        self.sync()
+
+        if self.max_segments:
+            seqs = self._segments()
+            for old in seqs[:-self.max_segments]:
+                os.remove(self._segment_path(old))
+
+    # ── Writing ──────────────────────────────────────────────────────────────
+
+    def _pack(self, ts: float, texts: Sequence[Any], values: Iterable[float]) -> bytes:
+        encoded = []
+        for (name, size), value in zip(self.text_fields, texts):
+            data = b"" if value is None else str(value).encode("utf-8")
+            if len(data) > size:
+                raise ValueError(f"{name} longer than {size} bytes: {value!r}")
+            encoded.append(data)
+        body = self._body.pack(ts, *encoded, *values)
+        return body + self._crc.pack(zlib.crc32(body))
+
+    def append(self, reading: Dict[str, Any], ts: float) -> None:
+        """Append one reading taken at epoch-second ``ts``; fsyncs in batches."""
+        self._write(self._pack(
+            ts,
+            [reading.get(name) for name, _ in self.text_fields],
+            [_as_float(reading.get(f)) for f in self.numeric_fields],
+        ))
+
+    def append_values(self, ts: float, texts: Sequence[Any], values: Sequence[float]) -> None:
+        """Like :meth:`append` with text and float values already in field order."""
+        self._write(self._pack(ts, texts, values))
+
+    def _write(self, record: bytes) -> None:
+        if self._file is None:
+            raise ValueError(f"Telemetry log {self.directory} is {'read-only' if self.read_only else 'closed'}")
+        if self._segment_count >= self.segment_records:
+            self._rotate(self._segment_seq + 1)
+        self._file.write(record)
+        self._segment_count += 1
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+
+    # ── Recovery ─────────────────────────────────────────────────────────────
+
+    def _unpack(self, raw: bytes) -> Optional[LogRecord]:
+        body = raw[:self._body.size]
+        (crc,) = self._crc.unpack_from(raw, self._body.size)
+        if zlib.crc32(body) != crc:
+            return None
+        values = self._body.unpack(body)
+        ntext = len(self.text_fields)
+        texts = {}
+        for (name, _), value in zip(self.text_fields, values[1:1 + ntext]):
+            value = value.rstrip(b"\x00")
+            texts[name] = value.decode("utf-8", "replace") if value else None
+        return values[0], texts, values[1 + ntext:]
+
+    def tail(self, limit: int) -> Iterator[LogRecord]:
+        """
+        Yield up to ``limit`` newest intact records, oldest first.
+
+        Segments are memory-mapped newest first and only until ``limit``
+        records are covered, so recovery cost is independent of log size.
+        """
+        if self._file is not None:
+            self._file.flush()
+        plan: List[Tuple[str, int, int]] = []
+        remaining = limit
+        for seq in reversed(self._segments()):
+            if remaining <= 0:
+                break
+            path = self._segment_path(seq)
+            count = self._valid_records(path)
+            if count <= 0:
+                continue
+            take = min(count, remaining)
+            plan.append((path, count - take, count))
+            remaining -= take
+
+        for path, start, stop in reversed(plan):
+            with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for i in range(start, stop):
+                    offset = HEADER.size + i * self.record_size
+                    record = self._unpack(mm[offset:offset + self.record_size])
+                    if record is not None:
+                        yield record
+
+
+def record_to_reading(
+    record: LogRecord,
+    numeric_fields: Iterable[str],
+    int_fields: Iterable[str] = (),
+    bool_fields: Iterable[str] = (),
+) -> Dict[str, Any]:
+    """Rebuild a reading dict from a log record, skipping missing values."""
+    _, texts, values = record
+    int_fields = frozenset(int_fields)
+    bool_fields = frozenset(bool_fields)
+    reading: Dict[str, Any] = {name: value for name, value in texts.items() if value is not None}
+    for field, value in zip(numeric_fields, values):
+        if value != value:   # NaN = missing
+            continue
+        if field in bool_fields:
+            reading[field] = bool(value)
+        elif field in int_fields:
+            reading[field] = int(value)
+        else:
+            reading[field] = value
+    return reading
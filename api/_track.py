@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+METERS_PER_DEGREE_LAT = 110_540.0
+METERS_PER_DEGREE_LNG = 111_320.0   # at the equator, scaled by cos(latitude)
+
+TrackPoint = Dict[str, Any]
+
+
+def _offset_m(origin: TrackPoint, point: TrackPoint) -> Tuple[float, float]:
+    """Local equirectangular (x, y) of ``point`` in metres from ``origin``; fine at track scale."""
+    x = (point["lng"] - origin["lng"]) * METERS_PER_DEGREE_LNG * math.cos(math.radians(origin["lat"]))
+    y = (point["lat"] - origin["lat"]) * METERS_PER_DEGREE_LAT
+    return x, y
+
+
+def _distance_m(a: TrackPoint, b: TrackPoint) -> float:
+    return math.hypot(*_offset_m(a, b))
+
+
+def _segment_distance_m(point: TrackPoint, start: TrackPoint, end: TrackPoint) -> float:
+    """Distance in metres from ``point`` to the segment ``start``–``end``."""
+    px, py = _offset_m(start, point)
+    ex, ey = _offset_m(start, end)
+    length2 = ex * ex + ey * ey
+    if length2 == 0.0:
+        return math.hypot(px, py)
+    t = max(0.0, min(1.0, (px * ex + py * ey) / length2))
+    return math.hypot(px - t * ex, py - t * ey)
+
+
+def douglas_peucker(points: List[TrackPoint], tolerance_m: float) -> List[TrackPoint]:
+    """Batch Douglas–Peucker (iterative, keeps both ends)."""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        worst, worst_index = 0.0, -1
+        for i in range(first + 1, last):
+            d = _segment_distance_m(points[i], points[first], points[last])
+            if d > worst:
+                worst, worst_index = d, i
+        if worst > tolerance_m:
+            keep[worst_index] = True
+            stack.append((first, worst_index))
+            stack.append((worst_index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+class TrackStore:
+    """
+    GPS track simplified online at ingest (opening-window Douglas–Peucker).
+
+    Every committed vertex gets a monotonically increasing ``seq`` that
+    clients use as a cursor (``since``); committed points never change, so
+    they can be streamed append-only. The newest fix is kept separately as a
+    provisional ``tail`` until the next turn commits a vertex.
+
+    Fixes closer than ``min_step_m`` to the previous one are ignored (GPS
+    jitter). A fix is buffered while every buffered fix stays within
+    ``tolerance_m`` of the straight line from the last vertex; otherwise the
+    previous fix becomes a vertex. When ``capacity`` vertices are reached the
+    stored track is re-simplified with a doubled tolerance instead of
+    dropping its start, so a long trip keeps its full extent.
+    """
+
+    def __init__(
+        self,
+        tolerance_m: float = 5.0,
+        min_step_m: float = 3.0,
+        capacity: int = 2000,
+        max_window: int = 256,
+    ) -> None:
+        self.tolerance_m = tolerance_m
+        self.min_step_m = min_step_m
+        self.capacity = capacity
+        self.max_window = max_window
+        self._points: Deque[TrackPoint] = deque()
+        self._window: List[TrackPoint] = []     # fixes since the last vertex, newest last
+        self._compact_tolerance = tolerance_m
+        self.last_seq = 0
+
+    def __len__(self) -> int:
+        return len(self._points) + (1 if self._window else 0)
+
+    @property
+    def tail(self) -> Optional[TrackPoint]:
+        """Newest fix when it is not a committed vertex yet."""
+        return self._window[-1] if self._window else None
+
+    def clear(self) -> None:
+        self._points.clear()
+        self._window = []
+        self._compact_tolerance = self.tolerance_m
+
+    def _commit(self, point: TrackPoint) -> TrackPoint:
+        self.last_seq += 1
+        vertex = {**point, "seq": self.last_seq}
+        self._points.append(vertex)
+        if len(self._points) > self.capacity:
+            self._compact()
+        return vertex
+
+    def _compact(self) -> None:
+        points = douglas_peucker(list(self._points), self._compact_tolerance)
+        while len(points) > self.capacity * 3 // 4:
+            self._compact_tolerance *= 2
+            points = douglas_peucker(points, self._compact_tolerance)
+        self._points = deque(points)
+
+    def add(self, lat: float, lng: float, timestamp: Any) -> Optional[TrackPoint]:
+        """Feed one fix; returns the vertex it committed, if any."""
+        point = {"lat": lat, "lng": lng, "timestamp": timestamp}
+        if not self._points:
+            return self._commit(point)
+
+        last = self._window[-1] if self._window else self._points[-1]
+        if _distance_m(last, point) < self.min_step_m:
+            return None
+
+        anchor = self._points[-1]
+        if len(self._window) < self.max_window and all(
+            _segment_distance_m(p, anchor, point) <= self.tolerance_m for p in self._window
+        ):
+            self._window.append(point)
+            return None
+
+        vertex = self._commit(self._window[-1])
+        self._window = [point]
+        return vertex
+
+    def points(self, since: Optional[int] = None) -> List[TrackPoint]:
+        """Committed vertices oldest first, only those with ``seq > since`` when given."""
+        if since is None:
+            return list(self._points)
+        # Vertices are ordered by seq, so scan back from the newest one.
+        newer = []
+        for point in reversed(self._points):
+            if point["seq"] <= since:
+                break
+            newer.append(point)
+        newer.reverse()
+        return newer
+
+    def snapshot(self, since: Optional[int] = None) -> Dict[str, Any]:
+        """Payload for REST and Socket.IO: vertices after ``since``, tail and cursor."""
+        track = self.points(since)
+        return {
+            "track": track,
+            "tail": self.tail,
+            "last_seq": self.last_seq,
+            "count": len(track),
+        }
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import math
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Compact ESP32 → server encoding, selected by Content-Type on POST /api/sensor-data
+WIRE_CONTENT_TYPE = "application/vnd.greenpulse.reading.v1"
+
+# Fixed-point sensor values: (field, scale). The wire carries round(value × scale)
+# as int32; MISSING marks a value the node did not measure.
+WIRE_FIELDS: Tuple[Tuple[str, int], ...] = (
+    ("temperature", 100), ("temp_inside", 100), ("humidity", 10),
+    ("co2_ppm", 1), ("co_ppm", 100), ("air_quality_index", 1),
+    ("ph", 1000), ("light_intensity", 1), ("water_level", 10),
+    ("latitude", 10_000_000), ("longitude", 10_000_000),
+    ("altitude", 10), ("accuracy", 100),
+)
+MISSING = -2 ** 31
+
+# One reading, little-endian, 60 bytes (the same reading is ~300 bytes of JSON):
+#   u16 station_id (0 = server default), u8 flags (bit 0 = gps_valid),
+#   u8 satellites (255 = missing), u32 age in seconds before upload (0 = now),
+#   int32 × len(WIRE_FIELDS) fixed-point values.
+# A body is one or more records back to back.
+RECORD = struct.Struct("<HBBI" + "i" * len(WIRE_FIELDS))
+FLAG_GPS_VALID = 0x01
+NO_SATELLITES = 0xFF
+
+_HEADER_SLOTS = 4
+NAN = float("nan")
+
+WireRecord = Tuple[Optional[int], int, Tuple[float, ...]]
+
+
+class WireDecoder:
+    """
+    Decodes wire records straight into a fixed numeric field order, e.g. the
+    columns of a ``SensorHistory``: one float per field, NaN when missing or
+    not carried on the wire. ``satellites`` and ``gps_valid`` come from the
+    record header.
+    """
+
+    def __init__(self, numeric_fields: Iterable[str]) -> None:
+        self.numeric_fields = tuple(numeric_fields)
+        slots = {name: (_HEADER_SLOTS + i, scale) for i, (name, scale) in enumerate(WIRE_FIELDS)}
+        # Per target field: (record slot, scale), or None when the wire does not carry it
+        self._plan = [slots.get(field) for field in self.numeric_fields]
+        self._satellites = self._index("satellites")
+        self._gps_valid = self._index("gps_valid")
+
+    def _index(self, field: str) -> Optional[int]:
+        return self.numeric_fields.index(field) if field in self.numeric_fields else None
+
+    def decode(self, body: bytes) -> List[WireRecord]:
+        """``(station_id, age_seconds, values)`` per record; ValueError for a malformed body."""
+        if len(body) % RECORD.size:
+            raise ValueError(
+                f"Binary body is {len(body)} bytes, not a multiple of the {RECORD.size}-byte record"
+            )
+        plan = self._plan
+        records = []
+        for raw in RECORD.iter_unpack(body):
+            values = [
+                NAN if slot is None or raw[slot[0]] == MISSING else raw[slot[0]] / slot[1]
+                for slot in plan
+            ]
+            if self._satellites is not None and raw[2] != NO_SATELLITES:
+                values[self._satellites] = float(raw[2])
+            if self._gps_valid is not None:
+                values[self._gps_valid] = 1.0 if raw[1] & FLAG_GPS_VALID else 0.0
+            records.append((raw[0] or None, raw[3], tuple(values)))
+        return records
+
+
+_READING_FIELDS = tuple(name for name, _ in WIRE_FIELDS) + ("satellites", "gps_valid")
+_READING_DECODER = WireDecoder(_READING_FIELDS)
+
+
+def decode_readings(body: bytes) -> List[Dict[str, Any]]:
+    """
+    Wire records as JSON-style reading dicts (missing values left out), for
+    dict-based stores. A record's age is kept as ``age`` (seconds before
+    upload) when it is not 0, the same key JSON readings use.
+    """
+    readings = []
+    for station_id, age, values in _READING_DECODER.decode(body):
+        reading: Dict[str, Any] = {} if station_id is None else {"station_id": station_id}
+        if age:
+            reading["age"] = age
+        for field, value in zip(_READING_FIELDS, values):
+            if math.isnan(value):
+                continue
+            if field == "gps_valid":
+                reading[field] = bool(value)
+            elif field == "satellites":
+                reading[field] = int(value)
+            else:
+                reading[field] = value
+        readings.append(reading)
+    return readings
+
+
+def encode_reading(reading: Dict[str, Any], age: int = 0) -> bytes:
+    """Pack one reading dict into a wire record (the firmware does the same in C)."""
+    values = []
+    for field, scale in WIRE_FIELDS:
+        value = reading.get(field)
+        values.append(MISSING if value is None or value != value else int(round(float(value) * scale)))
+    satellites = reading.get("satellites")
+    return RECORD.pack(
+        int(reading.get("station_id") or 0),
+        FLAG_GPS_VALID if reading.get("gps_valid") else 0,
+        NO_SATELLITES if satellites is None else int(satellites),
+        max(0, int(age)),
+        *values,
+    )
+
+
+def encode_readings(readings: Sequence[Dict[str, Any]]) -> bytes:
+    return b"".join(encode_reading(reading) for reading in readings)
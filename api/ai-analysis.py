@@ -1,34 +1,21 @@
-from http.server import BaseHTTPRequestHandler
-import json
 import os
 import sys
-import urllib.request
-import urllib.error
 
 sys.path.insert(0, os.path.dirname(__file__))
+from _handler import JSONHandler
+from _ai_cache import cache_key, get_cache, quantize_inputs
+from _openai import get_client
 from _telemetry import get_current_sensor_data
 
 ANALYSIS_MODEL = os.environ.get("OPENAI_ANALYSIS_MODEL", "gpt-4o-mini")
+PROMPT_VERSION = 1
 
 
-class handler(BaseHTTPRequestHandler):
-    def _cors(self):
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
-
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors()
-        self.end_headers()
+class handler(JSONHandler):
+    allowed_methods = "POST, OPTIONS"
 
     def do_POST(self):
-        length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(length) if length else b"{}"
-        try:
-            req = json.loads(body)
-        except Exception:
-            req = {}
+        req = self._read_json()
 
         current = get_current_sensor_data()
         merged = {
@@ -43,17 +30,19 @@ class handler(BaseHTTPRequestHandler):
             "station_name": req.get("station_name", current.get("station_name")),
         }
 
+        inputs = quantize_inputs(merged)
+
         prompt = f"""Analyze this GreenPulse telemetry snapshot and reply in Russian.
 
-Station: {merged["station_name"]}
-- Outside temperature: {merged["temperature"]} C
-- Internal temperature: {merged["temp_inside"]} C
-- Humidity: {merged["humidity"]}%
-- CO2: {merged["co2_ppm"]} ppm
-- CO: {merged["co_ppm"]} ppm
-- Air quality index: {merged["air_quality_index"]}
-- pH: {merged["ph"]}
-- Light intensity: {merged["light_intensity"]} lux
+Station: {inputs["station_name"]}
+- Outside temperature: {inputs["temperature"]} C
+- Internal temperature: {inputs["temp_inside"]} C
+- Humidity: {inputs["humidity"]}%
+- CO2: {inputs["co2_ppm"]} ppm
+- CO: {inputs["co_ppm"]} ppm
+- Air quality index: {inputs["air_quality_index"]}
+- pH: {inputs["ph"]}
+- Light intensity: {inputs["light_intensity"]} lux
 
 Use this exact structure:
 Status: ...
@@ -85,33 +74,16 @@ Keep it short, concrete, and investor-demo friendly without sounding fake."""
                 "temperature": 0.4,
                 "max_tokens": 280,
             }
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            req = urllib.request.Request(
-                "https://api.openai.com/v1/chat/completions",
-                data=json.dumps(req_data).encode("utf-8"),
-                headers=headers,
-                method="POST",
+            text, cache_status = get_cache().get_or_compute(
+                cache_key("ai-analysis", PROMPT_VERSION, ANALYSIS_MODEL, inputs),
+                lambda: get_client().chat_completion(**req_data)["choices"][0]["message"]["content"],
             )
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                response_data = json.loads(resp.read().decode("utf-8"))
-            text = response_data["choices"][0]["message"]["content"] or "Analysis is unavailable."
             self._respond(200, {
                 "status": "success",
-                "analysis": text,
+                "analysis": text or "Analysis is unavailable.",
+                "cache": cache_status,
                 "parameters": merged,
                 "model": ANALYSIS_MODEL,
             })
         except Exception as exc:
             self._respond(500, {"status": "error", "message": str(exc)})
-
-    def _respond(self, status, payload):
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self._cors()
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
@@ -1,35 +1,36 @@
-from http.server import BaseHTTPRequestHandler
-import json
 import os
-import urllib.request
+import sys
 
+sys.path.insert(0, os.path.dirname(__file__))
+from _handler import JSONHandler
+from _ai_cache import cache_key, get_cache, quantize_inputs
+from _openai import get_client
 
-class handler(BaseHTTPRequestHandler):
-    def _cors(self):
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+PROMPT_VERSION = 1
 
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors()
-        self.end_headers()
+
+class handler(JSONHandler):
+    allowed_methods = "POST, OPTIONS"
 
     def do_POST(self):
-        length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(length) if length else b"{}"
-        try:
-            req = json.loads(body)
-        except Exception:
-            req = {}
+        req = self._read_json()
 
-        temperature = req.get("temperature", 22)
-        temp_inside = req.get("temp_inside")
-        humidity = req.get("humidity", 65)
-        co2_ppm = req.get("co2_ppm", 420)
-        air_quality_index = req.get("air_quality_index")
-        ph = req.get("ph", 7.0)
-        light_intensity = req.get("light_intensity", 450)
+        inputs = quantize_inputs({
+            "temperature": req.get("temperature", 22),
+            "temp_inside": req.get("temp_inside"),
+            "humidity": req.get("humidity", 65),
+            "co2_ppm": req.get("co2_ppm", 420),
+            "air_quality_index": req.get("air_quality_index"),
+            "ph": req.get("ph", 7.0),
+            "light_intensity": req.get("light_intensity", 450),
+        })
+        temperature = inputs["temperature"]
+        temp_inside = inputs["temp_inside"]
+        humidity = inputs["humidity"]
+        co2_ppm = inputs["co2_ppm"]
+        air_quality_index = inputs["air_quality_index"]
+        ph = inputs["ph"]
+        light_intensity = inputs["light_intensity"]
 
         temp_inside_line = f"- Температура ішінде (DS18B20): {temp_inside} C\n" if temp_inside is not None else ""
         aqi_line = f"- Ауа сапасы індексі (MQ135 AQI): {air_quality_index}/300\n" if air_quality_index is not None else ""
@@ -68,27 +69,10 @@ class handler(BaseHTTPRequestHandler):
                 "max_tokens": 400,
                 "temperature": 0.4,
             }
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            req = urllib.request.Request(
-                "https://api.openai.com/v1/chat/completions",
-                data=json.dumps(req_data).encode("utf-8"),
-                headers=headers,
-                method="POST",
+            analysis, cache_status = get_cache().get_or_compute(
+                cache_key("ai-analyze-sensors", PROMPT_VERSION, req_data["model"], inputs),
+                lambda: get_client().chat_completion(**req_data)["choices"][0]["message"]["content"],
             )
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                response_data = json.loads(resp.read().decode("utf-8"))
-            self._respond(200, {"analysis": response_data["choices"][0]["message"]["content"]})
+            self._respond(200, {"analysis": analysis, "cache": cache_status})
         except Exception as e:
             self._respond(500, {"error": str(e)})
-
-    def _respond(self, status, payload):
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self._cors()
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
@@ -1,59 +1,18 @@
-from http.server import BaseHTTPRequestHandler
-import json
 import os
-import urllib.request
-import re
-
-CHAT_MODEL = os.environ.get("OPENAI_CHAT_MODEL", "gpt-4o-mini")
-
-# Language detection patterns
-LANGUAGE_PATTERNS = {
-    'ru': r'[а-яА-ЯёЁ]',
-    'kk': r'[әіңғүұқөһӘІҢҒҮҰҚӨҺ]',
-    'zh': r'[\u4e00-\u9fff]',
-    'ja': r'[\u3040-\u309f\u30a0-\u30ff]',
-    'ko': r'[\uac00-\ud7af]',
-    'ar': r'[\u0600-\u06ff]',
-    'he': r'[\u0590-\u05ff]',
-    'hi': r'[\u0900-\u097f]',
-    'th': r'[\u0e00-\u0e7f]',
-    'el': r'[\u0370-\u03ff]',
-}
-
-
-def detect_language(text):
-    """Detect language from text. Returns language code or 'auto'."""
-    if not text:
-        return 'en'
-
-    for lang_code, pattern in LANGUAGE_PATTERNS.items():
-        if re.search(pattern, text):
-            return lang_code
-
-    # Check for common European languages
-    text_lower = text.lower()
-    if any(word in text_lower for word in ['el', 'la', 'los', 'las', 'es', 'un', 'una']):
-        return 'es'
-    if any(word in text_lower for word in ['le', 'la', 'les', 'un', 'une', 'est', 'sont']):
-        return 'fr'
-    if any(word in text_lower for word in ['der', 'die', 'das', 'ein', 'eine', 'ist', 'sind']):
-        return 'de'
-
-    return 'en'  # Default to English
+import sys
 
+sys.path.insert(0, os.path.dirname(__file__))
+from _conversations import get_store, resolve_session
+from _handler import JSONHandler
+from _language import detect_language
+from _openai import get_client
+from _prompts import PromptCache, record_usage
+from _sse import EVENT_STREAM, sse_event, wants_event_stream
 
-def build_system_prompt(user_prefs=None, topic_focus=None):
-    """Build adaptive system prompt based on user preferences and context."""
-    prefs = user_prefs or {}
-    topic = topic_focus or 'general'
-
-    user_name = prefs.get('name', '')
-    user_role = prefs.get('role', '')
-    interests = prefs.get('interests', [])
-    expertise = prefs.get('expertise', 'general')
-    tone = prefs.get('tone', 'friendly')
+CHAT_MODEL = os.environ.get("OPENAI_CHAT_MODEL", "gpt-4o-mini")
 
-    base_prompt = f"""You are GreenPulse AI, an intelligent assistant for an algae bioreactor air-quality project.
+# Same for every user and sent first, so the provider can cache this prefix
+PROMPT_PREFIX = """You are GreenPulse AI, an intelligent assistant for an algae bioreactor air-quality project.
 
 CORE FACTS:
 - Organism: Chlorella vulgaris (green microalgae)
@@ -65,91 +24,88 @@ CORE FACTS:
 ADAPTIVE GUIDELINES:
 1. LANGUAGE: Detect the user's language from their message and ALWAYS reply in that same language. Support all world languages naturally.
 
-2. PERSONALIZATION:"""
-
-    if user_name:
-        base_prompt += f"\n   - Address user as '{user_name}' when appropriate"
-    if user_role:
-        base_prompt += f"\n   - Adapt for user role: {user_role}"
-    if interests:
-        base_prompt += f"\n   - User interests: {', '.join(interests)}"
-
-    expertise_levels = {
-        'beginner': 'Use simple analogies, avoid jargon, explain basic concepts',
-        'student': 'Educational tone, explain mechanisms clearly',
-        'researcher': 'Technical depth, cite mechanisms, precise terminology',
-        'investor': 'Focus on metrics, ROI, scalability, market potential',
-        'urban_planner': 'Emphasize city integration, public health, infrastructure',
-        'general': 'Balanced, accessible but scientifically accurate'
-    }
-
-    base_prompt += f"\n   - Expertise level: {expertise_levels.get(expertise, expertise_levels['general'])}"
-
-    tone_styles = {
-        'friendly': 'Warm, conversational, encouraging',
-        'professional': 'Formal, precise, structured',
-        'enthusiastic': 'Energetic, inspiring, visionary',
-        'calm': 'Soothing, reassuring, patient',
-        'technical': 'Data-driven, systematic, detailed'
-    }
-
-    base_prompt += f"\n   - Tone: {tone_styles.get(tone, tone_styles['friendly'])}"
-
-    topic_contexts = {
-        'sensors': 'Focus on telemetry, real-time data, sensor interpretation',
-        'biology': 'Deep dive into algae biology, photosynthesis, growth factors',
-        'environment': 'CO2 impact, air quality metrics, climate benefits',
-        'technology': 'IoT systems, hardware, software architecture',
-        'business': 'Scalability, cost-benefit, implementation models',
-        'health': 'Air quality health impacts, public benefits',
-        'education': 'Learning resources, science communication',
-        'general': 'Balanced overview of all aspects'
-    }
-
-    base_prompt += f"\n\n3. TOPIC FOCUS: {topic_contexts.get(topic, topic_contexts['general'])}"
-
-    base_prompt += """
-4. CONVERSATION STYLE:
+2. CONVERSATION STYLE:
    - Be concise but informative (2-4 sentences typical)
    - Adjust depth based on user expertise
    - Use relevant examples from user's context
    - Ask clarifying questions when topic is ambiguous
    - Proactively connect topics to GreenPulse when natural
 
-5. BOUNDARIES:
+3. BOUNDARIES:
    - Never invent sensor data not provided
    - Distinguish measured vs estimated values
    - Stay scientifically accurate
-   - Redirect off-topic questions gracefully to GreenPulse context
+   - Redirect off-topic questions gracefully to GreenPulse context"""
+
+EXPERTISE_LEVELS = {
+    'beginner': 'Use simple analogies, avoid jargon, explain basic concepts',
+    'student': 'Educational tone, explain mechanisms clearly',
+    'researcher': 'Technical depth, cite mechanisms, precise terminology',
+    'investor': 'Focus on metrics, ROI, scalability, market potential',
+    'urban_planner': 'Emphasize city integration, public health, infrastructure',
+    'general': 'Balanced, accessible but scientifically accurate',
+}
 
-Remember: You are a helpful, knowledgeable assistant that adapts to each user's needs while staying true to the GreenPulse mission."""
+TONE_STYLES = {
+    'friendly': 'Warm, conversational, encouraging',
+    'professional': 'Formal, precise, structured',
+    'enthusiastic': 'Energetic, inspiring, visionary',
+    'calm': 'Soothing, reassuring, patient',
+    'technical': 'Data-driven, systematic, detailed',
+}
 
-    return base_prompt
+TOPIC_CONTEXTS = {
+    'sensors': 'Focus on telemetry, real-time data, sensor interpretation',
+    'biology': 'Deep dive into algae biology, photosynthesis, growth factors',
+    'environment': 'CO2 impact, air quality metrics, climate benefits',
+    'technology': 'IoT systems, hardware, software architecture',
+    'business': 'Scalability, cost-benefit, implementation models',
+    'health': 'Air quality health impacts, public benefits',
+    'education': 'Learning resources, science communication',
+    'general': 'Balanced overview of all aspects',
+}
 
+PROMPT_CLOSING = "Remember: You are a helpful, knowledgeable assistant that adapts to each user's needs while staying true to the GreenPulse mission."
 
-class handler(BaseHTTPRequestHandler):
-    def _cors(self):
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
 
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors()
-        self.end_headers()
+def render_system_prompt(key):
+    """System prompt for a normalized preference key (see ``_prompts.prompt_key``)."""
+    name, role, interests, expertise, tone, topic = key
+    lines = [PROMPT_PREFIX, "", "4. PERSONALIZATION:"]
+    if name:
+        lines.append(f"   - Address user as '{name}' when appropriate")
+    if role:
+        lines.append(f"   - Adapt for user role: {role}")
+    if interests:
+        lines.append(f"   - User interests: {', '.join(interests)}")
+    lines.append(f"   - Expertise level: {EXPERTISE_LEVELS[expertise]}")
+    lines.append(f"   - Tone: {TONE_STYLES[tone]}")
+    lines.append("")
+    lines.append(f"5. TOPIC FOCUS: {TOPIC_CONTEXTS[topic]}")
+    lines.append("")
+    lines.append(PROMPT_CLOSING)
+    return "\n".join(lines)
+
+
+SYSTEM_PROMPTS = PromptCache("chat", render_system_prompt, EXPERTISE_LEVELS, TONE_STYLES, TOPIC_CONTEXTS)
+
+
+def build_system_prompt(user_prefs=None, topic_focus=None):
+    """Build adaptive system prompt based on user preferences and context."""
+    return SYSTEM_PROMPTS.get(user_prefs, topic_focus)
+
+
+class handler(JSONHandler):
+    allowed_methods = "POST, OPTIONS"
 
     def do_POST(self):
-        length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(length) if length else b"{}"
-        try:
-            data = json.loads(body)
-        except Exception:
-            data = {}
+        data = self._read_json()
 
         user_message = (data.get("message") or "").strip()
         history = data.get("history", [])
         user_prefs = data.get("user_prefs", {})
         topic_focus = data.get("topic", "general")
+        session_id = resolve_session(data)
 
         if not user_message:
             self._respond(400, {"status": "error", "message": "Message cannot be empty"})
@@ -168,11 +124,14 @@ class handler(BaseHTTPRequestHandler):
             adaptive_prompt = build_system_prompt(user_prefs, topic_focus)
 
             messages = [{"role": "system", "content": adaptive_prompt}]
-            for item in history[-10:]:
-                role = item.get("role")
-                content = item.get("content", "")
-                if role in {"user", "assistant"} and isinstance(content, str) and content.strip():
-                    messages.append({"role": role, "content": content.strip()})
+            if session_id:
+                messages.extend(get_store().messages(session_id))
+            else:   # legacy clients post their own history
+                for item in history[-10:]:
+                    role = item.get("role")
+                    content = item.get("content", "")
+                    if role in {"user", "assistant"} and isinstance(content, str) and content.strip():
+                        messages.append({"role": role, "content": content.strip()})
             messages.append({"role": "user", "content": user_message})
 
             req_data = {
@@ -181,35 +140,54 @@ class handler(BaseHTTPRequestHandler):
                 "temperature": 0.7,
                 "max_tokens": 500,
             }
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            req = urllib.request.Request(
-                "https://api.openai.com/v1/chat/completions",
-                data=json.dumps(req_data).encode("utf-8"),
-                headers=headers,
-                method="POST",
-            )
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                response_data = json.loads(resp.read().decode("utf-8"))
+            if wants_event_stream(self.headers.get("Accept"), data):
+                self._stream(get_client().stream_chat_completion(**req_data), {
+                    "status": "success",
+                    "model": CHAT_MODEL,
+                    "detected_language": detected_lang,
+                    "topic_focus": topic_focus,
+                    "personalized": bool(user_prefs),
+                    "session_id": session_id,
+                }, user_message)
+                return
+            response_data = get_client().chat_completion(**req_data)
+            record_usage("chat", response_data.get("usage"))
             text = response_data["choices"][0]["message"]["content"] or "I could not generate a response."
+            if session_id:
+                get_store().append(session_id, user_message, text)
             self._respond(200, {
                 "status": "success",
                 "response": text,
                 "model": CHAT_MODEL,
                 "detected_language": detected_lang,
                 "topic_focus": topic_focus,
-                "personalized": bool(user_prefs)
+                "personalized": bool(user_prefs),
+                "session_id": session_id,
             })
         except Exception as exc:
             self._respond(500, {"status": "error", "message": str(exc)})
 
-    def _respond(self, status, payload):
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
+    def _stream(self, stream, metadata, user_message):
+        """Forward tokens as SSE frames, then a trailing ``done`` frame with metadata."""
+        self.send_response(200)
         self._cors()
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Type", f"{EVENT_STREAM}; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")
         self.end_headers()
-        self.wfile.write(body)
+        parts = []
+        with stream:
+            try:
+                for token in stream:
+                    parts.append(token)
+                    self.wfile.write(sse_event({"token": token}))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as exc:
+                self.wfile.write(sse_event({"status": "error", "message": str(exc)}, event="error"))
+                return
+        record_usage("chat", stream.usage)
+        if metadata["session_id"]:
+            get_store().append(metadata["session_id"], user_message, "".join(parts))
+        self.wfile.write(sse_event({**metadata, "finish_reason": stream.finish_reason}, event="done"))
@@ -1,57 +1,16 @@
-from http.server import BaseHTTPRequestHandler
-import json
 import os
-import urllib.request
-import re
-
-# Language detection patterns for multilingual support
-LANGUAGE_PATTERNS = {
-    'ru': r'[а-яА-ЯёЁ]',
-    'kk': r'[әіңғүұқөһӘІҢҒҮҰҚӨҺ]',
-    'zh': r'[\u4e00-\u9fff]',
-    'ja': r'[\u3040-\u309f\u30a0-\u30ff]',
-    'ko': r'[\uac00-\ud7af]',
-    'ar': r'[\u0600-\u06ff]',
-    'he': r'[\u0590-\u05ff]',
-    'hi': r'[\u0900-\u097f]',
-    'th': r'[\u0e00-\u0e7f]',
-    'el': r'[\u0370-\u03ff]',
-}
-
-
-def detect_language(text):
-    """Detect language from text. Returns language code."""
-    if not text:
-        return 'en'
-
-    for lang_code, pattern in LANGUAGE_PATTERNS.items():
-        if re.search(pattern, text):
-            return lang_code
+import sys
 
-    # Check for common European languages
-    text_lower = text.lower()
-    if any(word in text_lower for word in ['el', 'la', 'los', 'las', 'es', 'un', 'una']):
-        return 'es'
-    if any(word in text_lower for word in ['le', 'la', 'les', 'un', 'une', 'est', 'sont']):
-        return 'fr'
-    if any(word in text_lower for word in ['der', 'die', 'das', 'ein', 'eine', 'ist', 'sind']):
-        return 'de'
+sys.path.insert(0, os.path.dirname(__file__))
+from _conversations import get_store, resolve_session
+from _handler import JSONHandler
+from _language import detect_language
+from _openai import get_client
+from _prompts import PromptCache, record_usage
+from _sse import EVENT_STREAM, sse_event, wants_event_stream
 
-    return 'en'  # Default to English
-
-
-def build_system_prompt(user_prefs=None, topic_focus=None):
-    """Build adaptive system prompt based on user preferences and context."""
-    prefs = user_prefs or {}
-    topic = topic_focus or 'general'
-
-    user_name = prefs.get('name', '')
-    user_role = prefs.get('role', '')
-    interests = prefs.get('interests', [])
-    expertise = prefs.get('expertise', 'general')
-    tone = prefs.get('tone', 'friendly')
-
-    base_prompt = f"""You are GreenPulse AI — a scientific assistant for a Chlorella vulgaris algae bioreactor bench that improves urban air quality.
+# Same for every user and sent first, so the provider can cache this prefix
+PROMPT_PREFIX = """You are GreenPulse AI — a scientific assistant for a Chlorella vulgaris algae bioreactor bench that improves urban air quality.
 
 CORE FACTS:
 - Organism: Chlorella vulgaris (green microalgae)
@@ -65,91 +24,88 @@ CORE FACTS:
 ADAPTIVE GUIDELINES:
 1. LANGUAGE: Detect the user's language from their message and ALWAYS reply in that same language naturally. Support all world languages.
 
-2. PERSONALIZATION:"""
-
-    if user_name:
-        base_prompt += f"\n   - Address user as '{user_name}' when appropriate"
-    if user_role:
-        base_prompt += f"\n   - Adapt for user role: {user_role}"
-    if interests:
-        base_prompt += f"\n   - Connect to user interests: {', '.join(interests)}"
-
-    expertise_levels = {
-        'beginner': 'Use simple terms, explain basics, avoid technical jargon',
-        'student': 'Educational approach, explain science clearly',
-        'researcher': 'Technical depth, scientific precision, cite mechanisms',
-        'investor': 'Focus on ROI, scalability, market metrics',
-        'urban_planner': 'City integration, infrastructure, public benefits',
-        'general': 'Balanced, accessible but accurate'
-    }
-
-    base_prompt += f"\n   - Expertise level: {expertise_levels.get(expertise, expertise_levels['general'])}"
-
-    tone_styles = {
-        'friendly': 'Warm, conversational, approachable',
-        'professional': 'Formal, precise, authoritative',
-        'enthusiastic': 'Energetic, inspiring, positive',
-        'calm': 'Soothing, patient, reassuring',
-        'technical': 'Systematic, data-focused, detailed'
-    }
-
-    base_prompt += f"\n   - Tone: {tone_styles.get(tone, tone_styles['friendly'])}"
-
-    topic_contexts = {
-        'sensors': 'Focus on real-time data, telemetry, sensor readings',
-        'biology': 'Algae biology, photosynthesis, growth conditions',
-        'environment': 'CO2 absorption, air quality, climate impact',
-        'technology': 'IoT hardware, software systems, monitoring',
-        'business': 'Implementation, costs, scalability, partnerships',
-        'health': 'Air quality health benefits, public wellness',
-        'education': 'Science communication, learning, awareness',
-        'general': 'Balanced overview, all aspects of GreenPulse'
-    }
-
-    base_prompt += f"\n\n3. TOPIC FOCUS: {topic_contexts.get(topic, topic_contexts['general'])}"
-
-    base_prompt += """
-4. CONVERSATION STYLE:
+2. CONVERSATION STYLE:
    - Keep responses concise (2-4 sentences typically)
    - Adjust complexity to user's expertise level
    - Use relevant examples from user's context
    - Gently steer off-topic questions back to GreenPulse
    - Be helpful, accurate, and engaging
 
-5. RULES:
+3. RULES:
    - Never invent sensor data not provided
    - Always distinguish measured vs estimated values
    - Stay scientifically accurate
-   - Respond ONLY in the language of the user's message
+   - Respond ONLY in the language of the user's message"""
+
+EXPERTISE_LEVELS = {
+    'beginner': 'Use simple terms, explain basics, avoid technical jargon',
+    'student': 'Educational approach, explain science clearly',
+    'researcher': 'Technical depth, scientific precision, cite mechanisms',
+    'investor': 'Focus on ROI, scalability, market metrics',
+    'urban_planner': 'City integration, infrastructure, public benefits',
+    'general': 'Balanced, accessible but accurate',
+}
+
+TONE_STYLES = {
+    'friendly': 'Warm, conversational, approachable',
+    'professional': 'Formal, precise, authoritative',
+    'enthusiastic': 'Energetic, inspiring, positive',
+    'calm': 'Soothing, patient, reassuring',
+    'technical': 'Systematic, data-focused, detailed',
+}
 
-Remember: Adapt to each user while staying true to GreenPulse's mission of cleaner air through algae technology."""
+TOPIC_CONTEXTS = {
+    'sensors': 'Focus on real-time data, telemetry, sensor readings',
+    'biology': 'Algae biology, photosynthesis, growth conditions',
+    'environment': 'CO2 absorption, air quality, climate impact',
+    'technology': 'IoT hardware, software systems, monitoring',
+    'business': 'Implementation, costs, scalability, partnerships',
+    'health': 'Air quality health benefits, public wellness',
+    'education': 'Science communication, learning, awareness',
+    'general': 'Balanced overview, all aspects of GreenPulse',
+}
 
-    return base_prompt
+PROMPT_CLOSING = "Remember: Adapt to each user while staying true to GreenPulse's mission of cleaner air through algae technology."
 
 
-class handler(BaseHTTPRequestHandler):
-    def _cors(self):
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+def render_system_prompt(key):
+    """System prompt for a normalized preference key (see ``_prompts.prompt_key``)."""
+    name, role, interests, expertise, tone, topic = key
+    lines = [PROMPT_PREFIX, "", "4. PERSONALIZATION:"]
+    if name:
+        lines.append(f"   - Address user as '{name}' when appropriate")
+    if role:
+        lines.append(f"   - Adapt for user role: {role}")
+    if interests:
+        lines.append(f"   - Connect to user interests: {', '.join(interests)}")
+    lines.append(f"   - Expertise level: {EXPERTISE_LEVELS[expertise]}")
+    lines.append(f"   - Tone: {TONE_STYLES[tone]}")
+    lines.append("")
+    lines.append(f"5. TOPIC FOCUS: {TOPIC_CONTEXTS[topic]}")
+    lines.append("")
+    lines.append(PROMPT_CLOSING)
+    return "\n".join(lines)
 
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors()
-        self.end_headers()
+
+SYSTEM_PROMPTS = PromptCache("chatbot", render_system_prompt, EXPERTISE_LEVELS, TONE_STYLES, TOPIC_CONTEXTS)
+
+
+def build_system_prompt(user_prefs=None, topic_focus=None):
+    """Build adaptive system prompt based on user preferences and context."""
+    return SYSTEM_PROMPTS.get(user_prefs, topic_focus)
+
+
+class handler(JSONHandler):
+    allowed_methods = "POST, OPTIONS"
 
     def do_POST(self):
-        length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(length) if length else b"{}"
-        try:
-            data = json.loads(body)
-        except Exception:
-            data = {}
+        data = self._read_json()
 
         user_message = data.get("message", "").strip()
         history = data.get("history", [])
         user_prefs = data.get("user_prefs", {})
         topic_focus = data.get("topic", "general")
+        session_id = resolve_session(data)
 
         if not user_message:
             self._respond(400, {"error": "No message"})
@@ -168,11 +124,14 @@ class handler(BaseHTTPRequestHandler):
             adaptive_prompt = build_system_prompt(user_prefs, topic_focus)
 
             messages = [{"role": "system", "content": adaptive_prompt}]
-            for item in history[-10:]:
-                role = item.get("role")
-                content = item.get("content", "")
-                if role in {"user", "assistant"} and content.strip():
-                    messages.append({"role": role, "content": content.strip()})
+            if session_id:
+                messages.extend(get_store().messages(session_id))
+            else:   # legacy clients post their own history
+                for item in history[-10:]:
+                    role = item.get("role")
+                    content = item.get("content", "")
+                    if role in {"user", "assistant"} and isinstance(content, str) and content.strip():
+                        messages.append({"role": role, "content": content.strip()})
             messages.append({"role": "user", "content": user_message})
 
             req_data = {
@@ -181,32 +140,50 @@ class handler(BaseHTTPRequestHandler):
                 "max_tokens": 500,
                 "temperature": 0.7,
             }
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            }
-            req = urllib.request.Request(
-                "https://api.openai.com/v1/chat/completions",
-                data=json.dumps(req_data).encode("utf-8"),
-                headers=headers,
-                method="POST",
-            )
-            with urllib.request.urlopen(req, timeout=60) as resp:
-                response_data = json.loads(resp.read().decode("utf-8"))
+            if wants_event_stream(self.headers.get("Accept"), data):
+                self._stream(get_client().stream_chat_completion(**req_data), {
+                    "detected_language": detected_lang,
+                    "topic_focus": topic_focus,
+                    "personalized": bool(user_prefs),
+                    "session_id": session_id,
+                }, user_message)
+                return
+            response_data = get_client().chat_completion(**req_data)
+            record_usage("chatbot", response_data.get("usage"))
+            reply = response_data["choices"][0]["message"]["content"]
+            if session_id and reply:
+                get_store().append(session_id, user_message, reply)
             self._respond(200, {
-                "response": response_data["choices"][0]["message"]["content"],
+                "response": reply,
                 "detected_language": detected_lang,
                 "topic_focus": topic_focus,
-                "personalized": bool(user_prefs)
+                "personalized": bool(user_prefs),
+                "session_id": session_id,
             })
         except Exception as e:
             self._respond(500, {"error": str(e)})
 
-    def _respond(self, status, payload):
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
+    def _stream(self, stream, metadata, user_message):
+        """Forward tokens as SSE frames, then a trailing ``done`` frame with metadata."""
+        self.send_response(200)
         self._cors()
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Type", f"{EVENT_STREAM}; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")
         self.end_headers()
-        self.wfile.write(body)
+        parts = []
+        with stream:
+            try:
+                for token in stream:
+                    parts.append(token)
+                    self.wfile.write(sse_event({"token": token}))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            except Exception as exc:
+                self.wfile.write(sse_event({"error": str(exc)}, event="error"))
+                return
+        record_usage("chatbot", stream.usage)
+        if metadata["session_id"]:
+            get_store().append(metadata["session_id"], user_message, "".join(parts))
+        self.wfile.write(sse_event({**metadata, "finish_reason": stream.finish_reason}, event="done"))
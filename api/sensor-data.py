@@ -1,25 +1,47 @@
-from http.server import BaseHTTPRequestHandler
-import json
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(__file__))
-from _telemetry import get_current_sensor_data, remember_sensor_payload
+from _handler import JSONHandler, loads
+from _state_store import StateStoreError
+from _telemetry import get_current_sensor_data, remember_sensor_payloads
+from _telemetry_log import text_field_error
+from _wire import WIRE_CONTENT_TYPE, decode_readings
 
+MAX_BATCH_READINGS = int(os.getenv("MAX_BATCH_READINGS", "1000"))
 
-class handler(BaseHTTPRequestHandler):
-    def _cors(self):
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
 
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors()
-        self.end_headers()
+def _ndjson_readings(body):
+    """One reading per non-blank line; a line that is not JSON becomes None (rejected by index)."""
+    readings = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            readings.append(loads(line))
+        except ValueError:
+            readings.append(None)
+    return readings
+
+
+def _reading_error(reading):
+    """Why a batch entry is rejected, or None to accept it."""
+    if not isinstance(reading, dict) or not reading:
+        return "Not a sensor reading"
+    return text_field_error(reading)
 
+
+class handler(JSONHandler):
     def do_GET(self):
-        data = get_current_sensor_data()
+        station_id = self._param("station")
+        data = get_current_sensor_data(station_id)
+        if data is None:
+            self._respond(404, {
+                "status": "offline",
+                "message": f"Unknown station: {station_id}",
+                "data_source": "none",
+            })
+            return
         self._respond(200, {
             "status": "online",
             "data": data,
@@ -28,29 +50,79 @@ class handler(BaseHTTPRequestHandler):
         })
 
     def do_POST(self):
-        length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(length) if length else b"{}"
-        try:
-            payload = json.loads(body)
-        except Exception:
-            payload = {}
+        body = self._read_body()
+        content_type = self._content_type()
+        if content_type == WIRE_CONTENT_TYPE:
+            try:
+                readings = decode_readings(body)
+            except ValueError as e:
+                self._respond(400, {"status": "error", "message": str(e)})
+                return
+            self._post_batch(readings)
+            return
+        if content_type in ("application/x-ndjson", "application/jsonl"):
+            payload = _ndjson_readings(body)
+        else:
+            payload = self._read_json(body)
+
+        if isinstance(payload, list):
+            self._post_batch(payload)
+            return
 
         if not payload:
             self._respond(400, {"status": "error", "message": "No sensor payload provided"})
             return
+        too_long = text_field_error(payload) if isinstance(payload, dict) else None
+        if too_long:
+            self._respond(400, {"status": "error", "message": too_long})
+            return
 
-        stored = remember_sensor_payload(payload)
+        stored = self._remember([payload])
+        if stored is None:
+            return
         self._respond(201, {
             "status": "online",
             "message": "Sensor payload accepted",
-            "data": stored,
+            "data": stored[0],
         })
 
-    def _respond(self, status, payload):
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self._cors()
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
+    def _post_batch(self, readings):
+        if len(readings) > MAX_BATCH_READINGS:
+            self._respond(413, {
+                "status": "error",
+                "message": f"Batch too large: {len(readings)} readings (max {MAX_BATCH_READINGS})",
+            })
+            return
+
+        rejected = []
+        valid = []
+        for index, reading in enumerate(readings):
+            error = _reading_error(reading)
+            if error:
+                rejected.append({"index": index, "message": error})
+                continue
+            valid.append(reading)
+
+        if not valid:
+            self._respond(400, {"status": "error", "message": "No valid readings", "rejected": rejected})
+            return
+        stored = self._remember(valid)
+        if stored is None:
+            return
+        stations = {str(reading.get("station_id")): True for reading in stored}
+
+        self._respond(201, {
+            "status": "online",
+            "message": "Sensor batch accepted",
+            "accepted": len(readings) - len(rejected),
+            "rejected": rejected,
+            "stations": list(stations),
+        })
+
+    def _remember(self, readings):
+        """Store readings in one write; answers 503 and returns None when the state store is down."""
+        try:
+            return remember_sensor_payloads(readings)
+        except StateStoreError as e:
+            self._respond(503, {"status": "error", "message": str(e)})
+            return None
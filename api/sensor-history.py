@@ -1,32 +1,35 @@
-from http.server import BaseHTTPRequestHandler
-from urllib.parse import urlparse, parse_qs
-import json
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(__file__))
-from _telemetry import get_sensor_history
+from _handler import JSONHandler
+from _rollup import RESOLUTIONS, parse_time
+from _telemetry import MAX_RANGE_ROWS, get_sensor_history, get_sensor_range, get_sensor_rollup
 
 
-class handler(BaseHTTPRequestHandler):
-    def _cors(self):
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
-
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self._cors()
-        self.end_headers()
+class handler(JSONHandler):
+    allowed_methods = "GET, OPTIONS"
 
     def do_GET(self):
-        qs = parse_qs(urlparse(self.path).query)
+        qs = self._query()
         try:
             limit = int(qs.get("limit", ["120"])[0])
         except (ValueError, IndexError):
             limit = 120
+        station_id = qs.get("station", [None])[0]
+
+        resolution = qs.get("resolution", [None])[0]
+        if resolution:
+            self._rollup(qs, resolution, station_id)
+            return
+        if qs.get("from") or qs.get("to"):
+            self._range(qs, station_id)
+            return
 
-        history = get_sensor_history(limit=limit)
+        history = get_sensor_history(limit=limit, station_id=station_id)
+        if history is None:
+            self._respond(404, {"status": "error", "message": f"Unknown station: {station_id}"})
+            return
         self._respond(200, {
             "status": "ok",
             "history": history,
@@ -35,11 +38,51 @@ class handler(BaseHTTPRequestHandler):
             "origin": "greenpulse_virtual_station",
         })
 
-    def _respond(self, status, payload):
-        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self._cors()
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
+    def _range(self, qs, station_id):
+        try:
+            start = parse_time(qs.get("from", [None])[0])
+            end = parse_time(qs.get("to", [None])[0])
+            limit = int(qs.get("limit", [MAX_RANGE_ROWS])[0])
+        except ValueError as exc:
+            self._respond(400, {"status": "error", "message": str(exc)})
+            return
+
+        rows = get_sensor_range(start, end, station_id=station_id, limit=limit)
+        if rows is None:
+            self._respond(404, {"status": "error", "message": f"Unknown station: {station_id}"})
+            return
+        self._respond(200, {
+            "status": "ok",
+            "history": rows,
+            "total": len(rows),
+            "data_source": "telemetry_snapshot",
+            "origin": "greenpulse_virtual_station",
+        })
+
+    def _rollup(self, qs, resolution, station_id):
+        if resolution not in RESOLUTIONS:
+            self._respond(400, {
+                "status": "error",
+                "message": f"Unknown resolution '{resolution}', use one of: {', '.join(RESOLUTIONS)}",
+            })
+            return
+        try:
+            start = parse_time(qs.get("from", [None])[0])
+            end = parse_time(qs.get("to", [None])[0])
+        except ValueError as exc:
+            self._respond(400, {"status": "error", "message": str(exc)})
+            return
+
+        rows = get_sensor_rollup(resolution, start, end, station_id=station_id)
+        if rows is None:
+            self._respond(404, {"status": "error", "message": f"Unknown station: {station_id}"})
+            return
+        self._respond(200, {
+            "status": "ok",
+            "resolution": resolution,
+            "bucket_seconds": RESOLUTIONS[resolution],
+            "history": rows,
+            "total": len(rows),
+            "data_source": "telemetry_snapshot",
+            "origin": "greenpulse_virtual_station",
+        })
@@ -1,11 +1,38 @@
-from flask import Flask, request, jsonify, send_from_directory
+import eventlet
+eventlet.monkey_patch()   # Green sockets/threads so upstream AI calls don't block the hub
+
+from eventlet import tpool
+from flask import Flask, Response, g, request, jsonify, make_response, send_from_directory
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
+import math
 import os
+import sys
+import time
 from dotenv import load_dotenv
-import urllib.request
 import json
-from datetime import datetime
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api'))
+from _ai_cache import cache_key, get_cache, quantize_inputs
+from _archive import ARCHIVE_MAX_ROWS, TelemetryArchive
+from _body_cache import BodyCache, make_etag
+from _broadcast import DeltaBroadcaster
+from _bus import open_bus
+from _co2 import Co2Accumulator
+from _conversations import get_store as get_conversations, resolve_session
+from _efficiency import CO2_GRAMS_PER_HOUR_MAX, photo_efficiency, photo_efficiency_array
+from _history import SensorHistory, _as_float
+from _ingest_queue import IngestQueue
+from _log import LogSampler, get_logger
+from _metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from _openai import get_client
+from _prompts import record_usage
+from _rollup import RESOLUTIONS, SensorRollup, parse_time
+from _stations import StationRegistry, station_key
+from _telemetry_log import TelemetryLog, record_to_reading, text_field_error
+from _track import TrackStore
+from _wire import WIRE_CONTENT_TYPE, WireDecoder
 
 load_dotenv()
 
@@ -20,11 +47,6 @@ if OPENAI_API_KEY:
 else:
     print("❌ OPENAI_API_KEY not set")
 
-# Sensor data storage
-sensor_history = []          # Up to 500 readings
-gps_track = []               # GPS track history
-current_sensor_data = None   # None = ESP32 never connected
-
 # Fields accepted from ESP32
 SENSOR_FIELDS = [
     'station_id', 'station_name',
@@ -33,121 +55,849 @@ SENSOR_FIELDS = [
     'ph', 'co2_ppm', 'co_ppm',
     'light_intensity', 'water_level',
 ]
+TEXT_SENSOR_FIELDS = ['station_id', 'station_name']
+NUMERIC_SENSOR_FIELDS = [f for f in SENSOR_FIELDS if f not in TEXT_SENSOR_FIELDS]
+INT_SENSOR_FIELDS = ['satellites']
+BOOL_SENSOR_FIELDS = ['gps_valid']
+HISTORY_CAPACITY = int(os.getenv('SENSOR_HISTORY_CAPACITY', 500))
+# Fields aggregated at 1m/15m/1h/1d for /api/sensor-history?resolution=
+ROLLUP_FIELDS = ['temperature', 'humidity', 'ph', 'co2_ppm', 'co_ppm', 'light_intensity', 'water_level']
+# Positions in NUMERIC_SENSOR_FIELDS, for readings decoded straight into history columns
+ROLLUP_INDEX = [NUMERIC_SENSOR_FIELDS.index(f) for f in ROLLUP_FIELDS]
+TEMPERATURE_INDEX = NUMERIC_SENSOR_FIELDS.index('temperature')
+GPS_INDEX = tuple(NUMERIC_SENSOR_FIELDS.index(f) for f in ('gps_valid', 'latitude', 'longitude'))
+wire_decoder = WireDecoder(NUMERIC_SENSOR_FIELDS)
+
+# Durable telemetry log; set TELEMETRY_LOG_DIR="" to keep everything in memory only
+TELEMETRY_LOG_DIR = os.getenv(
+    'TELEMETRY_LOG_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'telemetry'),
+)
+
+# Every reading, kept for ARCHIVE_RETENTION_DAYS and queried by station + time range
+# (/api/sensor-history?from=&to=); set TELEMETRY_ARCHIVE_DB="" to disable
+TELEMETRY_ARCHIVE_DB = os.getenv(
+    'TELEMETRY_ARCHIVE_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'archive.sqlite3'),
+)
+
+GPS_TRACK_CAPACITY = int(os.getenv('GPS_TRACK_CAPACITY', 2000))          # Vertices kept after simplification
+GPS_TRACK_TOLERANCE_M = float(os.getenv('GPS_TRACK_TOLERANCE_M', 5.0))   # Max deviation of the simplified track
+DEFAULT_STATION_ID = os.getenv('DEFAULT_STATION_ID', '1')   # Used when a reading has no station_id
+TELEMETRY_RESTORE_RECORDS = int(os.getenv('TELEMETRY_RESTORE_RECORDS', 20000))
+MAX_BATCH_READINGS = int(os.getenv('MAX_BATCH_READINGS', 1000))
+# Apply POSTed readings on a background consumer and answer 202 (0 = apply inline, answer 201)
+INGEST_ASYNC = os.getenv('INGEST_ASYNC', '1').lower() not in ('0', 'false', 'no', '')
+
+# Several workers: each applies every reading (its own, and the others' via the
+# cluster bus) and serves its own Socket.IO clients; exactly one, CLUSTER_PRIMARY,
+# writes the telemetry log and archive (and hosts the hub of a tcp:// bus).
+# CLUSTER_BUS_URL="" = single worker.
+CLUSTER_BUS_URL = os.getenv('CLUSTER_BUS_URL', '')
+CLUSTER_PRIMARY = (os.getenv('CLUSTER_PRIMARY') or ('0' if CLUSTER_BUS_URL else '1')).lower() not in ('0', 'false', 'no')
+WORKER_ID = os.getenv('WORKER_ID') or None   # Defaults to host:pid
+
+# Socket.IO rooms: clients watch either every station or specific ones
+ALL_STATIONS_ROOM = 'stations:all'
+SOCKET_MAX_FPS = float(os.getenv('SOCKET_MAX_FPS', 4))   # sensor_delta frames per second per station
+
+# AI responses are cached per bucketed sensor state; bump when prompts change
+AI_PROMPT_VERSION = 1
+ai_cache = get_cache()
+
+
+class StationState:
+    """Everything the server keeps in memory for one station."""
+
+    __slots__ = ('station_id', 'latest', 'history', 'rollup', 'gps_track', 'co2', 'version', 'changed_at')
+
+    def __init__(self, station_id):
+        self.station_id = station_id
+        self.latest = None            # Merged latest reading; None = never reported
+        self.history = SensorHistory(  # Columnar ring buffer, newest HISTORY_CAPACITY readings
+            NUMERIC_SENSOR_FIELDS,
+            text_fields=TEXT_SENSOR_FIELDS,
+            capacity=HISTORY_CAPACITY,
+            int_fields=INT_SENSOR_FIELDS,
+            bool_fields=BOOL_SENSOR_FIELDS,
+        )
+        self.rollup = SensorRollup(ROLLUP_FIELDS)   # min/max/mean/count buckets, kept far longer than history
+        self.gps_track = TrackStore(GPS_TRACK_TOLERANCE_M, capacity=GPS_TRACK_CAPACITY)
+        self.co2 = Co2Accumulator(CO2_GRAMS_PER_HOUR_MAX)   # Running estimate since server start
+        self.version = 0              # Bumped by _mark_changed; the ETag of this station's read endpoints
+        self.changed_at = None        # Epoch seconds of the last change (Last-Modified)
 
-# ── Photosynthetic efficiency model ──────────────────────────────────────────
-# Based on Chlorella vulgaris growth curves (Converti et al., 2009;
-# Ugwu et al., 2008). Temperature is the primary limiting factor.
-# Optimal range: 20–30°C → 100%; deviations reduce efficiency linearly.
-CO2_GRAMS_PER_HOUR_MAX = 4.34   # = 38 kg/year ÷ 8760 h — theoretical maximum
-                                  # Assumes 100% photosynthetic efficiency,
-                                  # adequate light (>400 lux) and pH 6.5–7.5
-
-def photo_efficiency(temp: float) -> float:
-    """
-    Returns efficiency coefficient 0.0–1.0 based on temperature.
-    Model: piecewise linear approximation of Chlorella vulgaris growth response.
-    Source: Converti et al. (2009), Bioresource Technology 100(1):556-561.
-    """
-    if temp is None:
-        return 0.0
-    if temp >= 40 or temp < 0:
-        return 0.0
-    if temp < 10:
-        return 0.02
-    if temp < 15:
-        return 0.15
-    if temp < 20:
-        return 0.45
-    if temp <= 30:
-        return 1.0
-    if temp <= 35:
-        return 0.50
-    return 0.10
 
+# Sensor data storage
+stations = StationRegistry(StationState, default_station=DEFAULT_STATION_ID)
+fleet_co2_grams = 0.0   # Sum of every station's CO2 estimate
+state_version = 0       # Bumped with every station version: fleet-wide values (CO2 total, station list)
+state_changed_at = None # Epoch seconds of the last change to any station
+stations_added_at = None  # Epoch seconds the last new station got its first data (station_count)
+body_cache = BodyCache()   # Serialized GET bodies per (path, query, data version)
+
+
+def _station_room(station_id):
+    return f'station:{station_id}'
+
+
+broadcaster = DeltaBroadcaster(
+    socketio.emit,
+    rooms=lambda key: [_station_room(key), ALL_STATIONS_ROOM],
+    spawn=socketio.start_background_task,
+    sleep=socketio.sleep,
+    max_fps=SOCKET_MAX_FPS,
+)
+
+# Logging goes through a queue so request handlers never wait on stdout;
+# per-reading lines are sampled (LOG_SAMPLE_SECONDS per station).
+log = get_logger()
+ingest_log_sampler = LogSampler()
+
+# Metrics, scraped from GET /api/metrics
+HTTP_LATENCY = REGISTRY.histogram(
+    'greenpulse_http_request_seconds', 'Flask route latency', ['route', 'method', 'status'])
+INGEST_READINGS = REGISTRY.counter(
+    'greenpulse_ingest_readings_total', 'Sensor readings ingested', ['station', 'format'])
+INGEST_REJECTED = REGISTRY.counter(
+    'greenpulse_ingest_rejected_total',
+    'Readings rejected at validation: not a sensor reading, or a field of the wrong type')
+WEBSOCKET_CLIENTS = REGISTRY.gauge('greenpulse_websocket_clients', 'Connected Socket.IO clients')
+REGISTRY.gauge(
+    'greenpulse_history_readings', 'Readings in the history ring buffer', ['station'],
+    callback=lambda: [({'station': key}, len(state.history)) for key, state in stations.items()])
+REGISTRY.gauge(
+    'greenpulse_history_fill_ratio', 'History ring buffer fill (1 = full, oldest readings evicted)', ['station'],
+    callback=lambda: [({'station': key}, len(state.history) / state.history.capacity)
+                      for key, state in stations.items()])
+REGISTRY.counter(
+    'greenpulse_ai_cache_lookups_total', 'AI response cache lookups by result', ['result'],
+    callback=lambda: [({'result': result}, count) for result, count in _ai_cache_counts().items()])
+REGISTRY.gauge('greenpulse_ai_cache_entries', 'Entries in the AI response cache',
+               callback=lambda: ai_cache.stats()['entries'])
+REGISTRY.counter(
+    'greenpulse_body_cache_requests_total',
+    'Conditional sensor GETs by result (not_modified = 304, hit = cached body, miss = rendered)', ['result'],
+    callback=lambda: [({'result': result}, body_cache.stats()[stat])
+                      for result, stat in (('hit', 'hits'), ('miss', 'misses'), ('not_modified', 'not_modified'))])
+REGISTRY.gauge('greenpulse_body_cache_bytes', 'Bytes of serialized GET bodies cached',
+               callback=lambda: body_cache.stats()['bytes'])
+REGISTRY.counter('greenpulse_broadcast_frames_total', 'sensor_delta frames emitted',
+                 callback=lambda: broadcaster.frames)
+REGISTRY.counter('greenpulse_broadcast_coalesced_total', 'Readings folded into a later sensor_delta frame',
+                 callback=lambda: broadcaster.coalesced)
+
+
+def _ai_cache_counts():
+    stats = ai_cache.stats()
+    return {'hit': stats['hits'], 'miss': stats['misses'], 'shared': stats['shared']}
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_time(response):
+    """Times every route (keyed by its URL rule) without decorating each view."""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_LATENCY.observe(time.perf_counter() - started,
+                             route=route, method=request.method, status=response.status_code)
+    return response
+
+
+def _latest_reading(station_id=None):
+    """Latest merged reading of a station (last active one by default), or None."""
+    state = stations.get(station_id)
+    return state.latest if state else None
+
+
+def _emit_snapshot(state):
+    """
+    Full ``sensor_update`` for a station. Its station_id is the registry key
+    that ``sensor_delta`` frames carry (an int when numeric, as restored
+    readings have it), also for readings that were posted without one, so
+    clients can find the base of the next delta.
+    """
+    if state is None or not state.latest:
+        return
+    key = state.station_id
+    emit('sensor_update', {**state.latest, 'station_id': int(key) if key.isdigit() else key})
+
+
+telemetry_log = TelemetryLog(
+    TELEMETRY_LOG_DIR,
+    NUMERIC_SENSOR_FIELDS,
+    fsync_every=int(os.getenv('TELEMETRY_LOG_FSYNC_EVERY', 32)),
+    max_segments=int(os.getenv('TELEMETRY_LOG_MAX_SEGMENTS', 0)),
+) if TELEMETRY_LOG_DIR and CLUSTER_PRIMARY else None
+
+archive = TelemetryArchive(
+    TELEMETRY_ARCHIVE_DB,
+    NUMERIC_SENSOR_FIELDS,
+    text_fields=TEXT_SENSOR_FIELDS,
+    int_fields=INT_SENSOR_FIELDS,
+    bool_fields=BOOL_SENSOR_FIELDS,
+    tz=timezone.utc,   # Same row timestamps as SensorHistory and the serverless archive
+    read_only=not CLUSTER_PRIMARY,
+) if TELEMETRY_ARCHIVE_DB else None
+if archive is not None and not archive.read_only:
+    REGISTRY.counter(
+        'greenpulse_archive_rows_total', 'Readings handed to the archive by result (dropped = writer fell behind)',
+        ['result'],
+        callback=lambda: [({'result': result}, archive.stats()[result]) for result in ('written', 'dropped', 'failed')])
+    REGISTRY.gauge('greenpulse_archive_pending', 'Readings queued for the archive writer',
+                   callback=lambda: archive.stats()['pending'])
+    REGISTRY.counter('greenpulse_archive_write_seconds_total', 'Time spent committing archive batches',
+                     callback=lambda: archive.write_seconds)
+    REGISTRY.counter('greenpulse_archive_batches_total', 'Archive batches committed',
+                     callback=lambda: archive.batches)
+
+
+def _apply_reading(station, reading, ts, co2=True):
+    """
+    Update a station's in-memory views (latest, history, CO2 estimate, GPS track) with one merged reading.
+    ``co2=False`` leaves the CO2 estimate to a bulk ``Co2Accumulator.extend`` by the caller.
+    Returns the GPS track vertex the reading committed, if any.
+    """
+    global fleet_co2_grams
 
-@app.route('/api/sensor-data', methods=['GET', 'POST'])
-def sensor_data():
+    station.latest = reading
+    station.history.append(reading, ts)
+    station.rollup.add(reading, ts)
+    if co2:
+        # Same float the history column holds: a string temperature such as "25.5" must not raise mid-update
+        fleet_co2_grams += station.co2.add(ts, photo_efficiency(_as_float(reading.get('temperature'))))
+
+    if reading.get('gps_valid') and reading.get('latitude') and reading.get('longitude'):
+        return station.gps_track.add(reading['latitude'], reading['longitude'], reading['timestamp'])
+    return None
+
+
+def _apply_values(station, numbers, ts):
     """
-    GET  → current sensor readings (origin: live_measured)
-    POST → ESP32 pushes new readings
+    Counterpart of _apply_reading for a row already stored with
+    SensorHistory.append_values (floats in NUMERIC_SENSOR_FIELDS order).
+    ``station.latest`` is left to the caller. Returns the GPS track vertex, if any.
     """
-    global current_sensor_data, sensor_history
+    global fleet_co2_grams
 
-    if request.method == 'POST':
-        data = request.json
-        if not data:
-            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+    station.rollup.add_values([numbers[i] for i in ROLLUP_INDEX], ts)
+    fleet_co2_grams += station.co2.add(ts, photo_efficiency(numbers[TEMPERATURE_INDEX]))
+
+    gps_valid, lat, lng = (numbers[i] for i in GPS_INDEX)
+    if gps_valid == 1.0 and lat == lat and lng == lng and lat and lng:
+        return station.gps_track.add(lat, lng, datetime.fromtimestamp(ts, timezone.utc).isoformat())
+    return None
+
+
+def _restore_from_log():
+    """
+    Rebuild the in-memory views from the tail of the telemetry log after a
+    restart (on a non-primary worker: the primary's log, opened read-only).
+    """
+    source = telemetry_log
+    if source is None and TELEMETRY_LOG_DIR:
+        source = TelemetryLog(TELEMETRY_LOG_DIR, NUMERIC_SENSOR_FIELDS, read_only=True)
+    if source is None:
+        return
+
+    global fleet_co2_grams
+
+    started = time.perf_counter()
+    restored = 0
+    replay = {}   # station → ([ts], [temperature]) for one vectorized CO2 pass
+    for record in source.tail(TELEMETRY_RESTORE_RECORDS):
+        reading = record_to_reading(record, NUMERIC_SENSOR_FIELDS, INT_SENSOR_FIELDS, BOOL_SENSOR_FIELDS)
+        station_id = reading.get('station_id')
+        if station_id is not None and station_id.isdigit():
+            reading['station_id'] = int(station_id)
+        reading['timestamp'] = datetime.fromtimestamp(record[0], timezone.utc).isoformat()
+        state = stations.touch(station_id)
+        _apply_reading(state, reading, record[0], co2=False)
+        timestamps, temperatures = replay.setdefault(state, ([], []))
+        timestamps.append(record[0])
+        temperatures.append(reading.get('temperature'))
+        restored += 1
+
+    for state, (timestamps, temperatures) in replay.items():
+        fleet_co2_grams += state.co2.extend(timestamps, photo_efficiency_array(temperatures))
+        _mark_changed(state)
+
+    if restored:
+        print(f"💾 Restored {restored} readings for {len(stations)} station(s) from {TELEMETRY_LOG_DIR} "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+def _mark_changed(station):
+    """
+    Bump a station's data version (and the fleet's) once its state is fully
+    updated, so conditional GETs and the body cache see the new data.
+    """
+    global state_version, state_changed_at, stations_added_at
+    station.version += 1
+    station.changed_at = state_changed_at = time.time()
+    if station.version == 1:
+        stations_added_at = station.changed_at
+    state_version += 1
+
+
+def _reading_time(data, now):
+    """
+    Epoch seconds a reading was taken at. Readings buffered offline may carry
+    their own 'timestamp' (epoch seconds or ISO 8601) or 'age' (seconds before
+    upload); anything missing, invalid or in the future means "now". ISO
+    strings without an offset are UTC, like everything the API emits.
+    """
+    ts = data.get('timestamp')
+    if isinstance(ts, str):
+        try:
+            ts = parse_time(ts)
+        except ValueError:
+            ts = None
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool) and 0 < ts <= now:
+        return float(ts)
+
+    age = data.get('age')
+    if isinstance(age, (int, float)) and not isinstance(age, bool) and age > 0:
+        return now - age
+    return now
+
+
+def _ingest_reading(data, now, local=True):
+    """
+    Merge one reading into its station's state and log it; returns the station.
+    ``local=False`` for readings another worker received (not counted again).
+    """
+    ts = _reading_time(data, now)
+    station = stations.touch(data.get('station_id'))
+    updated = dict(station.latest) if station.latest else {}
+    updated['timestamp'] = datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+    for field in SENSOR_FIELDS:
+        value = data.get(field)
+        if value is not None:
+            updated[field] = value
+
+    vertex = _apply_reading(station, updated, ts)
+    if local:
+        INGEST_READINGS.inc(station=station.station_id, format='json')
+    if telemetry_log is not None:
+        telemetry_log.append(updated, ts)
+    if archive is not None and not archive.read_only:
+        archive.append(station.station_id, updated, ts)
+    if vertex is not None:
+        _emit_track_point(station, vertex)
+    return station
+
+
+def _emit_track_point(station, vertex):
+    socketio.emit('track_point', {'station_id': station.station_id, 'point': vertex},
+                  to=[_station_room(station.station_id), ALL_STATIONS_ROOM])
+
+
+def _request_readings():
+    """
+    Parse a POST body as one JSON object, a JSON array of objects, or NDJSON
+    (application/x-ndjson, one object per line). Returns (data, is_batch).
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        readings = []
+        for line in request.get_data().splitlines():
+            if not line.strip():
+                continue
+            try:
+                readings.append(json.loads(line))
+            except ValueError:
+                readings.append(None)
+        return readings, True
+
+    data = request.get_json(silent=True)
+    return data, isinstance(data, list)
+
+
+def _check_reading(data):
+    """
+    Type-check one JSON reading before it is accepted (and possibly queued):
+    numeric fields take numbers or numeric strings (converted), satellites a
+    whole number, gps_valid a boolean or 0/1, station_id / station_name text
+    or an integer id that fits the telemetry log's fixed-width fields.
+    Returns (reading with converted values, None) or (None, message naming
+    the first bad field).
+    """
+    if not isinstance(data, dict) or all(data.get(field) is None for field in SENSOR_FIELDS):
+        return None, 'Not a sensor reading'
+    reading = dict(data)
+    for field in SENSOR_FIELDS:
+        value = data.get(field)
+        if value is None:
+            continue
+        try:
+            reading[field] = _convert_field(field, value)
+        except (TypeError, ValueError):
+            return None, f'Invalid {field}: {value!r}'
+    too_long = text_field_error(reading)
+    if too_long:
+        return None, too_long
+    return reading, None
+
+
+def _convert_field(field, value):
+    if field in TEXT_SENSOR_FIELDS:
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            raise TypeError(field)
+        return value
+    if field in BOOL_SENSOR_FIELDS:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (int, float)) and value in (0, 1):
+            return bool(value)
+        raise ValueError(field)
+    if isinstance(value, bool):
+        raise TypeError(field)
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(field)
+    if field in INT_SENSOR_FIELDS:
+        if not number.is_integer():
+            raise ValueError(field)
+        return int(number)
+    return value if isinstance(value, (int, float)) else number
+
+
+def _validate_batch(readings):
+    """
+    Split a JSON batch into sensor readings and rejected entries.
+    Returns (readings, rejected, error response or None).
+    """
+    if not readings:
+        return [], [], (jsonify({'status': 'error', 'message': 'No data provided'}), 400)
+    if len(readings) > MAX_BATCH_READINGS:
+        return [], [], (jsonify({
+            'status': 'error',
+            'message': f'Batch too large: {len(readings)} readings (max {MAX_BATCH_READINGS})'
+        }), 413)
+
+    valid = []
+    rejected = []
+    for index, data in enumerate(readings):
+        reading, message = _check_reading(data)
+        if message:
+            rejected.append({'index': index, 'message': message})
+            continue
+        valid.append(reading)
+
+    if rejected:
+        INGEST_REJECTED.inc(len(rejected))
+    if not valid:
+        return [], rejected, (jsonify({'status': 'error', 'message': 'No valid readings', 'rejected': rejected}), 400)
+    return valid, rejected, None
+
+
+def _apply_readings(readings, now, batch=True, local=True):
+    """
+    Ingest validated JSON readings received at ``now``. Each touched station
+    is published once with its final state instead of once per reading.
+    Returns the touched stations by key.
+    """
+    touched = {}
+    for data in readings:
+        station = _ingest_reading(data, now, local)
+        touched[station.station_id] = station
+
+    for key, station in touched.items():
+        _mark_changed(station)
+        broadcaster.publish(key, station.latest)
+
+    if not local:
+        return touched   # Logged by the worker that received them
+    if batch:
+        skipped = ingest_log_sampler.allow('batch')
+        if skipped is not None:
+            log.info("📦 ESP32 batch: %d readings from %d station(s)%s",
+                     len(readings), len(touched), f" (+{skipped} batches not logged)" if skipped else "")
+    else:
+        for station in touched.values():
+            updated = station.latest
+            skipped = ingest_log_sampler.allow(station.station_id)
+            if skipped is not None:
+                log.info("📊 ESP32 %s: T=%s°C H=%s%% CO=%s ppm GPS=%s,%s%s",
+                         station.station_id, updated.get('temperature'), updated.get('humidity'),
+                         updated.get('co_ppm'), updated.get('latitude'), updated.get('longitude'),
+                         f" (+{skipped} readings not logged)" if skipped else "")
+    return touched
+
+
+def _decode_wire(body):
+    """Decode a compact binary body (fixed 60-byte records, see api/_wire.py). Returns (records, error response)."""
+    try:
+        records = wire_decoder.decode(body)
+    except ValueError as e:
+        return None, (jsonify({'status': 'error', 'message': str(e)}), 400)
+    if not records:
+        return None, (jsonify({'status': 'error', 'message': 'No data provided'}), 400)
+    if len(records) > MAX_BATCH_READINGS:
+        return None, (jsonify({
+            'status': 'error',
+            'message': f'Batch too large: {len(records)} readings (max {MAX_BATCH_READINGS})'
+        }), 413)
+    return records, None
+
+
+def _apply_records(records, now, local=True):
+    """
+    Ingest decoded binary records received at ``now``. Records go straight
+    into each station's history columns; the latest-reading dict is rebuilt
+    once per station from its newest row. Returns the touched stations by key.
+    """
+    touched = {}
+    counts = {}
+    for station_id, age, values in records:
+        ts = now - age if 0 < age < now else now
+        station = stations.touch(station_id)
+        numbers, texts = station.history.append_values(ts, values, (station_id,))
+        vertex = _apply_values(station, numbers, ts)
+        if telemetry_log is not None:
+            telemetry_log.append_values(ts, texts, numbers)   # Same field order as the history
+        if archive is not None and not archive.read_only:
+            archive.append_values(station.station_id, ts, texts, numbers)
+        if vertex is not None:
+            _emit_track_point(station, vertex)
+        touched[station.station_id] = station
+        counts[station.station_id] = counts.get(station.station_id, 0) + 1
+
+    for key, station in touched.items():
+        station.latest = station.history.latest()
+        _mark_changed(station)
+        broadcaster.publish(key, station.latest)
+        if local:
+            INGEST_READINGS.inc(counts[key], station=key, format='wire')
+    return touched
+
+
+def _apply_ingest(kind, payload, received, local=True):
+    """
+    Apply one accepted request ('wire', 'batch' or 'reading') received at
+    epoch ``received``; returns the touched stations by key. Requests this
+    worker received are then passed to the other workers over the cluster
+    bus, which apply them with ``local=False``. Also the ingest_queue consumer.
+    """
+    if kind == 'wire':
+        touched = _apply_records(payload, received, local)
+    else:
+        touched = _apply_readings(payload, received, batch=(kind == 'batch'), local=local)
+    if local and bus is not None:
+        bus.publish('ingest', {'kind': kind, 'payload': payload, 'received': received})
+    return touched
+
+
+bus = None   # Cluster bus, opened once the in-memory state is restored (see the end of the module)
+ingest_queue = IngestQueue(_apply_ingest, spawn=socketio.start_background_task, sleep=socketio.sleep)
+REGISTRY.gauge('greenpulse_ingest_queue_pending', 'Readings accepted (202) but not applied yet',
+               callback=lambda: ingest_queue.pending)
+REGISTRY.counter('greenpulse_ingest_queue_failed_total', 'Queued readings whose processing raised',
+                 callback=lambda: ingest_queue.failed)
 
-        updated = dict(current_sensor_data) if current_sensor_data else {}
-        updated['timestamp'] = datetime.now().isoformat()
 
-        for field in SENSOR_FIELDS:
-            value = data.get(field)
-            if value is not None:
-                updated[field] = value
+def _enqueue(kind, payload, count, extra=None):
+    """
+    Hand a validated request to the ingest queue: 202 once it is queued,
+    429 with Retry-After when the backlog is full (nothing is applied then,
+    so the client can resend the same body).
+    """
+    if not ingest_queue.submit(kind, payload, count):
+        return jsonify({
+            'status': 'error',
+            'message': 'Ingest queue full, retry later',
+            'retry_after': ingest_queue.retry_after,
+        }), 429, {'Retry-After': str(ingest_queue.retry_after)}
+    return jsonify({'status': 'accepted', 'accepted': count, **(extra or {}),
+                    'queued': ingest_queue.pending}), 202
 
-        current_sensor_data = updated
 
-        sensor_history.append(current_sensor_data.copy())
-        if len(sensor_history) > 500:
-            sensor_history.pop(0)
+def _station_version(state):
+    """Data version of a station's read endpoints; no station = whatever the fleet looks like now."""
+    return (state.station_id, state.version) if state is not None else (None, state_version)
 
-        if updated.get('gps_valid') and updated.get('latitude') and updated.get('longitude'):
-            lat = updated['latitude']
-            lng = updated['longitude']
-            if not gps_track or abs(gps_track[-1]['lat'] - lat) > 0.00005 or abs(gps_track[-1]['lng'] - lng) > 0.00005:
-                gps_track.append({'lat': lat, 'lng': lng, 'timestamp': updated['timestamp']})
-                if len(gps_track) > 500:
-                    gps_track.pop(0)
 
-        print(f"\n📊 ESP32: T={updated.get('temperature')}°C "
-              f"H={updated.get('humidity')}% "
-              f"CO={updated.get('co_ppm')} ppm "
-              f"GPS={updated.get('latitude')},{updated.get('longitude')}")
+def _conditional(version, changed_at, render):
+    """
+    Serve a GET through its data ``version``, a tuple of plain values that
+    changes whenever the response would (it becomes the ETag): 304 when the
+    client's If-None-Match already has it, otherwise the cached body of this
+    URL at this version, calling ``render()`` only on a miss. Only 200s are cached.
+
+    ``changed_at`` must cover every part of ``version`` (None = no
+    Last-Modified). If-Modified-Since is only consulted without
+    If-None-Match (RFC 9110 §13.2.2), and Last-Modified is only sent once
+    its second is over: a change later in the same second would otherwise
+    carry the same date and be answered 304.
+    """
+    etag = make_etag(version)
+    last_modified = int(changed_at) if changed_at is not None else None
+    if last_modified is not None and last_modified >= int(time.time()):
+        last_modified = None
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        fresh = since is not None and last_modified is not None and last_modified <= since.timestamp()
+    if fresh:
+        body_cache.not_modified += 1
+        response = Response(status=304)
+    else:
+        key = (request.path, request.query_string, version)
+        body = body_cache.get(key)
+        if body is None:
+            response = make_response(render())
+            if response.status_code != 200:
+                return response
+            body_cache.put(key, response.get_data())
+        else:
+            response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True   # Browsers revalidate every poll (and get 304s)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
 
-        socketio.emit('sensor_update', current_sensor_data)
-        return jsonify({'status': 'received', 'data': current_sensor_data}), 201
 
-    if current_sensor_data is None:
+@app.route('/api/sensor-data', methods=['GET', 'POST'])
+def sensor_data():
+    """
+    GET  → current sensor readings (origin: live_measured); ?station= selects
+           a station, otherwise the most recently active one is returned.
+           ETag / If-None-Match: 304 until the station has a new reading
+    POST → ESP32 pushes new readings, keyed by their station_id: one JSON
+           object, a batch as a JSON array / NDJSON body, or binary records
+           (Content-Type: application/vnd.greenpulse.reading.v1).
+           With INGEST_ASYNC the body is only validated and queued (202, or
+           429 + Retry-After when the queue is full); otherwise it is applied
+           before answering 201.
+    """
+    if request.method == 'POST':
+        now = time.time()
+        if request.mimetype == WIRE_CONTENT_TYPE:
+            records, error = _decode_wire(request.get_data())
+            if error:
+                return error
+            if INGEST_ASYNC:
+                return _enqueue('wire', records, len(records))
+            touched = _apply_ingest('wire', records, now)
+            return jsonify({'status': 'received', 'accepted': len(records), 'stations': list(touched)}), 201
+
+        data, is_batch = _request_readings()
+        if is_batch:
+            readings, rejected, error = _validate_batch(data)
+            if error:
+                return error
+            if INGEST_ASYNC:
+                return _enqueue('batch', readings, len(readings), {'rejected': rejected})
+            touched = _apply_ingest('batch', readings, now)
+            return jsonify({
+                'status': 'received',
+                'accepted': len(readings),
+                'rejected': rejected,
+                'stations': list(touched),
+            }), 201
+
+        if not data or not isinstance(data, dict):
+            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+        data, message = _check_reading(data)
+        if message:
+            INGEST_REJECTED.inc()
+            return jsonify({'status': 'error', 'message': message}), 400
+        if INGEST_ASYNC:
+            return _enqueue('reading', [data], 1)
+        (station,) = _apply_ingest('reading', [data], now).values()
+        return jsonify({'status': 'received', 'data': station.latest}), 201
+
+    state = stations.get(request.args.get('station'))
+    if state is None or state.latest is None:
         return jsonify({
             'status': 'offline',
             'message': 'ESP32 not connected',
             'data_source': 'none'
         }), 200
 
-    return jsonify({
+    changed_at = max(state.changed_at or 0, stations_added_at or 0) or None   # station_count too
+    return _conditional((*_station_version(state), len(stations)), changed_at, lambda: (jsonify({
         'status': 'online',
-        'data': current_sensor_data,
+        'data': state.latest,
+        'station_id': state.station_id,
+        'station_count': len(stations),
         'data_source': 'live_measured',
         'origin': 'ESP32 hardware sensors'
-    }), 200
+    }), 200))
+
+
+@app.route('/api/stations', methods=['GET'])
+def list_stations():
+    """Known stations with their latest reading timestamp."""
+    return _conditional((state_version,), state_changed_at, lambda: jsonify({
+        'status': 'ok',
+        'stations': [
+            {
+                'station_id': key,
+                'station_name': state.latest.get('station_name') if state.latest else None,
+                'timestamp': state.latest.get('timestamp') if state.latest else None,
+                'history_records': len(state.history),
+            }
+            for key, state in stations.items()
+        ],
+        'count': len(stations),
+        'last_active': stations.last_active,
+    }))
 
 
 @app.route('/api/gps-track', methods=['GET'])
 def get_gps_track():
-    return jsonify({'status': 'ok', 'track': gps_track, 'count': len(gps_track)}), 200
+    """Simplified track; ?since=<last_seq> returns only vertices added after that cursor."""
+    state = stations.get(request.args.get('station'))
+    try:
+        since = _track_cursor(request.args.get('since'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'since must be an integer'}), 400
+    return _conditional(_station_version(state), state.changed_at if state else None,
+                        lambda: jsonify({'status': 'ok', **_track_payload(state, since)}))
+
+
+def _track_cursor(value):
+    return None if value in (None, '') else int(value)
+
+
+def _track_payload(state, since=None):
+    if state is None:
+        return {'track': [], 'tail': None, 'last_seq': 0, 'count': 0, 'station_id': None}
+    return {**state.gps_track.snapshot(since), 'station_id': state.station_id}
+
+
+def _clear_track(station_id=None):
+    """Clear a station's GPS track, or every station's, and tell this worker's clients."""
+    if station_id:
+        state = stations.get(station_id)
+        if state is not None:
+            state.gps_track.clear()
+            _mark_changed(state)
+            socketio.emit('track_cleared', {'station_id': state.station_id},
+                          to=[_station_room(state.station_id), ALL_STATIONS_ROOM])
+    else:
+        for _, state in stations.items():
+            state.gps_track.clear()
+            _mark_changed(state)
+        socketio.emit('track_cleared', {})
 
 
 @app.route('/api/gps-track', methods=['DELETE'])
 def clear_gps_track():
-    global gps_track
-    gps_track = []
-    socketio.emit('track_cleared', {})
+    """Clear one station's track (?station=) or every station's track."""
+    station_id = request.args.get('station') or None
+    _clear_track(station_id)
+    if bus is not None:
+        bus.publish('track_cleared', {'station_id': station_id})
     return jsonify({'status': 'ok', 'message': 'Track cleared'}), 200
 
 
 @app.route('/api/sensor-history', methods=['GET'])
 def get_sensor_history():
-    limit = min(int(request.args.get('limit', 100)), 500)
+    """
+    Raw recent readings; raw readings between ?from=&to= (epoch seconds or
+    ISO 8601, served from the archive); or aggregated buckets with
+    ?resolution=1m|15m|1h|1d&from=&to=. Conditional on the station's data version.
+
+    Row timestamps are UTC ISO 8601 with an explicit +00:00 offset, so a
+    row's own timestamp can be sent back as ?from=; ISO bounds without an
+    offset are read as UTC too.
+    """
+    state = stations.get(request.args.get('station'))
+    resolution = request.args.get('resolution')
+    version = _station_version(state)
+    changed_at = state.changed_at if state else None
+    if not resolution and (request.args.get('from') or request.args.get('to')) and archive is not None:
+        if archive.read_only:   # Written by another process: nothing here to version it by
+            return _sensor_range(state)
+        # Rows reach the archive after the reading is applied; key on what has been committed
+        version += (archive.written,)
+        changed_at = None
+    return _conditional(version, changed_at, lambda: _sensor_history(state, resolution))
+
+
+def _sensor_history(state, resolution):
+    if resolution:
+        return _sensor_rollup(state, resolution)
+    if request.args.get('from') or request.args.get('to'):
+        return _sensor_range(state)
+
+    limit = min(int(request.args.get('limit', 100)), HISTORY_CAPACITY)
+    history = state.history.view(limit).to_list() if state else []
     return jsonify({
         'status': 'ok',
-        'history': sensor_history[-limit:],
-        'total': len(sensor_history),
+        'history': history,
+        'total': len(state.history) if state else 0,
         'data_source': 'live_measured',
         'origin': 'ESP32 hardware sensors, stored in memory'
     }), 200
 
 
+def _sensor_range(state):
+    try:
+        start = parse_time(request.args.get('from'))
+        end = parse_time(request.args.get('to'))
+        limit = min(int(request.args.get('limit', ARCHIVE_MAX_ROWS)), ARCHIVE_MAX_ROWS)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    if state is None:
+        rows = []
+    elif archive is not None:
+        rows = archive.query(state.station_id, start, end, limit, run=tpool.execute)   # off the hub
+    else:   # No archive: whatever of the range is still in memory
+        rows = []
+        for row in state.history.view():
+            ts = datetime.fromisoformat(row['timestamp']).timestamp()
+            if (start is None or ts >= start) and (end is None or ts <= end):
+                rows.append(row)
+        rows = rows[:limit] if start is not None else rows[-limit:]
+    return jsonify({
+        'status': 'ok',
+        'station_id': state.station_id if state else None,
+        'history': rows,
+        'total': len(rows),
+        'truncated': len(rows) >= limit,
+        'data_source': 'live_measured',
+        'origin': 'ESP32 hardware sensors, ' + ('archived' if archive is not None else 'stored in memory'),
+    }), 200
+
+
+def _sensor_rollup(state, resolution):
+    if resolution not in RESOLUTIONS:
+        return jsonify({
+            'status': 'error',
+            'message': f"Unknown resolution '{resolution}', use one of: {', '.join(RESOLUTIONS)}"
+        }), 400
+    try:
+        start = parse_time(request.args.get('from'))
+        end = parse_time(request.args.get('to'))
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    rows = state.rollup.query(resolution, start, end) if state else []
+    return jsonify({
+        'status': 'ok',
+        'station_id': state.station_id if state else None,
+        'resolution': resolution,
+        'bucket_seconds': RESOLUTIONS[resolution],
+        'fields': ROLLUP_FIELDS,
+        'history': rows,
+        'total': len(rows),
+        'data_source': 'live_measured',
+        'origin': 'ESP32 hardware sensors, aggregated at ingest'
+    }), 200
+
+
 @app.route('/api/co2-absorbed', methods=['GET'])
 def co2_absorbed():
     """
@@ -166,51 +916,55 @@ def co2_absorbed():
           bench (1 m² algae culture, ambient CO2 conditions)
         - Δt = time between consecutive ESP32 readings (capped at 1h per interval)
 
+      The sum is accumulated once per reading at ingest, so this endpoint is
+      O(1) and unaffected by history eviction. Pass ?buckets=hour|day for the
+      per-bucket series (UTC-aligned) with the cumulative total per bucket.
+
       Assumptions & limitations:
         - Light intensity assumed adequate (not factored in this version)
         - pH assumed within optimal range (6.5–7.5)
         - No direct CO2 measurement inlet/outlet differential
         - Estimate accuracy: ±30–50% (research-grade approximation)
+
+      ?station= selects a station (default: most recently active); the
+      fleet-wide total is always included as fleet_grams. Answers 304 to
+      If-None-Match until any station has a new reading.
     """
-    if not sensor_history or len(sensor_history) < 2:
+    state = stations.get(request.args.get('station'))
+    return _conditional((*_station_version(state), state_version), state_changed_at,
+                        lambda: _co2_absorbed(state))
+
+
+def _co2_absorbed(state):
+    if state is None or state.co2.records == 0:
         return jsonify({
             'status': 'ok',
             'grams': 0.0,
-            'records': len(sensor_history),
+            'records': 0,
+            'fleet_grams': round(fleet_co2_grams, 3),
             'data_source': 'estimated',
             'origin': 'temperature_model',
-            'esp32_connected': current_sensor_data is not None,
+            'esp32_connected': state is not None,
             'methodology': 'Insufficient sensor history for estimation',
             'confidence': 'none'
         }), 200
 
-    total_grams = 0.0
-    used_records = 0
-
-    for i in range(1, len(sensor_history)):
-        prev = sensor_history[i - 1]
-        curr = sensor_history[i]
-
-        temp = curr.get('temperature')
-        eff = photo_efficiency(temp) if temp is not None else 0.0
-
-        try:
-            t1 = datetime.fromisoformat(prev.get('timestamp', ''))
-            t2 = datetime.fromisoformat(curr.get('timestamp', ''))
-            hours = min((t2 - t1).total_seconds() / 3600, 1.0)
-        except Exception:
-            hours = 0.0083  # ~30 seconds fallback
-
-        total_grams += eff * CO2_GRAMS_PER_HOUR_MAX * hours
-        used_records += 1
+    extra = {}
+    resolution = request.args.get('buckets')
+    if resolution:
+        if resolution not in ('hour', 'day'):
+            return jsonify({'status': 'error', 'message': "buckets must be 'hour' or 'day'"}), 400
+        extra = {'resolution': resolution, 'series': state.co2.buckets(resolution)}
 
     return jsonify({
         'status': 'ok',
-        'grams': round(total_grams, 3),
-        'records': used_records,
+        'station_id': state.station_id,
+        'grams': round(state.co2.total_grams, 3),
+        'records': state.co2.records,
+        'fleet_grams': round(fleet_co2_grams, 3),
         'data_source': 'estimated',
         'origin': 'temperature_efficiency_model',
-        'esp32_connected': current_sensor_data is not None,
+        'esp32_connected': True,
         'methodology': (
             'Model-based estimate using temperature-dependent photosynthetic '
             'efficiency curve for Chlorella vulgaris. Not a direct measurement. '
@@ -218,7 +972,8 @@ def co2_absorbed():
         ),
         'formula': 'sum(efficiency(T_i) * 4.34 g/h * delta_t_i)',
         'confidence': 'low_to_medium',
-        'accuracy_note': '±30-50% (research-grade approximation)'
+        'accuracy_note': '±30-50% (research-grade approximation)',
+        **extra,
     }), 200
 
 
@@ -229,9 +984,9 @@ def ai_analyze_sensors():
     Uses real sensor data if available; falls back to provided values.
     Clearly indicates data origin in response.
     """
-    global current_sensor_data
     req = request.json or {}
-    sd = current_sensor_data or {}
+    live = _latest_reading(req.get('station_id'))
+    sd = live or {}
 
     # Track which values come from real sensors vs defaults
     params = {}
@@ -247,14 +1002,24 @@ def ai_analyze_sensors():
             param_origins[key] = 'default_assumed'
         return params[key]
 
-    temperature     = resolve('temperature',     22,  '°C')
-    humidity        = resolve('humidity',        65,  '%')
-    light_intensity = resolve('light_intensity', 450, 'lux')
-    co2_ppm         = resolve('co2_ppm',         420, 'ppm')
-    co_ppm          = resolve('co_ppm',          0,   'ppm')
-    ph              = resolve('ph',              7.0, '')
-
-    data_quality = 'live' if current_sensor_data else 'defaults_used'
+    for key, default, unit in (('temperature',     22,  '°C'),
+                               ('humidity',        65,  '%'),
+                               ('light_intensity', 450, 'lux'),
+                               ('co2_ppm',         420, 'ppm'),
+                               ('co_ppm',          0,   'ppm'),
+                               ('ph',              7.0, '')):
+        resolve(key, default, unit)
+
+    data_quality = 'live' if live else 'defaults_used'
+
+    # Prompt is built from bucketed values so a cached answer matches its key
+    inputs = quantize_inputs(params)
+    temperature     = inputs['temperature']
+    humidity        = inputs['humidity']
+    light_intensity = inputs['light_intensity']
+    co2_ppm         = inputs['co2_ppm']
+    co_ppm          = inputs['co_ppm']
+    ph              = inputs['ph']
 
     co_line = f"• CO (carbon monoxide): {co_ppm} ppm (safe <50 ppm)\n" if co_ppm else ""
 
@@ -293,22 +1058,15 @@ Respond strictly in this format, one item per line:
             "max_tokens": 250,
             "temperature": 0.3
         }
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        req = urllib.request.Request(
-            "https://api.openai.com/v1/chat/completions",
-            data=json.dumps(req_data).encode("utf-8"),
-            headers=headers,
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            response_data = json.loads(resp.read().decode("utf-8"))
+        key = cache_key('ai-analyze-sensors', AI_PROMPT_VERSION, req_data['model'],
+                        {**inputs, 'input_quality': data_quality})
+        analysis, cache_status = ai_cache.get_or_compute(
+            key, lambda: get_client().chat_completion(**req_data)["choices"][0]["message"]["content"])
 
         return jsonify({
             'status': 'success',
-            'analysis': response_data["choices"][0]["message"]["content"],
+            'analysis': analysis,
+            'cache': cache_status,
             'parameters': params,
             'parameter_origins': param_origins,
             'data_source': 'ai_generated',
@@ -331,13 +1089,17 @@ def ai_predict_growth():
     Uses real conditions if available; clearly marks data origin.
     """
     req = request.json or {}
-    sd = current_sensor_data or {}
+    live = _latest_reading(req.get('station_id'))
+    sd = live or {}
 
     ph              = req.get('ph')              or sd.get('ph',              7.0)
     temperature     = req.get('temperature')     or sd.get('temperature',     22)
     light_intensity = req.get('light_intensity') or sd.get('light_intensity', 450)
 
-    data_quality = 'live' if current_sensor_data else 'defaults_used'
+    data_quality = 'live' if live else 'defaults_used'
+    conditions = {'ph': ph, 'temperature': temperature, 'light_intensity': light_intensity}
+    inputs = quantize_inputs(conditions)
+    ph, temperature, light_intensity = inputs['ph'], inputs['temperature'], inputs['light_intensity']
     eff = photo_efficiency(temperature)
 
     prompt = f"""GreenPulse bioreactor conditions:
@@ -375,23 +1137,16 @@ Respond strictly:
             "max_tokens": 200,
             "temperature": 0.2
         }
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        req = urllib.request.Request(
-            "https://api.openai.com/v1/chat/completions",
-            data=json.dumps(req_data).encode("utf-8"),
-            headers=headers,
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            response_data = json.loads(resp.read().decode("utf-8"))
+        key = cache_key('ai-predict-growth', AI_PROMPT_VERSION, req_data['model'],
+                        {**inputs, 'input_quality': data_quality})
+        prediction, cache_status = ai_cache.get_or_compute(
+            key, lambda: get_client().chat_completion(**req_data)["choices"][0]["message"]["content"])
 
         return jsonify({
             'status': 'success',
-            'prediction': response_data["choices"][0]["message"]["content"],
-            'conditions': {'ph': ph, 'temperature': temperature, 'light_intensity': light_intensity},
+            'prediction': prediction,
+            'cache': cache_status,
+            'conditions': conditions,
             'calculated_efficiency': round(eff * 100, 1),
             'data_source': 'ai_generated',
             'input_quality': data_quality,
@@ -406,17 +1161,7 @@ Respond strictly:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
-@app.route('/api/chatbot', methods=['POST'])
-def chatbot():
-    """Scientific chatbot about GreenPulse technology."""
-    data = request.json or {}
-    user_message = data.get('message', '')
-    history = data.get('history', [])
-
-    if not user_message:
-        return jsonify({'status': 'error', 'message': 'Message cannot be empty'}), 400
-
-    system_prompt = """You are a scientific assistant for GreenPulse, a Chlorella vulgaris algae bioreactor bench that monitors and improves urban air quality.
+CHATBOT_SYSTEM_PROMPT = """You are a scientific assistant for GreenPulse, a Chlorella vulgaris algae bioreactor bench that monitors and improves urban air quality.
 
 SCIENTIFIC FACTS (verified):
 - Microorganism: Chlorella vulgaris (green microalgae)
@@ -450,76 +1195,220 @@ RESPONSE STYLE:
 - Use Russian language
 - Use emojis sparingly for clarity"""
 
+
+def _chatbot_request(user_message, history=None, session_id=None):
+    """
+    Chat-completion arguments shared by the REST and Socket.IO chat paths.
+    Context comes from the conversation store for ``session_id``, or from the
+    client's own ``history`` for legacy clients (see resolve_session).
+    """
+    messages = [{"role": "system", "content": CHATBOT_SYSTEM_PROMPT}]
+    if session_id:
+        messages.extend(get_conversations().messages(session_id))
+    elif history:
+        messages.extend(history[-10:])
+    messages.append({"role": "user", "content": user_message})
+    return {
+        "model": "gpt-4o",
+        "messages": messages,
+        "max_tokens": 500,
+        "temperature": 0.7
+    }
+
+
+@app.route('/api/chatbot', methods=['POST'])
+def chatbot():
+    """Scientific chatbot about GreenPulse technology."""
+    data = request.json or {}
+    user_message = data.get('message', '')
+    history = data.get('history', [])
+    session_id = resolve_session(data)
+
+    if not user_message:
+        return jsonify({'status': 'error', 'message': 'Message cannot be empty'}), 400
+
     try:
         if not OPENAI_API_KEY:
             return jsonify({'status': 'error', 'message': 'OpenAI API key not available'}), 500
 
-        messages = [{"role": "system", "content": system_prompt}]
-        if history:
-            messages.extend(history[-10:])
-        messages.append({"role": "user", "content": user_message})
-
-        req_data = {
-            "model": "gpt-4o",
-            "messages": messages,
-            "max_tokens": 500,
-            "temperature": 0.7
-        }
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        req = urllib.request.Request(
-            "https://api.openai.com/v1/chat/completions",
-            data=json.dumps(req_data).encode("utf-8"),
-            headers=headers,
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            response_data = json.loads(resp.read().decode("utf-8"))
+        req_data = _chatbot_request(user_message, history, session_id)
+        response_data = get_client().chat_completion(**req_data)
+        record_usage('app-chatbot', response_data.get('usage'))
+        reply = response_data["choices"][0]["message"]["content"]
+        if session_id and reply:
+            get_conversations().append(session_id, user_message, reply)
 
         return jsonify({
             'status': 'success',
-            'response': response_data["choices"][0]["message"]["content"],
-            'user_message': user_message
+            'response': reply,
+            'user_message': user_message,
+            'session_id': session_id,
         }), 200
 
     except Exception as e:
-        print(f"❌ Chatbot error: {e}")
+        log.error("❌ Chatbot error: %s", e)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return REGISTRY.render(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
+    state = stations.get()
     return jsonify({
         'status': 'ok',
-        'esp32_connected': current_sensor_data is not None,
-        'gps_track_points': len(gps_track),
-        'history_records': len(sensor_history),
+        'esp32_connected': state is not None,
+        'stations': len(stations),
+        'gps_track_points': len(state.gps_track) if state else 0,
+        'history_records': len(state.history) if state else 0,
+        'ai_cache': ai_cache.stats(),
         'data_sources': {
-            'sensor_data': 'live_measured' if current_sensor_data else 'unavailable',
-            'co2_estimate': 'temperature_model' if len(sensor_history) >= 2 else 'insufficient_data',
+            'sensor_data': 'live_measured' if state else 'unavailable',
+            'co2_estimate': 'temperature_model' if state and state.co2.records else 'insufficient_data',
             'ai_analysis': 'gpt-4o' if OPENAI_API_KEY else 'unavailable'
-        }
+        },
+        'broadcast': broadcaster.stats(),
+        'body_cache': body_cache.stats(),
+        'ingest_queue': ingest_queue.stats(),
+        'cluster': {
+            'primary': CLUSTER_PRIMARY,
+            'bus': bus.stats() if bus is not None else None,
+        },
     }), 200
 
 
+def _on_bus_event(event, data):
+    """Apply what another worker received, and fan it out to this worker's clients."""
+    if event == 'ingest':
+        _apply_ingest(data['kind'], data['payload'], data['received'], local=False)
+    elif event == 'track_cleared':
+        _clear_track(data.get('station_id'))
+
+
+_restore_from_log()
+bus = open_bus(CLUSTER_BUS_URL, spawn=socketio.start_background_task, serve=CLUSTER_PRIMARY, worker_id=WORKER_ID)
+if bus is not None:
+    bus.subscribe(_on_bus_event)
+    REGISTRY.counter(
+        'greenpulse_cluster_bus_messages_total', 'Cluster bus events by direction (dropped = not sent, bus down)',
+        ['direction'],
+        callback=lambda: [({'direction': d}, bus.stats()[d]) for d in ('published', 'received', 'dropped', 'failed')])
+    print(f"🔗 Cluster bus {CLUSTER_BUS_URL}: worker {bus.worker_id}"
+          f" ({'primary' if CLUSTER_PRIMARY else 'replica'})")
+
+
 # WebSocket events
 @socketio.on('connect')
 def on_connect():
-    print("🔌 WebSocket client connected")
-    if current_sensor_data:
-        emit('sensor_update', current_sensor_data)
+    """
+    Clients connecting with ?station=<id> only get that station's updates.
+    Every client gets a full ``sensor_update`` snapshot first; after that only
+    ``sensor_delta`` frames with changed fields (see DeltaBroadcaster).
+    """
+    WEBSOCKET_CLIENTS.inc()
+    log.info("🔌 WebSocket client connected")
+    station_id = request.args.get('station')
+    if station_id:
+        on_subscribe({'station': station_id})
+        return
+    join_room(ALL_STATIONS_ROOM)
+    _emit_snapshot(stations.get(None))
+
+
+@socketio.on('subscribe')
+def on_subscribe(data):
+    """Watch one station instead of the whole fleet."""
+    station_id = (data or {}).get('station')
+    if station_id is None:
+        return
+    state = stations.get(station_id)
+    key = state.station_id if state else station_key(station_id, DEFAULT_STATION_ID)
+    leave_room(ALL_STATIONS_ROOM)
+    join_room(_station_room(key))
+    _emit_snapshot(state)
+
+
+@socketio.on('unsubscribe')
+def on_unsubscribe(data):
+    station_id = (data or {}).get('station')
+    if station_id is not None:
+        leave_room(_station_room(station_key(station_id, DEFAULT_STATION_ID)))
+
+
+@socketio.on('request_snapshot')
+def on_request_snapshot(data=None):
+    """Full state of a station, for clients that saw a delta they have no base for (or a seq gap)."""
+    _emit_snapshot(stations.get((data or {}).get('station')))
 
 
 @socketio.on('disconnect')
 def on_disconnect():
-    print("🔌 WebSocket client disconnected")
+    WEBSOCKET_CLIENTS.dec()
+    log.info("🔌 WebSocket client disconnected")
+
+
+@socketio.on('chat_message')
+def on_chat_message(data=None):
+    """
+    Streamed chatbot: tokens go to the sender as ``chat_token`` events as they
+    arrive, followed by ``chat_done`` with the full text and the ``session_id``
+    to send with the next message. ``id`` is echoed so the client can match
+    frames to its request.
+    """
+    data = data or {}
+    chat_id = data.get('id')
+    user_message = (data.get('message') or '').strip()
+    if not user_message:
+        emit('chat_error', {'id': chat_id, 'message': 'Message cannot be empty'})
+        return
+    if not OPENAI_API_KEY:
+        emit('chat_error', {'id': chat_id, 'message': 'OpenAI API key not available'})
+        return
+
+    session_id = resolve_session(data)
+    req_data = _chatbot_request(user_message, data.get('history'), session_id)
+    parts = []
+    try:
+        with get_client().stream_chat_completion(**req_data) as stream:
+            for token in stream:
+                parts.append(token)
+                emit('chat_token', {'id': chat_id, 'token': token})
+    except Exception as e:
+        log.error("❌ Chatbot stream error: %s", e)
+        emit('chat_error', {'id': chat_id, 'message': str(e)})
+        return
+
+    record_usage('app-chatbot', stream.usage)
+    reply = ''.join(parts)
+    if session_id:
+        get_conversations().append(session_id, user_message, reply)
+    emit('chat_done', {
+        'id': chat_id,
+        'status': 'success',
+        'response': reply,
+        'session_id': session_id,
+        'model': req_data['model'],
+        'finish_reason': stream.finish_reason,
+        'user_message': user_message,
+    })
 
 
 @socketio.on('request_track')
-def on_request_track():
-    emit('full_track', {'track': gps_track})
+def on_request_track(data=None):
+    """
+    Track of a station as ``full_track``; with ``since`` only the vertices a
+    client has not seen yet. New vertices are pushed as ``track_point``.
+    """
+    data = data or {}
+    try:
+        since = _track_cursor(data.get('since'))
+    except (TypeError, ValueError):
+        since = None
+    emit('full_track', _track_payload(stations.get(data.get('station')), since))
 
 
 # Static files (legacy Vite build)
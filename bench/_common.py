@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import platform
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, "api")
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (0 for an empty one)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values), math.ceil(q / 100.0 * len(sorted_values))) - 1)
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Latencies and error count of one scenario; cheap enough to share per worker thread."""
+
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    def add(self, seconds: float, ok: bool = True) -> None:
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    def merge(self, other: "Recorder") -> None:
+        self.latencies.extend(other.latencies)
+        self.errors += other.errors
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "requests": len(ordered),
+            "errors": self.errors,
+            "rps": round(len(ordered) / duration, 1) if duration > 0 else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        }
+
+
+def rss_kb(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of ``pid`` (this process by default) in KiB; None where /proc is missing."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, Any]], columns: Sequence[str]) -> None:
+    print(f"\n{title}")
+    width = max([len(name) for name in rows] + [8])
+    print("  " + "case".ljust(width) + "".join(f"{c:>14}" for c in columns))
+    for name, row in rows.items():
+        cells = "".join(f"{'' if row.get(c) is None else row.get(c):>14}" for c in columns)
+        print("  " + name.ljust(width) + cells)
+
+
+def write_json(path: str, report: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+    print(f"\nWrote {path}")
+
+
+# Metric → True if higher is better
+_DIRECTIONS = {
+    "rps": True, "p50_ms": False, "p99_ms": False, "ns_per_op": False, "peak_bytes": False,
+    "import_ms": False, "options_us": False, "request_us": False, "accuracy": True,
+}
+
+
+def compare(report: Dict[str, Any], baseline_path: str, tolerance: float) -> List[str]:
+    """
+    Regressions of ``report`` against a JSON report written earlier by the
+    same script: any tracked metric more than ``tolerance`` (0.25 = 25%)
+    worse than the baseline.
+    """
+    with open(baseline_path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    regressions = []
+    for case, metrics in report.get("results", {}).items():
+        before = baseline.get("results", {}).get(case)
+        if not before:
+            continue
+        for metric, higher_is_better in _DIRECTIONS.items():
+            old, new = before.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > tolerance:
+                regressions.append(f"{case}.{metric}: {old} → {new} ({change:+.0%} worse)")
+    return regressions
+
+
+def finish(report: Dict[str, Any], json_path: Optional[str], baseline: Optional[str], tolerance: float) -> int:
+    """Write/compare a report as the CLI asked; returns the process exit code."""
+    if json_path:
+        write_json(json_path, report)
+    if not baseline:
+        return 0
+    regressions = compare(report, baseline, tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {tolerance:.0%} vs {baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\n✅ No regressions beyond {tolerance:.0%} vs {baseline}")
+    return 0
@@ -0,0 +1,130 @@
+"""
+Cold-start and per-invocation cost of the serverless functions in api/.
+
+    python bench/coldstart.py
+    python bench/coldstart.py --json bench/coldstart-baseline.json
+    python bench/coldstart.py --baseline bench/coldstart-baseline.json
+
+For every api/<name>.py: the median time to import the module in a fresh
+interpreter (what a Vercel cold start pays on top of the runtime itself),
+and the time per request for a cheap request that never leaves the process
+(OPTIONS, plus GET for the read endpoints and an empty POST for the
+others), served through the real handler class over an in-memory socket.
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import API_DIR, environment, finish, print_table
+
+# Runs in a fresh interpreter; prints the import time in seconds. The Vercel
+# runtime has already imported http.server and json, so they are not counted.
+_IMPORT_SNIPPET = """
+import http.server, importlib.util, json, sys, time
+sys.path.insert(0, {api!r})
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("fn", {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(time.perf_counter() - started)
+"""
+
+# Requests answered without calling OpenAI (400 for an empty message / body, or served from memory)
+_REQUESTS = {
+    "sensor-data": b"GET /api/sensor-data HTTP/1.1\r\nHost: bench\r\n\r\n",
+    "sensor-history": b"GET /api/sensor-history?limit=120 HTTP/1.1\r\nHost: bench\r\n\r\n",
+    "chat": b"POST /api/chat HTTP/1.1\r\nHost: bench\r\nContent-Length: 2\r\n\r\n{}",
+    "chatbot": b"POST /api/chatbot HTTP/1.1\r\nHost: bench\r\nContent-Length: 2\r\n\r\n{}",
+}
+_OPTIONS = b"OPTIONS /api HTTP/1.1\r\nHost: bench\r\nOrigin: http://bench\r\n\r\n"
+
+
+class _MemorySocket:
+    """Just enough of a socket for StreamRequestHandler: reads a canned request, collects the reply."""
+
+    def __init__(self, raw: bytes) -> None:
+        self._raw = raw
+        self.sent = io.BytesIO()
+
+    def makefile(self, mode: str, *args: Any, **kwargs: Any) -> io.BytesIO:
+        return io.BytesIO(self._raw)
+
+    def sendall(self, data: bytes) -> None:
+        self.sent.write(data)
+
+
+def import_seconds(path: str, runs: int) -> float:
+    code = _IMPORT_SNIPPET.format(api=API_DIR, path=path)
+    env = {**os.environ, "TELEMETRY_LOG_DIR": ""}
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+        samples.append(float(output.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+def load_handler(path: str) -> Any:
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3].replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def invocation_us(handler_cls: Any, raw: bytes, seconds: float = 0.5) -> Optional[float]:
+    """Mean microseconds per request served by ``handler_cls``; None if it did not answer."""
+    stderr, sys.stderr = sys.stderr, io.StringIO()   # the stock handler logs every request here
+    try:
+        sock = _MemorySocket(raw)
+        handler_cls(sock, ("127.0.0.1", 0), None)
+        if not sock.sent.getvalue().startswith(b"HTTP/"):
+            return None
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            handler_cls(_MemorySocket(raw), ("127.0.0.1", 0), None)
+            count += 1
+        return (time.perf_counter() - started) / count * 1e6
+    finally:
+        sys.stderr = stderr
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="fresh interpreters per import measurement")
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a report written with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    os.environ.setdefault("TELEMETRY_LOG_DIR", "")
+    sys.path.insert(0, API_DIR)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for path in sorted(glob.glob(os.path.join(API_DIR, "[!_]*.py"))):
+        name = os.path.basename(path)[:-3]
+        handler_cls = load_handler(path)
+        results[name] = {
+            "import_ms": round(import_seconds(path, args.runs) * 1000, 2),
+            "options_us": round(invocation_us(handler_cls, _OPTIONS) or 0, 1),
+            "request_us": round(invocation_us(handler_cls, _REQUESTS[name]) or 0, 1) if name in _REQUESTS else None,
+        }
+    print_table("Serverless functions (cold import; per-request in-process)", results,
+                ["import_ms", "options_us", "request_us"])
+
+    report = {"kind": "coldstart", "environment": environment(), "results": results}
+    return finish(report, args.json_path, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
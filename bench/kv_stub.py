@@ -0,0 +1,145 @@
+"""
+Local stand-in for a Vercel KV / Upstash Redis REST endpoint, so the
+serverless functions can share telemetry state without a real KV service.
+
+    python bench/kv_stub.py --port 18998 --delay 0.02
+    TELEMETRY_STORE=kv KV_REST_API_URL=http://127.0.0.1:18998 KV_REST_API_TOKEN=stub ...
+
+Answers POST /pipeline (a JSON array of commands) and POST / (one command)
+the way the Upstash REST API does, from an in-memory dict, after
+``--delay`` seconds per request. Only the commands api/_state_store.py
+uses are implemented: GET SET DEL COPY RPUSH LTRIM LRANGE SADD SMEMBERS.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+_data: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def _list_range(items: List[str], start: int, stop: int) -> Tuple[int, int]:
+    """Redis inclusive (possibly negative) indices to a Python slice."""
+    size = len(items)
+    start = max(0, start + size if start < 0 else start)
+    stop = stop + size if stop < 0 else min(stop, size - 1)
+    return start, stop + 1
+
+
+def _execute(command: List[Any]) -> Any:
+    name, args = str(command[0]).upper(), [str(arg) for arg in command[1:]]
+    if name == "GET":
+        value = _data.get(args[0])
+        if value is not None and not isinstance(value, str):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+    if name == "SET":
+        _data[args[0]] = args[1]
+        return "OK"
+    if name == "DEL":
+        return sum(_data.pop(key, None) is not None for key in args)
+    if name == "COPY":
+        if args[0] not in _data or (args[1] in _data and "REPLACE" not in (a.upper() for a in args[2:])):
+            return 0
+        value = _data[args[0]]
+        _data[args[1]] = value.copy() if isinstance(value, (list, set)) else value
+        return 1
+    if name == "RPUSH":
+        items = _data.setdefault(args[0], [])
+        items.extend(args[1:])
+        return len(items)
+    if name == "LTRIM":
+        items = _data.get(args[0], [])
+        start, stop = _list_range(items, int(args[1]), int(args[2]))
+        _data[args[0]] = items[start:stop]
+        return "OK"
+    if name == "LRANGE":
+        items = _data.get(args[0], [])
+        start, stop = _list_range(items, int(args[1]), int(args[2]))
+        return items[start:stop]
+    if name == "SADD":
+        members = _data.setdefault(args[0], set())
+        added = len(set(args[1:]) - members)
+        members.update(args[1:])
+        return added
+    if name == "SMEMBERS":
+        return sorted(_data.get(args[0], ()))
+    raise ValueError(f"ERR unknown command '{name}'")
+
+
+def _run(command: Any) -> Dict[str, Any]:
+    try:
+        return {"result": _execute(command)}
+    except (ValueError, IndexError, TypeError) as exc:
+        return {"error": str(exc)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+    delay = 0.0
+    token = ""
+    requests = 0
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; don't let Nagle hold the body back
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        type(self).requests += 1
+        time.sleep(self.delay)
+        if self.token and self.headers.get("Authorization") != f"Bearer {self.token}":
+            self._send(401, {"error": "Unauthorized"})
+            return
+        try:
+            body = json.loads(raw or b"null")
+        except ValueError:
+            self._send(400, {"error": "ERR invalid JSON"})
+            return
+        with _lock:
+            if self.path.rstrip("/") == "/pipeline":
+                self._send(200, [_run(command) for command in body])
+            else:
+                self._send(200, _run(body))
+
+    def _send(self, status: int, payload: Any) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start(port: int = 0, delay: float = 0.0, token: str = "") -> Tuple[ThreadingHTTPServer, str]:
+    """Serve the stub on a daemon thread; returns the server and its base URL."""
+    handler = type("Stub", (StubHandler,), {"delay": delay, "token": token})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=18998)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--token", default="", help="require this bearer token")
+    args = parser.parse_args()
+    server, url = start(args.port, args.delay, args.token)
+    print(f"KV stub listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,168 @@
+"""
+Accuracy and speed of the chat language detector (api/_language.py).
+
+    python bench/language.py
+    python bench/language.py --json bench/language-baseline.json
+    python bench/language.py --baseline bench/language-baseline.json
+
+Runs ``detect_language`` over a labelled set of chat-style messages and
+reports accuracy per language, then the time per call for short and long
+messages. The previous regex + substring detector is measured alongside as
+``legacy`` for reference. Exits with 1 when ``--baseline`` is given and
+accuracy dropped or a case got more than ``--tolerance`` slower.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import sys
+import timeit
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import API_DIR, environment, finish, print_table
+
+sys.path.insert(0, API_DIR)
+from _language import detect_language
+
+# (expected language, message)
+SAMPLES: List[Tuple[str, str]] = [
+    ("en", "How does the bioreactor absorb CO2?"),
+    ("en", "What is the optimal temperature for Chlorella?"),
+    ("en", "Please explain the sensor readings from station 3"),
+    ("en", "Is the pH level too low right now?"),
+    ("en", "Tell me about algae plants in urban spaces"),
+    ("en", "Can this replace trees in a city park?"),
+    ("en", "Thanks, that was helpful!"),
+    ("en", "Why is the humidity so high today"),
+    ("en", "Show me last week's data"),
+    ("en", "Explain what Хлорелла means in this context"),
+    ("ru", "Как работает биореактор?"),
+    ("ru", "Какая оптимальная температура для хлореллы?"),
+    ("ru", "Почему уровень CO2 вырос сегодня?"),
+    ("ru", "Спасибо, всё понятно"),
+    ("ru", "Что показывает датчик MQ135?"),
+    ("kk", "Биореактор қалай жұмыс істейді?"),
+    ("kk", "Хлорелла үшін оңтайлы температура қандай?"),
+    ("kk", "Сәлеметсіз бе! CO2 деңгейі неге өсті?"),
+    ("kk", "Рақмет, бәрі түсінікті"),
+    ("kk", "Ауа сапасы қандай?"),
+    ("zh", "生物反应器是如何工作的？"),
+    ("zh", "小球藻的最佳温度是多少"),
+    ("zh", "今天二氧化碳为什么升高了"),
+    ("ja", "バイオリアクターはどのように動きますか？"),
+    ("ja", "クロレラの最適温度は何度ですか"),
+    ("ja", "今日の湿度はなぜ高いのですか"),
+    ("ko", "바이오리액터는 어떻게 작동합니까?"),
+    ("ko", "클로렐라의 최적 온도는 무엇입니까"),
+    ("ar", "كيف يعمل المفاعل الحيوي؟"),
+    ("ar", "ما هي درجة الحرارة المثلى للطحالب"),
+    ("he", "איך עובד הביוריאקטור?"),
+    ("he", "מה הטמפרטורה האופטימלית לאצות"),
+    ("hi", "बायोरिएक्टर कैसे काम करता है?"),
+    ("hi", "शैवाल के लिए सबसे अच्छा तापमान क्या है"),
+    ("th", "ไบโอรีแอคเตอร์ทำงานอย่างไร"),
+    ("th", "อุณหภูมิที่เหมาะสมสำหรับสาหร่ายคือเท่าไร"),
+    ("el", "Πώς λειτουργεί ο βιοαντιδραστήρας;"),
+    ("el", "Ποια είναι η ιδανική θερμοκρασία για τα φύκια"),
+    ("es", "¿Cómo funciona el biorreactor?"),
+    ("es", "¿Cuál es la temperatura óptima para las algas?"),
+    ("es", "Hola, quiero saber más sobre el proyecto"),
+    ("es", "Gracias por la información"),
+    ("es", "Por qué subió el nivel de CO2 hoy"),
+    ("fr", "Comment fonctionne le bioréacteur ?"),
+    ("fr", "Quelle est la température optimale pour les algues ?"),
+    ("fr", "Bonjour, je voudrais des informations sur le projet"),
+    ("fr", "Pourquoi le niveau de CO2 a augmenté aujourd'hui"),
+    ("fr", "C'est très intéressant, merci"),
+    ("de", "Wie funktioniert der Bioreaktor?"),
+    ("de", "Was ist die optimale Temperatur für die Algen?"),
+    ("de", "Hallo, ich möchte mehr über das Projekt wissen"),
+    ("de", "Warum ist der CO2-Wert heute gestiegen"),
+    ("de", "Danke, das ist sehr hilfreich"),
+]
+
+# The detector api/chat.py and api/chatbot.py used before api/_language.py
+_LEGACY_PATTERNS = {
+    "ru": r"[а-яА-ЯёЁ]",
+    "kk": r"[әіңғүұқөһӘІҢҒҮҰҚӨҺ]",
+    "zh": r"[\u4e00-\u9fff]",
+    "ja": r"[\u3040-\u309f\u30a0-\u30ff]",
+    "ko": r"[\uac00-\ud7af]",
+    "ar": r"[\u0600-\u06ff]",
+    "he": r"[\u0590-\u05ff]",
+    "hi": r"[\u0900-\u097f]",
+    "th": r"[\u0e00-\u0e7f]",
+    "el": r"[\u0370-\u03ff]",
+}
+
+
+def legacy_detect_language(text: str) -> str:
+    if not text:
+        return "en"
+    for lang_code, pattern in _LEGACY_PATTERNS.items():
+        if re.search(pattern, text):
+            return lang_code
+    text_lower = text.lower()
+    if any(word in text_lower for word in ["el", "la", "los", "las", "es", "un", "una"]):
+        return "es"
+    if any(word in text_lower for word in ["le", "la", "les", "un", "une", "est", "sont"]):
+        return "fr"
+    if any(word in text_lower for word in ["der", "die", "das", "ein", "eine", "ist", "sind"]):
+        return "de"
+    return "en"
+
+
+def accuracy(detect: Callable[[str], str], verbose: bool) -> Tuple[float, Dict[str, float]]:
+    hits: Dict[str, List[bool]] = defaultdict(list)
+    for expected, text in SAMPLES:
+        got = detect(text)
+        hits[expected].append(got == expected)
+        if verbose and got != expected:
+            print(f"  {detect.__name__}: {text!r} -> {got} (expected {expected})")
+    per_language = {lang: sum(ok) / len(ok) for lang, ok in hits.items()}
+    total = sum(sum(ok) for ok in hits.values()) / len(SAMPLES)
+    return total, per_language
+
+
+def ns_per_call(fn: Callable[[], Any], repeat: int = 5) -> float:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a report written with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--verbose", action="store_true", help="list misclassified samples")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for detect in (detect_language, legacy_detect_language):
+        name = "detect_language" if detect is detect_language else "legacy"
+        total, per_language = accuracy(detect, args.verbose)
+        results[f"{name}[accuracy]"] = {"accuracy": round(total, 3)}
+        if detect is detect_language:
+            for lang, share in sorted(per_language.items()):
+                results[f"{name}[accuracy,{lang}]"] = {"accuracy": round(share, 3)}
+
+        texts = {
+            "short,en": SAMPLES[0][1],
+            "short,ru": SAMPLES[10][1],
+            "long,en": " ".join(text for lang, text in SAMPLES if lang == "en"),   # ~380 chars
+            "long,mixed": " ".join(text for _, text in SAMPLES[:20]),   # Latin, then Cyrillic
+        }
+        for label, text in texts.items():
+            results[f"{name}[{label}]"] = {"ns_per_op": round(ns_per_call(lambda: detect(text)), 1)}
+
+    print_table(f"Language detection ({len(SAMPLES)} labelled messages)", results, ["accuracy", "ns_per_op"])
+    report = {"kind": "language", "environment": environment(), "results": results}
+    return finish(report, args.json_path, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
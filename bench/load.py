@@ -0,0 +1,381 @@
+"""
+Load test of the Flask/Socket.IO server (app.py) with simulated stations.
+
+    python bench/load.py                                  # spawn app.py + OpenAI stub, run every scenario
+    python bench/load.py --scenarios ingest,history -c 16 -d 10
+    python bench/load.py --url http://127.0.0.1:5000      # drive a server that is already running
+    python bench/load.py --json bench/load-baseline.json
+    python bench/load.py --baseline bench/load-baseline.json --tolerance 0.25
+
+Scenarios (each runs for ``--duration`` seconds with ``--concurrency``
+keep-alive clients spread over ``--stations`` stations):
+
+  ingest        POST /api/sensor-data, one JSON reading per request
+  ingest-wire   POST /api/sensor-data, one 60-byte binary record per request
+  history       GET  /api/sensor-history?station=&limit=100
+  rollup        GET  /api/sensor-history?station=&resolution=1m
+  co2           GET  /api/co2-absorbed?station=
+  chatbot       POST /api/chatbot through the local OpenAI stub (--stub-delay)
+  fanout        JSON ingest while ``--subscribers`` Socket.IO clients watch every
+                station; reports frames delivered and POST → sensor_delta latency
+
+Reports req/s, p50/p99/max latency, errors and the server's RSS after each
+scenario. Latency is measured on this host, so run the script next to the
+server (the fan-out latency also relies on both sharing a clock).
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import API_DIR, ROOT, Recorder, environment, finish, print_table, rss_kb
+import openai_stub
+
+sys.path.insert(0, API_DIR)
+from _wire import WIRE_CONTENT_TYPE, encode_reading
+
+SCENARIOS = ["ingest", "ingest-wire", "history", "rollup", "co2", "chatbot", "fanout"]
+
+Request = Tuple[str, str, Optional[bytes], Dict[str, str]]
+
+
+class Connection:
+    """Keep-alive HTTP client that reconnects after any connection error."""
+
+    def __init__(self, host: str, port: int, timeout: float = 30.0) -> None:
+        self.host, self.port, self.timeout = host, port, timeout
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self._conn.request(method, path, body=body, headers=headers or {})
+            response = self._conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ── Simulated stations ───────────────────────────────────────────────────────
+
+def station_reading(rng: random.Random, station: int) -> Dict[str, Any]:
+    return {
+        "station_id": station,
+        "timestamp": time.time(),
+        "temperature": round(rng.uniform(18, 32), 2),
+        "humidity": rng.randint(45, 80),
+        "co2_ppm": rng.randint(400, 470),
+        "ph": round(rng.uniform(6.7, 7.3), 2),
+        "latitude": 43.65 + station * 0.01 + rng.uniform(-0.002, 0.002),
+        "longitude": 51.17 + rng.uniform(-0.002, 0.002),
+        "gps_valid": True,
+        "satellites": rng.randint(6, 12),
+    }
+
+
+def scenario_requests(name: str, stations: int) -> Callable[[random.Random, int], Request]:
+    """Factory of ``(method, path, body, headers)`` for request number ``n`` of a scenario."""
+    json_headers = {"Content-Type": "application/json"}
+
+    def station(n: int) -> int:
+        return n % stations + 1
+
+    if name in ("ingest", "fanout"):
+        return lambda rng, n: ("POST", "/api/sensor-data",
+                               json.dumps(station_reading(rng, station(n))).encode(), json_headers)
+    if name == "ingest-wire":
+        return lambda rng, n: ("POST", "/api/sensor-data",
+                               encode_reading(station_reading(rng, station(n))),
+                               {"Content-Type": WIRE_CONTENT_TYPE})
+    if name == "history":
+        return lambda rng, n: ("GET", f"/api/sensor-history?station={station(n)}&limit=100", None, {})
+    if name == "rollup":
+        return lambda rng, n: ("GET", f"/api/sensor-history?station={station(n)}&resolution=1m", None, {})
+    if name == "co2":
+        return lambda rng, n: ("GET", f"/api/co2-absorbed?station={station(n)}", None, {})
+    if name == "chatbot":
+        return lambda rng, n: ("POST", "/api/chatbot",
+                               json.dumps({"message": f"How is station {station(n)} doing? #{n}"}).encode(),
+                               json_headers)
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+def drive(host: str, port: int, make_request: Callable[[random.Random, int], Request],
+          concurrency: int, duration: float) -> Tuple[Recorder, float]:
+    """Run ``concurrency`` closed-loop clients for ``duration`` seconds."""
+    recorders = [Recorder() for _ in range(concurrency)]
+    barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker(index: int) -> None:
+        rng = random.Random(index)
+        conn = Connection(host, port)
+        recorder = recorders[index]
+        n = index
+        barrier.wait()
+        while time.perf_counter() < deadline[0]:
+            method, path, body, headers = make_request(rng, n)
+            n += concurrency
+            started = time.perf_counter()
+            try:
+                status, _ = conn.request(method, path, body, headers)
+                ok = status < 400
+            except (OSError, http.client.HTTPException):
+                ok = False
+            recorder.add(time.perf_counter() - started, ok)
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = Recorder()
+    for recorder in recorders:
+        total.merge(recorder)
+    return total, elapsed
+
+
+# ── Socket.IO fan-out ────────────────────────────────────────────────────────
+
+class PollingSubscriber(threading.Thread):
+    """
+    Minimal Socket.IO (Engine.IO v4 long-polling) client: enough to receive
+    and time ``sensor_delta`` frames without extra dependencies.
+    """
+
+    def __init__(self, host: str, port: int, event: str = "sensor_delta") -> None:
+        super().__init__(daemon=True)
+        self.host, self.port, self.event = host, port, event
+        self.latencies: List[float] = []
+        self.frames = 0
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self._sid = ""
+
+    def _path(self) -> str:
+        path = f"/socket.io/?EIO=4&transport=polling&t={time.time_ns()}"
+        return f"{path}&sid={self._sid}" if self._sid else path
+
+    def _send(self, packet: str) -> None:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=10)
+        try:
+            conn.request("POST", self._path(), body=packet.encode("utf-8"),
+                         headers={"Content-Type": "text/plain;charset=UTF-8"})
+            conn.getresponse().read()
+        finally:
+            conn.close()
+
+    def run(self) -> None:
+        poll = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            poll.request("GET", self._path())
+            handshake = poll.getresponse().read().decode("utf-8")
+            self._sid = json.loads(handshake[handshake.index("{"):])["sid"]
+            self._send("40")   # connect to the default namespace
+            self.ready.set()
+            while not self.stopped.is_set():
+                poll.request("GET", self._path())
+                payload = poll.getresponse().read().decode("utf-8")
+                arrived = time.time()
+                for packet in payload.split("\x1e"):
+                    self._handle(packet, arrived)
+        except (OSError, ValueError, http.client.HTTPException):
+            pass
+        finally:
+            poll.close()
+            self.ready.set()
+
+    def _handle(self, packet: str, arrived: float) -> None:
+        if packet == "2":        # ping → pong
+            self._send("3")
+        elif packet.startswith("42"):
+            name, data = json.loads(packet[2:])[:2]
+            if name != self.event:
+                return
+            self.frames += 1
+            sent = (data.get("changed") or {}).get("timestamp")
+            if sent:
+                self.latencies.append(arrived - datetime.fromisoformat(sent).timestamp())
+
+    def close(self) -> None:
+        self.stopped.set()
+        try:
+            self._send("1")
+        except OSError:
+            pass
+
+
+def run_fanout(host: str, port: int, args: argparse.Namespace) -> Dict[str, Any]:
+    subscribers = [PollingSubscriber(host, port) for _ in range(args.subscribers)]
+    for subscriber in subscribers:
+        subscriber.start()
+    for subscriber in subscribers:
+        subscriber.ready.wait(10)
+    connected = sum(1 for s in subscribers if s._sid)
+
+    recorder, elapsed = drive(host, port, scenario_requests("fanout", args.stations),
+                              args.concurrency, args.duration)
+    time.sleep(1.0)   # let the last coalesced frames arrive
+    for subscriber in subscribers:
+        subscriber.close()
+
+    delivery = Recorder()
+    frames = 0
+    for subscriber in subscribers:
+        frames += subscriber.frames
+        for latency in subscriber.latencies:
+            delivery.add(latency)
+    result = recorder.summary(elapsed)
+    delivered = delivery.summary(elapsed)
+    result.update({
+        "subscribers": connected,
+        "frames": frames,
+        "frames_per_s": round(frames / elapsed, 1),
+        "delivery_p50_ms": delivered["p50_ms"],
+        "delivery_p99_ms": delivered["p99_ms"],
+    })
+    return result
+
+
+# ── Server lifecycle ─────────────────────────────────────────────────────────
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(port: int, stub_url: str, args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "OPENAI_BASE_URL": stub_url,
+        "OPENAI_API_KEY": env.get("BENCH_OPENAI_API_KEY", "bench-stub"),
+        "TELEMETRY_LOG_DIR": args.log_dir,
+        "PYTHONUNBUFFERED": "1",
+    })
+    output = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "app.py")],
+                               cwd=ROOT, env=env, stdout=output, stderr=subprocess.STDOUT)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"app.py exited with code {process.returncode} (see --server-log)")
+        try:
+            status, _ = Connection("127.0.0.1", port, timeout=2).request("GET", "/api/health")
+            if status == 200:
+                return process
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("app.py did not become healthy within 30 s")
+
+
+def seed(host: str, port: int, stations: int, readings: int = 20) -> None:
+    """Give every simulated station some history before the read scenarios."""
+    rng = random.Random(0)
+    conn = Connection(host, port)
+    for n in range(stations * readings):
+        body = json.dumps(station_reading(rng, n % stations + 1)).encode()
+        conn.request("POST", "/api/sensor-data", body, {"Content-Type": "application/json"})
+    conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="existing server to drive instead of spawning app.py")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("-d", "--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--stations", type=int, default=10)
+    parser.add_argument("--subscribers", type=int, default=20)
+    parser.add_argument("--stub-delay", type=float, default=0.2, help="OpenAI stub latency in seconds")
+    parser.add_argument("--log-dir", default="", help="TELEMETRY_LOG_DIR for the spawned server ('' = memory only)")
+    parser.add_argument("--server-log", help="write the spawned server's output here")
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a report written with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    process = None
+    stub = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+    else:
+        stub, stub_url = openai_stub.start(delay=args.stub_delay)
+        host, port = "127.0.0.1", free_port()
+        process = spawn_server(port, stub_url, args)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        seed(host, port, args.stations)
+        for name in scenarios:
+            print(f"▶ {name} ({args.concurrency} clients, {args.duration:g} s)", flush=True)
+            if name == "fanout":
+                result = run_fanout(host, port, args)
+            else:
+                recorder, elapsed = drive(host, port, scenario_requests(name, args.stations),
+                                          args.concurrency, args.duration)
+                result = recorder.summary(elapsed)
+            result["server_rss_kb"] = rss_kb(process.pid) if process else None
+            results[name] = result
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if stub is not None:
+            stub.shutdown()
+
+    print_table("Load test", results, ["rps", "p50_ms", "p99_ms", "max_ms", "errors", "server_rss_kb"])
+    if "fanout" in results:
+        fanout = results["fanout"]
+        print(f"\n  fanout: {fanout['subscribers']} subscribers, {fanout['frames_per_s']} frames/s delivered, "
+              f"POST → sensor_delta p50 {fanout['delivery_p50_ms']} ms / p99 {fanout['delivery_p99_ms']} ms")
+    print(f"  client RSS: {rss_kb()} KiB")
+
+    report = {
+        "kind": "load",
+        "environment": environment(),
+        "config": {k: getattr(args, k) for k in ("concurrency", "duration", "stations", "subscribers", "stub_delay")},
+        "results": results,
+    }
+    return finish(report, args.json_path, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
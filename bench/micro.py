@@ -0,0 +1,149 @@
+"""
+Microbenchmarks of the hot helpers behind the sensor endpoints.
+
+    python bench/micro.py
+    python bench/micro.py --json bench/micro-baseline.json
+    python bench/micro.py --baseline bench/micro-baseline.json --tolerance 0.25
+
+Each case reports the best-of-``--repeat`` time per call (timeit autorange)
+and the tracemalloc peak of a single call. Exits with 1 when ``--baseline``
+is given and a case got more than ``--tolerance`` slower or hungrier.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _common import API_DIR, environment, finish, print_table
+import kv_stub
+
+os.environ.setdefault("TELEMETRY_LOG_DIR", "")   # keep the serverless store in memory
+sys.path.insert(0, API_DIR)
+import _telemetry
+from _archive import TelemetryArchive
+from _efficiency import photo_efficiency, photo_efficiency_array
+from _history import SensorHistory
+from _state_store import KVStateStore, SQLiteStateStore
+from _wire import WireDecoder, encode_readings
+
+NUMERIC_FIELDS = [
+    "temperature", "humidity", "latitude", "longitude", "accuracy", "satellites",
+    "altitude", "gps_valid", "ph", "co2_ppm", "co_ppm", "light_intensity", "water_level",
+]
+
+
+def _reading(rng: random.Random, station_id: int = 1) -> Dict[str, Any]:
+    return {
+        "station_id": station_id,
+        "temperature": round(rng.uniform(15, 35), 1),
+        "humidity": rng.randint(40, 80),
+        "latitude": 43.65 + rng.uniform(-0.01, 0.01),
+        "longitude": 51.17 + rng.uniform(-0.01, 0.01),
+        "gps_valid": True,
+        "satellites": rng.randint(6, 12),
+        "co2_ppm": rng.randint(400, 480),
+        "ph": round(rng.uniform(6.5, 7.5), 2),
+    }
+
+
+def cases() -> Dict[str, Callable[[], Any]]:
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+    temps = [rng.uniform(-5, 45) for _ in range(10_000)]
+
+    # Serverless store: one station with a full history of posted payloads
+    for _ in range(_telemetry.MAX_HISTORY_POINTS):
+        _telemetry.remember_sensor_payload(_reading(rng, station_id=7))
+
+    history = SensorHistory(NUMERIC_FIELDS, text_fields=["station_id"], capacity=500)
+    for i in range(500):
+        history.append(_reading(rng), float(i))
+    row = [float(i) for i in range(len(NUMERIC_FIELDS))]
+    ring = SensorHistory(NUMERIC_FIELDS, capacity=500)
+    append_state = {"ts": 0.0}
+
+    def history_append_values():
+        append_state["ts"] += 1.0
+        ring.append_values(append_state["ts"], row)
+
+    # Archive: a week of one-minute readings for one station
+    archive = TelemetryArchive(os.path.join(tempfile.mkdtemp(), "archive.sqlite3"), NUMERIC_FIELDS,
+                               text_fields=["station_id"], background=False)
+    week_start = time.time() - 7 * 86400
+    for i in range(7 * 1440):
+        archive.append("1", _reading(rng), week_start + i * 60)
+    day_ago = week_start + 6 * 86400
+
+    # Shared serverless state: a full history in SQLite and behind the local KV stand-in
+    posted = [("7", _reading(rng, station_id=7), time.time()) for _ in range(_telemetry.MAX_HISTORY_POINTS)]
+    sqlite_store = SQLiteStateStore(os.path.join(tempfile.mkdtemp(), "state.sqlite3"), _telemetry.MAX_HISTORY_POINTS)
+    sqlite_store.record(posted)
+    _, kv_url = kv_stub.start()
+    kv_store = KVStateStore(kv_url, "stub", _telemetry.MAX_HISTORY_POINTS)
+    kv_store.record(posted)
+
+    decoder = WireDecoder(NUMERIC_FIELDS)
+    wire_batch = encode_readings([_reading(rng) for _ in range(100)])
+
+    return {
+        "build_virtual_point": lambda: _telemetry._build_virtual_point(now),
+        "get_sensor_history[virtual,120]": lambda: _telemetry.get_sensor_history(120),
+        "get_sensor_history[posted,120]": lambda: _telemetry.get_sensor_history(120, 7),
+        "photo_efficiency": lambda: photo_efficiency(23.4),
+        "photo_efficiency x10k[loop]": lambda: [photo_efficiency(t) for t in temps],
+        "photo_efficiency x10k[array]": lambda: photo_efficiency_array(temps),
+        "history.view(100).to_list": lambda: history.view(100).to_list(),
+        "history.append_values": history_append_values,
+        "wire.decode x100": lambda: decoder.decode(wire_batch),
+        "archive.query[1h of 1w]": lambda: archive.query("1", day_ago, day_ago + 3600),
+        "archive.query[newest 100]": lambda: archive.query("1", limit=100),
+        "state_store.load[sqlite,120]": lambda: sqlite_store.load("7", 120),
+        "state_store.load[kv stub,120]": lambda: kv_store.load("7", 120),
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    fn()   # warm caches (virtual table, lazy imports)
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ns_per_op": round(best * 1e9, 1), "ops_per_s": round(1 / best), "peak_bytes": peak}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--json", dest="json_path", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a report written with --json")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = {}
+    for name, fn in cases().items():
+        if args.filter in name:
+            results[name] = measure(fn, args.repeat)
+    print_table("Microbenchmarks", results, ["ns_per_op", "ops_per_s", "peak_bytes"])
+    print(f"\n{len(results)} case(s) in {time.perf_counter() - started:.1f} s")
+
+    report = {"kind": "micro", "environment": environment(), "results": results}
+    return finish(report, args.json_path, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Local stand-in for the OpenAI chat completions API, so benchmarks never call
+(or pay for) the real upstream.
+
+    python bench/openai_stub.py --port 18999 --delay 0.3
+    OPENAI_BASE_URL=http://127.0.0.1:18999/v1 OPENAI_API_KEY=stub python app.py
+
+Answers POST /v1/chat/completions with a short canned reply after ``--delay``
+seconds, as JSON or, for ``"stream": true``, as SSE chunks (with a final
+usage chunk when ``stream_options.include_usage`` is set).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+REPLY_TOKENS = ["GreenPulse ", "stub ", "reply: ", "conditions ", "look ", "stable."]
+
+_seen_system_prompts = set()
+
+
+def _usage(body):
+    """
+    Token counts at ~4 characters per token. Mimics OpenAI prompt caching:
+    a system prompt seen before counts as cached, in 128-token steps, once
+    it is at least 1024 tokens long.
+    """
+    messages = body.get("messages") or []
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+    system = messages[0].get("content", "") if messages and messages[0].get("role") == "system" else ""
+    cached = 0
+    if system in _seen_system_prompts and len(system) // 4 >= 1024:
+        cached = len(system) // 4 // 128 * 128
+    _seen_system_prompts.add(system)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(REPLY_TOKENS),
+        "total_tokens": prompt_tokens + len(REPLY_TOKENS),
+        "prompt_tokens_details": {"cached_tokens": cached},
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+    delay = 0.0
+    token_delay = 0.0
+    calls = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+        type(self).calls += 1
+        time.sleep(self.delay)
+        if body.get("stream"):
+            self._stream(body)
+            return
+        payload = json.dumps({
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(REPLY_TOKENS)},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(body),
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, body):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, token in enumerate(REPLY_TOKENS):
+            last = index == len(REPLY_TOKENS) - 1
+            chunk = {"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": "stop" if last else None}]}
+            self._chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            time.sleep(self.token_delay)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._chunk(f"data: {json.dumps({'choices': [], 'usage': _usage(body)})}\n\n".encode("utf-8"))
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+
+def start(port: int = 0, delay: float = 0.0, token_delay: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve the stub on a daemon thread; returns the server and its ``/v1`` base URL."""
+    handler = type("Stub", (StubHandler,), {"delay": delay, "token_delay": token_delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=18999)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    args = parser.parse_args()
+    server, url = start(args.port, args.delay, args.token_delay)
+    print(f"OpenAI stub listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
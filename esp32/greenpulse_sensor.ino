@@ -20,6 +20,15 @@ const char* WIFI_PASSWORD = "ВАШ_WIFI_ПАРОЛЬ";     // ← поменя
 // ── URL вашего Vercel бэкенда ───────────────────────────────────────
 const char* SERVER_URL = "https://greenp.vercel.app/api/sensor-data";  // ← поменяй на свой домен
 
+// ── Формат отправки ─────────────────────────────────────────────────
+// false → JSON (работает и с Vercel, и с Flask-бэкендом app.py)
+// true  → бинарная запись 60 байт (application/vnd.greenpulse.reading.v1) вместо ~300 байт JSON.
+//         Только если SERVER_URL указывает на Flask-бэкенд: он дополняет запись последним
+//         показанием станции, поэтому первая JSON-отправка после старта сообщает ему STATION_NAME.
+//         Функции Vercel хранят каждое показание как есть — бинарные записи там остались бы
+//         без имени станции (для станции 1 подставилось бы имя из профиля по умолчанию).
+const bool USE_BINARY_WIRE = false;
+
 // ── Пины ────────────────────────────────────────────────────────────
 #define DHT_PIN         4    // DHT22 — температура/влажность снаружи
 #define DHT_TYPE        DHT22
@@ -68,6 +77,38 @@ int readAirQualityIndex() {
   return 300;
 }
 
+// ── Бинарная запись (раскладка = RECORD в api/_wire.py) ─────────────
+// Значения — целые с фиксированной точкой: round(значение × масштаб)
+const int32_t WIRE_MISSING = INT32_MIN;   // датчик не измерял
+
+struct __attribute__((packed)) WireReading {
+  uint16_t station_id;
+  uint8_t  flags;                 // бит 0 = gps_valid
+  uint8_t  satellites;            // 255 = нет данных
+  uint32_t age;                   // секунд до отправки (0 = сейчас)
+  int32_t  temperature;           // ×100
+  int32_t  temp_inside;           // ×100
+  int32_t  humidity;              // ×10
+  int32_t  co2_ppm;               // ×1
+  int32_t  co_ppm;                // ×100
+  int32_t  air_quality_index;     // ×1
+  int32_t  ph;                    // ×1000
+  int32_t  light_intensity;       // ×1
+  int32_t  water_level;           // ×10
+  int32_t  latitude;              // ×1e7
+  int32_t  longitude;             // ×1e7
+  int32_t  altitude;              // ×10
+  int32_t  accuracy;              // ×100
+};
+static_assert(sizeof(WireReading) == 60, "WireReading must match RECORD in api/_wire.py");
+
+int32_t fixedPoint(double value, double scale) {
+  if (isnan(value)) return WIRE_MISSING;
+  return (int32_t) lround(value * scale);
+}
+
+bool stationNameSent = false;
+
 void setup() {
   Serial.begin(115200);
   delay(500);
@@ -146,35 +187,66 @@ void loop() {
   if (WiFi.status() == WL_CONNECTED) {
     HTTPClient http;
     http.begin(SERVER_URL);
-    http.addHeader("Content-Type", "application/json");
     http.setTimeout(10000);
+    int code;
 
-    StaticJsonDocument<512> doc;
-    doc["station_id"]   = STATION_ID;
-    doc["station_name"] = STATION_NAME;
+    if (USE_BINARY_WIRE && stationNameSent) {
+      WireReading rec;
+      rec.station_id        = STATION_ID;
+      rec.flags             = gps_valid ? 0x01 : 0x00;
+      rec.satellites        = gps.satellites.isValid() ? (uint8_t) min(satellites, 254) : 255;
+      rec.age               = 0;
+      rec.temperature       = fixedPoint(temp_outside, 100);
+      rec.temp_inside       = fixedPoint(temp_inside, 100);
+      rec.humidity          = fixedPoint(humidity, 10);
+      rec.co2_ppm           = fixedPoint(co2_ppm, 1);
+      rec.co_ppm            = WIRE_MISSING;
+      rec.air_quality_index = air_quality;
+      rec.ph                = WIRE_MISSING;
+      rec.light_intensity   = WIRE_MISSING;
+      rec.water_level       = WIRE_MISSING;
+      rec.latitude          = gps_valid ? fixedPoint(gps.location.lat(), 1e7) : WIRE_MISSING;
+      rec.longitude         = gps_valid ? fixedPoint(gps.location.lng(), 1e7) : WIRE_MISSING;
+      rec.altitude          = gps.altitude.isValid() ? fixedPoint(altitude, 10) : WIRE_MISSING;
+      rec.accuracy          = WIRE_MISSING;
 
-    // Температуры
-    doc["temperature"]      = round(temp_outside * 10) / 10.0;
-    doc["temp_inside"]      = round(temp_inside * 10) / 10.0;
-    doc["humidity"]         = round(humidity);
+      http.addHeader("Content-Type", "application/vnd.greenpulse.reading.v1");
+      code = http.POST((uint8_t*) &rec, sizeof(rec));
+    } else {
+      http.addHeader("Content-Type", "application/json");
+
+      StaticJsonDocument<512> doc;
+      doc["station_id"]   = STATION_ID;
+      doc["station_name"] = STATION_NAME;
+
+      // Температуры
+      doc["temperature"]      = round(temp_outside * 10) / 10.0;
+      doc["temp_inside"]      = round(temp_inside * 10) / 10.0;
+      doc["humidity"]         = round(humidity);
 
-    // MQ135
-    doc["co2_ppm"]          = round(co2_ppm);
-    doc["air_quality_index"]= air_quality;
+      // MQ135
+      doc["co2_ppm"]          = round(co2_ppm);
+      doc["air_quality_index"]= air_quality;
 
-    // GPS
-    doc["latitude"]         = latitude;
-    doc["longitude"]        = longitude;
-    doc["gps_valid"]        = gps_valid;
-    doc["satellites"]       = satellites;
-    doc["altitude"]         = round(altitude * 10) / 10.0;
+      // GPS
+      doc["latitude"]         = latitude;
+      doc["longitude"]        = longitude;
+      doc["gps_valid"]        = gps_valid;
+      doc["satellites"]       = satellites;
+      doc["altitude"]         = round(altitude * 10) / 10.0;
 
-    String body;
-    serializeJson(doc, body);
+      String body;
+      serializeJson(doc, body);
+
+      code = http.POST(body);
+    }
 
-    int code = http.POST(body);
-    if (code == 201 || code == 200) {
+    // 202 = принято в очередь сервера, 429 = очередь полна (повтор через Retry-After)
+    if (code == 201 || code == 202 || code == 200) {
+      stationNameSent = true;
       Serial.printf("✅ Сервер: %d OK\n", code);
+    } else if (code == 429) {
+      Serial.println("⏳ Сервер перегружен, показание пропущено");
     } else {
       Serial.printf("⚠️  Сервер: ошибка %d\n", code);
     }
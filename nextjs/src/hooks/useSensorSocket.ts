@@ -14,6 +14,13 @@ export interface SensorData {
   gps_valid?: boolean;
   timestamp?: string;
   station_name?: string;
+  station_id?: number | string;
+}
+
+interface SensorDelta {
+  station_id: string;
+  seq: number;
+  changed: Partial<SensorData>;
 }
 
 export interface SensorState {
@@ -34,6 +41,9 @@ export function useSensorSocket(): SensorState {
   const [loading, setLoading]         = useState(true);
   const [lastUpdate, setLastUpdate]   = useState<Date | null>(null);
   const pollRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  // Latest full state and frame number per station, the base for sensor_delta frames
+  const stationsRef = useRef<Map<string, SensorData>>(new Map());
+  const seqRef = useRef<Map<string, number>>(new Map());
 
   const fetchData = async () => {
     try {
@@ -76,11 +86,30 @@ export function useSensorSocket(): SensorState {
           setConnected(false);
         });
         socket.on("sensor_update", (data: SensorData) => {
+          const key = String(data.station_id ?? "");
+          stationsRef.current.set(key, data);
+          seqRef.current.delete(key);
           setSensorData(data);
           setConnected(true);
           setOffline(false);
           setLastUpdate(new Date());
         });
+        socket.on("sensor_delta", (frame: SensorDelta) => {
+          const key = String(frame.station_id);
+          const base = stationsRef.current.get(key);
+          const lastSeq = seqRef.current.get(key);
+          seqRef.current.set(key, frame.seq);
+          // No base yet or a missed frame: ask for a full snapshot
+          if (!base || (lastSeq !== undefined && frame.seq !== lastSeq + 1)) {
+            socket.emit("request_snapshot", { station: key });
+          }
+          const merged = { ...base, ...frame.changed };
+          stationsRef.current.set(key, merged);
+          setSensorData(merged);
+          setConnected(true);
+          setOffline(false);
+          setLastUpdate(new Date());
+        });
         socket.on("connect_error", () => {
           // Fall back to polling
           setConnected(false);
@@ -29,6 +29,8 @@ const ChatbotModal = ({ isOpen, onClose }: ChatbotModalProps) => {
   const [inputValue, setInputValue] = useState("");
   const [isLoading, setIsLoading] = useState(false);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // Сервер хранит контекст диалога по session_id — историю заново не отправляем
+  const sessionIdRef = useRef<string | null>(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
@@ -56,12 +58,6 @@ const ChatbotModal = ({ isOpen, onClose }: ChatbotModalProps) => {
     setIsLoading(true);
 
     try {
-      // Получаем историю сообщений для контекста
-      const conversationHistory = messages.map(m => ({
-        role: m.role,
-        content: m.content
-      }));
-
       // Отправляем запрос на Flask API
       const response = await fetch("/api/chatbot", {
         method: "POST",
@@ -70,7 +66,7 @@ const ChatbotModal = ({ isOpen, onClose }: ChatbotModalProps) => {
         },
         body: JSON.stringify({
           message: inputValue,
-          history: conversationHistory,
+          session_id: sessionIdRef.current,
         }),
       });
 
@@ -79,6 +75,9 @@ const ChatbotModal = ({ isOpen, onClose }: ChatbotModalProps) => {
       }
 
       const data = await response.json();
+      if (data.session_id) {
+        sessionIdRef.current = data.session_id;
+      }
 
       const assistantMessage: Message = {
         id: (Date.now() + 1).toString(),
@@ -3,7 +3,7 @@ import { io, Socket } from "socket.io-client";
 import { toast } from "sonner";
 
 export interface SensorData {
-  station_id?: number;
+  station_id?: number | string;
   station_name?: string;
   temperature?: number | null;
   humidity?: number | null;
@@ -21,6 +21,13 @@ export interface SensorData {
   timestamp?: string;
 }
 
+// Кадр с изменившимися полями станции (сервер шлёт только разницу)
+interface SensorDelta {
+  station_id: string;
+  seq: number;
+  changed: Partial<SensorData>;
+}
+
 interface UseSensorSocketReturn {
   sensorData: SensorData | null;
   connected: boolean;       // WebSocket соединение установлено
@@ -52,6 +59,9 @@ export function useSensorSocket(): UseSensorSocketReturn {
   const wsAvailable = useRef(false);
 
   const alertedRef = useRef<Set<string>>(new Set());
+  // Последнее полное состояние и номер кадра по каждой станции — база для sensor_delta
+  const stationsRef = useRef<Map<string, SensorData>>(new Map());
+  const seqRef = useRef<Map<string, number>>(new Map());
 
   const checkAlerts = useCallback((data: SensorData) => {
     const now = Date.now();
@@ -141,9 +151,26 @@ export function useSensorSocket(): UseSensorSocketReturn {
     });
 
     socket.on("sensor_update", (data: SensorData) => {
+      const key = String(data.station_id ?? "");
+      stationsRef.current.set(key, data);
+      seqRef.current.delete(key);
       handleSensorUpdate(data);
     });
 
+    socket.on("sensor_delta", (frame: SensorDelta) => {
+      const key = String(frame.station_id);
+      const base = stationsRef.current.get(key);
+      const lastSeq = seqRef.current.get(key);
+      seqRef.current.set(key, frame.seq);
+      // Нет базы или пропущен кадр — просим полный снимок станции
+      if (!base || (lastSeq !== undefined && frame.seq !== lastSeq + 1)) {
+        socket.emit("request_snapshot", { station: key });
+      }
+      const merged = { ...base, ...frame.changed };
+      stationsRef.current.set(key, merged);
+      handleSensorUpdate(merged);
+    });
+
     socket.on("disconnect", () => {
       setConnected(false);
       wsAvailable.current = false;
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The backend modules import each other as top-level modules (see app.py)
+sys.path.insert(0, os.path.join(ROOT, "api"))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+# app.py reads its settings at import: in-memory state with queued ingest,
+# what a fresh deployment without a data volume runs
+os.environ["TELEMETRY_LOG_DIR"] = ""
+os.environ["TELEMETRY_ARCHIVE_DB"] = ""
+os.environ["INGEST_ASYNC"] = "1"
+os.environ.setdefault("OPENAI_API_KEY", "")
+
+# Imported before any test runs: eventlet.monkey_patch() must come before
+# other tests start threads (e.g. the KV stub server)
+import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def greenpulse():
+    return app
+
+
+@pytest.fixture
+def client(greenpulse):
+    return greenpulse.app.test_client()
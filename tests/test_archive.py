@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from _archive import TelemetryArchive
+
+FIELDS = ["temperature", "humidity"]
+
+
+def _archive(path, **kwargs):
+    return TelemetryArchive(str(path), FIELDS, text_fields=["station_id"], background=False, **kwargs)
+
+
+def test_readings_sharing_a_timestamp_are_all_kept(tmp_path):
+    archive = _archive(tmp_path / "a.sqlite3")
+    now = time.time()
+    for n in range(5):   # one batch stamped with its arrival time
+        archive.append("1", {"station_id": "1", "temperature": 20 + n}, now)
+    rows = archive.query("1", now - 1, now + 1)
+    assert [row["temperature"] for row in rows] == [20, 21, 22, 23, 24]
+
+
+def test_prune_covers_stations_that_stopped_reporting(tmp_path):
+    path = tmp_path / "a.sqlite3"
+    old = time.time() - 10 * 86400
+    archive = _archive(path, retention_days=0)
+    archive.append("quiet", {"temperature": 1}, old)
+    archive.append("busy", {"temperature": 2}, old)
+
+    restarted = _archive(path, retention_days=1)   # has seen neither station
+    restarted.append("busy", {"temperature": 3}, time.time())
+    assert restarted.count("quiet") == 0
+    assert [row["temperature"] for row in restarted.query("busy")] == [3]
+
+
+def test_archive_from_before_seq_is_migrated(tmp_path):
+    path = tmp_path / "a.sqlite3"
+    db = sqlite3.connect(str(path))
+    db.execute('CREATE TABLE readings (station TEXT NOT NULL, ts REAL NOT NULL, "station_id", '
+               '"temperature" REAL, "humidity" REAL, PRIMARY KEY (station, ts)) WITHOUT ROWID')
+    db.execute("INSERT INTO readings VALUES ('1', 100.0, '1', 19.5, 40.0)")
+    db.commit()
+    db.close()
+
+    archive = _archive(path, retention_days=0)
+    archive.append("1", {"station_id": "1", "temperature": 20.5}, 100.0)
+    rows = archive.query("1", 0)
+    assert [row["temperature"] for row in rows] == [19.5, 20.5]
+    assert rows[0] == {"timestamp": rows[0]["timestamp"], "station_id": "1", "temperature": 19.5, "humidity": 40.0}
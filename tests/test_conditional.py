@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.time() under the test's control, starting mid-second."""
+    now = [1_800_000_000.2]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def _post(greenpulse, client, reading):
+    assert client.post("/api/sensor-data", json=reading).status_code == 202
+    greenpulse.ingest_queue.join()
+
+
+def test_own_last_modified_sent_back_gets_304(greenpulse, client, clock):
+    _post(greenpulse, client, {"station_id": "lm-1", "temperature": 20})
+    clock[0] += 1
+    resp = client.get("/api/sensor-data?station=lm-1")
+    since = resp.headers["Last-Modified"]
+    assert client.get("/api/sensor-data?station=lm-1", headers={"If-Modified-Since": since}).status_code == 304
+
+
+def test_change_in_the_same_second_is_not_answered_304(greenpulse, client, clock):
+    _post(greenpulse, client, {"station_id": "lm-2", "temperature": 20})
+    clock[0] += 0.3   # same second: no Last-Modified to echo yet
+    assert "Last-Modified" not in client.get("/api/gps-track?station=lm-2").headers
+
+    clock[0] += 1
+    since = client.get("/api/gps-track?station=lm-2").headers["Last-Modified"]
+    _post(greenpulse, client, {"station_id": "lm-2", "temperature": 21})
+    clock[0] += 0.1
+    assert client.get("/api/gps-track?station=lm-2", headers={"If-Modified-Since": since}).status_code == 200
+
+
+def test_if_none_match_wins_over_if_modified_since(greenpulse, client, clock):
+    _post(greenpulse, client, {"station_id": "lm-3", "temperature": 20})
+    clock[0] += 1
+    since = client.get("/api/sensor-data?station=lm-3").headers["Last-Modified"]
+    resp = client.get("/api/sensor-data?station=lm-3",
+                      headers={"If-None-Match": '"stale"', "If-Modified-Since": since})
+    assert resp.status_code == 200
+
+
+def test_new_station_changes_sensor_data_last_modified(greenpulse, client, clock):
+    _post(greenpulse, client, {"station_id": "lm-4", "temperature": 20})
+    clock[0] += 1
+    first = client.get("/api/sensor-data?station=lm-4")
+    clock[0] += 1
+    _post(greenpulse, client, {"station_id": "lm-5", "temperature": 20})   # station_count changes
+    clock[0] += 1
+    resp = client.get("/api/sensor-data?station=lm-4", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert resp.status_code == 200
+    assert resp.json["station_count"] == first.json["station_count"] + 1
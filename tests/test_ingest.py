@@ -0,0 +1,50 @@
+import pytest
+
+
+def test_bad_batch_entry_is_rejected_before_it_is_queued(greenpulse, client):
+    queue = greenpulse.ingest_queue
+    failed = queue.failed
+    resp = client.post("/api/sensor-data", json=[
+        {"station_id": "typed-1", "temperature": 21, "humidity": 40},
+        {"station_id": "typed-1", "temperature": "warm", "humidity": 41},
+        {"station_id": "typed-1", "temperature": "25.5", "humidity": 42, "satellites": "7"},
+    ])
+    assert resp.status_code == 202
+    assert resp.json["accepted"] == 2
+    assert resp.json["rejected"] == [{"index": 1, "message": "Invalid temperature: 'warm'"}]
+
+    queue.join()
+    assert queue.failed == failed
+    rows = greenpulse.stations.get("typed-1").history.view().to_list()
+    assert [row["humidity"] for row in rows] == [40, 42]
+    assert rows[-1]["temperature"] == 25.5
+    assert rows[-1]["satellites"] == 7
+
+
+def test_bad_single_reading_is_refused(greenpulse, client):
+    resp = client.post("/api/sensor-data", json={"station_id": "typed-2", "latitude": [43.6]})
+    assert resp.status_code == 400
+    assert greenpulse.stations.get("typed-2") is None
+
+
+@pytest.mark.parametrize("field, value", [
+    ("temperature", "NaN"), ("temperature", True), ("satellites", 7.5),
+    ("gps_valid", "yes"), ("station_id", 1.5), ("station_name", {"ru": "x"}),
+])
+def test_check_reading_rejects_wrong_types(greenpulse, field, value):
+    reading, message = greenpulse._check_reading({"temperature": 20, field: value})
+    assert reading is None
+    assert message.startswith(f"Invalid {field}")
+
+
+def test_overlong_text_fields_are_rejected_not_truncated(greenpulse, client):
+    resp = client.post("/api/sensor-data", json=[
+        {"station_id": "station-with-a-long-id", "temperature": 20},
+        {"station_id": "typed-3", "station_name": "Теплица Ақтау Северная", "temperature": 20},
+        {"station_id": "typed-3", "station_name": "GreenPulse Ақтау #1", "temperature": 21},
+    ])
+    assert resp.status_code == 202
+    assert [entry["index"] for entry in resp.json["rejected"]] == [0, 1]
+    assert resp.json["rejected"][0]["message"].startswith("station_id longer than 16 bytes")
+    greenpulse.ingest_queue.join()
+    assert greenpulse.stations.get("station-with-a-long-id") is None
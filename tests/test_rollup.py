@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+import pytest
+from _rollup import parse_time
+
+
+def test_parse_time_formats():
+    assert parse_time(None) is None
+    assert parse_time("") is None
+    assert parse_time(1700000000) == 1700000000.0
+    assert parse_time("1700000000.5") == 1700000000.5
+    assert parse_time("2023-11-14T22:13:20Z") == 1700000000.0
+    assert parse_time("2023-11-14T22:13:20") == 1700000000.0   # naive = UTC
+    assert parse_time("2023-11-15T04:13:20+06:00") == 1700000000.0
+
+
+def test_parse_time_round_trips_row_timestamps():
+    ts = 1700000000.123456
+    assert parse_time(datetime.fromtimestamp(ts, timezone.utc).isoformat()) == pytest.approx(ts, abs=1e-6)
+
+
+@pytest.mark.parametrize("value", [
+    "nan", "NaN", "inf", "-inf", float("nan"), float("inf"), "1e300", -1e300, "yesterday", True,
+])
+def test_parse_time_rejects_non_times(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
+
+
+@pytest.mark.parametrize("query", ["resolution=1h&from=nan", "resolution=1h&to=inf", "from=1e300"])
+def test_sensor_history_answers_400_for_non_times(client, query):
+    client.post("/api/sensor-data", json={"station_id": "times", "temperature": 20})
+    resp = client.get(f"/api/sensor-history?station=times&{query}")
+    assert resp.status_code == 400
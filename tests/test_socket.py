@@ -0,0 +1,14 @@
+def test_snapshot_carries_the_key_deltas_use(greenpulse, client):
+    # Posted without station_id: stored under the default station
+    assert client.post("/api/sensor-data", json={"temperature": 20}).status_code == 202
+    greenpulse.ingest_queue.join()
+
+    socket = greenpulse.socketio.test_client(greenpulse.app, query_string=f"station={greenpulse.DEFAULT_STATION_ID}")
+    (snapshot,) = [event for event in socket.get_received() if event["name"] == "sensor_update"]
+    key = str(snapshot["args"][0]["station_id"])
+    assert key == greenpulse.DEFAULT_STATION_ID
+
+    socket.emit("request_snapshot", {"station": key})
+    (again,) = socket.get_received()
+    assert str(again["args"][0]["station_id"]) == key
+    socket.disconnect()
@@ -0,0 +1,40 @@
+import kv_stub
+import pytest
+from _state_store import KVStateStore, MemoryStateStore, SQLiteStateStore
+
+
+@pytest.fixture(scope="module")
+def kv_url():
+    server, url = kv_stub.start()
+    yield url
+    server.shutdown()
+
+
+@pytest.fixture(params=["memory", "sqlite", "kv"])
+def store(request, tmp_path, kv_url):
+    if request.param == "memory":
+        return MemoryStateStore(10)
+    if request.param == "sqlite":
+        return SQLiteStateStore(str(tmp_path / "state.sqlite3"), 10)
+    return KVStateStore(kv_url, "", 10, prefix=f"{tmp_path.name}:")
+
+
+def test_multi_station_batch_last_station_has_its_own_history(store):
+    stations = "abcdefgh"
+    store.record([(key, {"station": key, "n": n}, float(n)) for n in range(3) for key in stations])
+
+    last = store.load(None, 5)
+    assert last.key == "h"
+    assert last.latest == {"station": "h", "n": 2}
+    assert [row["station"] for row in last.history] == ["h", "h", "h"]
+    assert [row["n"] for row in last.history] == [0, 1, 2]
+
+    c = store.load("c", 5)
+    assert c.latest == {"station": "c", "n": 2}
+    assert {row["station"] for row in c.history} == {"c"}
+    assert sorted(store.stations()) == list(stations)
+
+
+def test_history_is_trimmed_per_station(store):
+    store.record([("a", {"n": n}, float(n)) for n in range(15)])
+    assert [row["n"] for row in store.load("a", 100).history] == list(range(5, 15))
@@ -0,0 +1,18 @@
+import pytest
+from _telemetry_log import TelemetryLog, text_field_error
+
+
+def test_text_field_error_counts_utf8_bytes():
+    assert text_field_error({"station_id": "x" * 16, "station_name": "Ақтау" * 3}) is None
+    assert text_field_error({"station_name": "Ақтау" * 4}).startswith("station_name longer than 32 bytes")
+
+
+def test_append_refuses_to_truncate(tmp_path):
+    log = TelemetryLog(str(tmp_path), ["temperature"])
+    log.append({"station_id": "x" * 16, "temperature": 20.0}, 1_700_000_000.0)
+    with pytest.raises(ValueError):
+        log.append({"station_id": "x" * 17, "temperature": 21.0}, 1_700_000_001.0)
+    log.sync()
+    ((_, texts, values),) = log.tail(10)
+    assert texts["station_id"] == "x" * 16 and values == (20.0,)
+    log.close()
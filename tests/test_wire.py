@@ -0,0 +1,20 @@
+from datetime import datetime
+
+import _telemetry
+from _wire import decode_readings, encode_reading, encode_readings
+
+
+def test_decode_readings_keeps_age():
+    body = encode_reading({"station_id": 3, "temperature": 20.5}, age=120) + encode_readings([{"station_id": 3}])
+    first, second = decode_readings(body)
+    assert first == {"station_id": 3, "age": 120, "temperature": 20.5, "gps_valid": False}
+    assert "age" not in second
+
+
+def test_serverless_stamps_queued_readings_with_their_age():
+    queued, live = _telemetry.remember_sensor_payloads(
+        decode_readings(encode_reading({"station_id": 41, "temperature": 20.5}, age=120)
+                        + encode_reading({"station_id": 41, "temperature": 21.0})))
+    assert "age" not in queued
+    taken = datetime.fromisoformat(live["timestamp"]) - datetime.fromisoformat(queued["timestamp"])
+    assert taken.total_seconds() == 120